@@ -6,6 +6,8 @@ import logging
 import time
 
 from app.services.analysis_service import AnalysisService
+from app.services.invalidation_bus import InvalidationBus
+from app.services.reference_refresher import ReferenceRefresher
 from app.core.dependencies import get_db
 
 router = APIRouter()
@@ -18,6 +20,7 @@ async def check_cache_status():
     and how many records they contain.
     """
     current_time = time.time()
+    snapshot = AnalysisService._reference_snapshot
     
     # Calculate age for each cache
     snp_cache_age = current_time - AnalysisService._snp_cache_timestamp if AnalysisService._snp_cache_timestamp else 0
@@ -36,11 +39,12 @@ async def check_cache_status():
     return {
         "summary": {
             "all_caches_valid": all([
-                bool(AnalysisService._snp_cache) and snp_cache_age < AnalysisService._CACHE_DURATION,
-                bool(AnalysisService._characteristics_cache) and char_cache_age < AnalysisService._CACHE_DURATION,
-                bool(AnalysisService._ingredients_cache) and ingr_cache_age < AnalysisService._CACHE_DURATION
+                bool(AnalysisService._snp_cache) and snp_cache_age < AnalysisService.cache_duration(),
+                bool(AnalysisService._characteristics_cache) and char_cache_age < AnalysisService.cache_duration(),
+                bool(AnalysisService._ingredients_cache) and ingr_cache_age < AnalysisService.cache_duration()
             ]),
-            "cache_expiry_hours": AnalysisService._CACHE_DURATION / 3600,
+            "cache_expiry_hours": AnalysisService.cache_duration() / 3600,
+            "reference_data_version": AnalysisService._reference_version,
             "estimated_memory_usage_mb": round(total_memory_mb, 2),
             "last_updated": time.strftime(
                 '%Y-%m-%d %H:%M:%S', 
@@ -57,30 +61,40 @@ async def check_cache_status():
                 "exists": bool(AnalysisService._snp_cache),
                 "records_count": len(AnalysisService._snp_cache) if AnalysisService._snp_cache else 0,
                 "age_hours": round(snp_cache_age / 3600, 2),
-                "is_expired": snp_cache_age > AnalysisService._CACHE_DURATION if AnalysisService._snp_cache_timestamp else True,
+                "is_expired": snp_cache_age > AnalysisService.cache_duration() if AnalysisService._snp_cache_timestamp else True,
                 "last_updated": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(AnalysisService._snp_cache_timestamp)) if AnalysisService._snp_cache_timestamp else None
             },
             "characteristics": {
                 "exists": bool(AnalysisService._characteristics_cache),
                 "records_count": len(AnalysisService._characteristics_cache) if AnalysisService._characteristics_cache else 0,
                 "age_hours": round(char_cache_age / 3600, 2),
-                "is_expired": char_cache_age > AnalysisService._CACHE_DURATION if AnalysisService._characteristics_cache_timestamp else True,
+                "is_expired": char_cache_age > AnalysisService.cache_duration() if AnalysisService._characteristics_cache_timestamp else True,
                 "last_updated": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(AnalysisService._characteristics_cache_timestamp)) if AnalysisService._characteristics_cache_timestamp else None
             },
             "ingredients": {
                 "exists": bool(AnalysisService._ingredients_cache),
                 "records_count": len(AnalysisService._ingredients_cache) if AnalysisService._ingredients_cache else 0,
                 "age_hours": round(ingr_cache_age / 3600, 2),
-                "is_expired": ingr_cache_age > AnalysisService._CACHE_DURATION if AnalysisService._ingredients_cache_timestamp else True,
+                "is_expired": ingr_cache_age > AnalysisService.cache_duration() if AnalysisService._ingredients_cache_timestamp else True,
                 "last_updated": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(AnalysisService._ingredients_cache_timestamp)) if AnalysisService._ingredients_cache_timestamp else None
             }
-        }
+        },
+        "reference_snapshot": {
+            "exists": snapshot is not None,
+            "snp_count": len(snapshot) if snapshot is not None else 0,
+            "version": snapshot.version if snapshot is not None else None,
+            "built_at": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.built_at)) if snapshot is not None else None,
+            # Shared snapshot file this worker has mapped, if any
+            "shared_file": str(snapshot.path) if getattr(snapshot, 'path', None) else None
+        },
+        "background_refresh": ReferenceRefresher.status(),
+        "invalidation_bus": InvalidationBus.get().status() if InvalidationBus.get() is not None else None
     }
 
 @router.post("/cache/refresh", summary="Refresh all reference data caches")
 async def refresh_all_caches(db: AsyncSession = Depends(get_db)):
     """
-    Force a refresh of all reference data caches.
+    Force a refresh of all reference data caches, on every instance.
     """
     try:
         start_time = time.time()
@@ -88,6 +102,9 @@ async def refresh_all_caches(db: AsyncSession = Depends(get_db)):
         # Get database connection from session
         conn = await db.connection()
         
+        # Bump the version so the other instances reload too
+        version = await AnalysisService.announce_reference_change(conn)
+        
         # Clear all caches
         AnalysisService._snp_cache = {}
         AnalysisService._snp_cache_timestamp = None
@@ -120,6 +137,9 @@ async def refresh_all_caches(db: AsyncSession = Depends(get_db)):
             "cache_size_mb": round(len(str(ingrs)) / (1024 * 1024), 2)
         }
         
+        # Compile and swap in the snapshot now rather than on the next refresh
+        snapshot = await AnalysisService.refresh_reference_snapshot(conn, force=True)
+        
         elapsed_time = time.time() - start_time
         
         return {
@@ -127,6 +147,8 @@ async def refresh_all_caches(db: AsyncSession = Depends(get_db)):
             "processing_time_seconds": round(elapsed_time, 2),
             "total_memory_mb": round(sum(r["cache_size_mb"] for r in results.values()), 2),
             "caches": results,
+            "reference_snapshot_snps": len(snapshot),
+            "reference_data_version": version,
             "message": f"All reference data caches refreshed in {round(elapsed_time, 2)} seconds"
         }
     except Exception as e:
@@ -12,7 +12,12 @@ import json
 
 from app.services.dna_service import DNAService
 from app.services.analysis_service import AnalysisService
-from app.schemas.analysis import AnalysisRequest, AnalysisResponse, AnalysisResult, AnalysisList, AnalysisSummary
+from app.services.pipeline_service import PipelineService
+from app.services.batch_analysis_service import BatchAnalysisService
+from app.schemas.analysis import (
+    AnalysisRequest, AnalysisResponse, AnalysisResult, AnalysisList, AnalysisSummary,
+    AnalysisBatchRequest, AnalysisBatchResponse
+)
 from app.core.dependencies import get_db, get_sync_db
 
 router = APIRouter()
@@ -41,8 +46,12 @@ async def process_dna_data(
         
         # Check if we have cached analysis results
         if request.file_hash:
+            # An eager run started at upload time is about to fill the cache
+            await PipelineService.join(request.file_hash)
             logger.info(f"Checking for cached analysis for hash: {request.file_hash}")
-            cached_analysis = AnalysisService.get_cached_analysis(request.file_hash)
+            # Results made against older reference data are not reused
+            reference_version = await AnalysisService.get_reference_version(await db.connection())
+            cached_analysis = AnalysisService.get_cached_analysis(request.file_hash, reference_version)
             if cached_analysis and not request.force_refresh:
                 logger.info(f"Found cached analysis with {len(cached_analysis.get('mutations', []))} mutations")
                 
@@ -76,8 +85,10 @@ async def process_dna_data(
         if request.file_hash:
             logger.info(f"Fetching SNP data for hash: {request.file_hash}")
             # This function is async, so need to await it
-            snp_data = await DNAService.get_snp_data_by_hash(request.file_hash, db)
-            if not snp_data:
+            # Only the reference panel rows matter for analysis
+            panel_rsids = await AnalysisService.get_panel_rsids(db)
+            snp_data = await DNAService.get_snp_data_by_hash(request.file_hash, db, panel_rsids=panel_rsids)
+            if snp_data is None:
                 logger.error(f"No SNP data found for hash: {request.file_hash}")
                 raise HTTPException(
                     status_code=404,
@@ -91,7 +102,7 @@ async def process_dna_data(
         
         # Process the SNP data
         logger.info("Processing SNP data for analysis")
-        report_data = await AnalysisService.process_snp_data(snp_data, db)
+        report_data = await AnalysisService.process_snp_data(snp_data, db, force_refresh=request.force_refresh)
         logger.info(f"Generated report with {len(report_data.get('mutations', []))} mutations")
         
         # Record the analysis in the database
@@ -131,6 +142,25 @@ async def process_dna_data(
         logger.error(f"Error processing DNA data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing DNA data: {str(e)}")
 
+@router.post("/batch", response_model=AnalysisBatchResponse)
+async def process_dna_batch(
+    request: AnalysisBatchRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Analyse many genomes in one request.
+    Each item provides either a file_hash or raw_snp_data; per-item failures
+    are reported in the results instead of failing the batch.
+    """
+    try:
+        items = [item.model_dump() for item in request.items]
+        return await BatchAnalysisService.process_batch(items, db, force_refresh=request.force_refresh)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error processing DNA batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing DNA batch: {str(e)}")
+
 @router.post("/direct-insert-sync", response_model=Dict[str, Any])
 def direct_insert_sync(
     file_hash: str,
@@ -1,97 +1,275 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Query
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Query, Request, Header, Form
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, Dict, Any, List
 import time
-import hashlib
-import os
-from tempfile import NamedTemporaryFile
 import logging
 from datetime import datetime
 from pathlib import Path
 
 from app.core.dependencies import get_db
 from app.core.config import settings
+from app.services.dna_service import DNAService, HashMismatchError
+from app.services.upload_store import UploadStore
+from app.services.analysis_service import AnalysisService
+from app.services.panel_genotypes import PanelGenotypes
+from app.services.pipeline_service import PipelineService
+from app.services.upload_sessions import UploadSessions, ChunkConflictError
+from app.services.genome_parser import GenomeIngestResult
+from app.schemas.dna import UploadSessionCreate
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/upload")
 async def upload_dna_file(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    filename: Optional[str] = Form(None, description="Original filename when no file is sent"),
+    sha256: Optional[str] = Form(None, description="sha256 of the file as computed by the client"),
+    x_content_sha256: Optional[str] = Header(None, description="sha256 of the file as computed by the client"),
     background_tasks: BackgroundTasks = None,
-    db: Dict[str, Any] = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Upload a DNA file (23andMe or Ancestry format).
-    The file will be saved to both the uploads directory for permanent storage
-    and the cache/uploads directory for quick access.
+    The file is stored once, keyed by its sha256, in the uploads directory
+    and linked into the cache/uploads directory for quick access.
+    Re-uploading known content only records the new filename.
+    
+    A client that knows the file's sha256 can send it (form field or
+    X-Content-SHA256 header) with just the filename and no file: if the
+    content is already stored and parsed the existing record is returned,
+    otherwise 404 asks for the file. When a file is sent, a declared hash
+    must match its content.
     """
-    if not file.filename.endswith('.txt'):
+    declared_hash = (sha256 or x_content_sha256 or "").strip().lower() or None
+    filename = file.filename if file is not None else filename
+    if not filename or not filename.endswith('.txt'):
         raise HTTPException(status_code=400, detail="File must be a .txt file")
     
-    # Create a temporary file to store the uploaded content
-    with NamedTemporaryFile(delete=False, suffix='.txt') as temp_file:
-        # Write the uploaded file content to the temporary file
-        content = await file.read()
-        temp_file.write(content)
-        temp_file_path = temp_file.name
+    if file is None:
+        if declared_hash is None:
+            raise HTTPException(status_code=400, detail="Send a file, or a sha256 of already uploaded content")
+        response = await _claim_existing(declared_hash, filename, db)
+        if response is None:
+            raise HTTPException(status_code=404, detail="Content not stored yet; upload the file")
+        return response
     
     try:
-        # Calculate a file hash for identification
-        hash_obj = hashlib.sha256(content)
-        file_hash = hash_obj.hexdigest()
-        
-        # Create safe filename with hash prefix to avoid collisions
-        safe_filename = f"{file_hash[:8]}_{file.filename}"
-        
-        # Save to the uploads directory (permanent storage)
-        uploads_path = Path(settings.UPLOADS_DIR) / safe_filename
-        with open(uploads_path, "wb") as f:
-            # Reset file pointer to beginning
-            with open(temp_file_path, "rb") as temp:
-                f.write(temp.read())
-                
-        logger.info(f"File saved to uploads directory: {uploads_path}")
-                
-        # Also save to the cache/uploads directory for quick access
-        cache_path = Path(settings.UPLOADS_CACHE_DIR) / safe_filename
-        with open(cache_path, "wb") as f:
-            # Reset file pointer to beginning
-            with open(temp_file_path, "rb") as temp:
-                f.write(temp.read())
-                
-        logger.info(f"File saved to cache directory: {cache_path}")
-        
-        # Get file size for reporting
-        file_size = os.path.getsize(uploads_path)
-        file_size_mb = round(file_size / (1024 * 1024), 2)
-        
-        # Here you would typically do more processing, like:
-        # - Validating the DNA file format
-        # - Counting SNPs
-        # - Adding to database
-        # For now we'll return basic info
-        return {
-            "filename": file.filename,
-            "safe_filename": safe_filename,
-            "file_hash": file_hash,
-            "status": "success",
-            "size": file_size,
-            "size_mb": file_size_mb,
-            "uploads_path": str(uploads_path),
-            "cache_path": str(cache_path),
-            "message": "File uploaded and cached successfully",
-            "timestamp": datetime.now().isoformat()
-        }
+        # Hash, detect the format, parse and store in a single streamed pass
+        result, uploads_path, deduplicated = await DNAService.stream_upload(file, filename, expected_hash=declared_hash)
+        logger.info(f"File stored in uploads directory: {uploads_path}")
+        return await _finalize_upload(result, uploads_path, deduplicated, filename, db)
     
+    except HashMismatchError as e:
+        # Nothing was stored
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing DNA file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing DNA file: {str(e)}")
+
+@router.get("/files/{file_hash}", summary="Check whether content is already uploaded")
+async def get_file_status(file_hash: str, db: AsyncSession = Depends(get_db)):
+    """
+    Existence and processing status for a sha256, so clients can skip
+    uploading content the server already has.
+    """
+    status = await DNAService.get_upload_status(file_hash.lower(), db)
+    if status is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    status["eager_analysis"] = PipelineService.get_status(status["file_hash"])
+    return status
+
+async def _claim_existing(file_hash: str, filename: str, db: AsyncSession) -> Optional[Dict[str, Any]]:
+    """
+    Record a new filename for content that is already stored and parsed,
+    without any transfer. Returns None if the content isn't known.
+    """
+    found = await run_in_threadpool(DNAService.find_parsed_upload, file_hash)
+    if found is None:
+        return None
+    
+    result, uploads_path = found
+    UploadStore.record_filename(file_hash, filename, result.size)
+    UploadStore.link_into_cache(file_hash)
+    logger.info(f"Upload of {filename} skipped; {file_hash} already stored and parsed")
+    
+    response = await _finalize_upload(result, uploads_path, True, filename, db)
+    response["message"] = "File already stored and parsed; upload skipped"
+    return response
+
+async def _finalize_upload(
+    result: GenomeIngestResult,
+    uploads_path: Path,
+    deduplicated: bool,
+    filename: str,
+    db: AsyncSession
+) -> Dict[str, Any]:
+    """
+    Cache, index and (optionally) analyze a file that is now in the upload store,
+    and build the upload response.
+    """
+    file_hash = result.file_hash
+    cache_path = UploadStore.cache_link_path(file_hash)
+    
+    # Cache the parsed genome so analysis never has to re-read the file
+    if result.valid and not (deduplicated and DNAService.get_cache_path(file_hash, 'genome').exists()):
+        DNAService.save_to_cache(result.data, file_hash, format_type='genome')
     
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
+    # Keep the genotypes re-analysis needs with the upload; they don't expire
+    if result.valid and not UploadStore.genotypes_path(file_hash).exists():
+        try:
+            panel_rsids = await AnalysisService.get_panel_rsids(db)
+        except Exception as e:
+            logger.warning(f"Reference panel unavailable; storing only the configured superset: {e}")
+            panel_rsids = frozenset()
+        superset = PanelGenotypes.superset(panel_rsids)
+        if superset:
+            await run_in_threadpool(PanelGenotypes.save, file_hash, result.data, superset)
+    
+    # Index hash -> stored path so lookups never have to search for the file
+    try:
+        await DNAService.record_file_upload(
+            db,
+            filename=filename,
+            file_hash=file_hash,
+            snp_count=len(result.data) if result.valid else None,
+            file_path=str(uploads_path),
+            file_format=result.format_name if result.valid else None,
+            status="processed" if result.valid else "error"
+        )
+    except Exception as e:
+        # The upload store still resolves the hash without the index row
+        logger.warning(f"Could not record upload {file_hash} in dna_files: {e}")
+    
+    # Opt-in: start analysis and report generation before the client asks
+    eager_analysis = result.valid and PipelineService.schedule(file_hash)
+    
+    # Get file size for reporting
+    file_size = result.size
+    file_size_mb = round(file_size / (1024 * 1024), 2)
+    
+    return {
+        "filename": filename,
+        "safe_filename": uploads_path.name,
+        "file_hash": file_hash,
+        "status": "success",
+        "size": file_size,
+        "size_mb": file_size_mb,
+        "format": result.format_name,
+        "snp_count": len(result.data) if result.valid else 0,
+        "uploads_path": str(uploads_path),
+        "cache_path": str(cache_path),
+        "deduplicated": deduplicated,
+        "eager_analysis": eager_analysis,
+        "message": "File already stored; filename recorded" if deduplicated else "File uploaded and cached successfully",
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.post("/upload-sessions", summary="Start a chunked, resumable upload")
+async def create_upload_session(request: UploadSessionCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Start a chunked upload. Chunks are then PUT (in any order, in parallel)
+    to /upload-sessions/{upload_id}/chunks/{index} with an X-Chunk-SHA256
+    header, and the upload is finished with POST .../complete.
+    If the declared sha256 is already stored and parsed, no session is
+    created and the existing record is returned with "complete": true.
+    """
+    if not request.filename.endswith('.txt'):
+        raise HTTPException(status_code=400, detail="File must be a .txt file")
+    
+    if request.sha256:
+        # Known content needs no chunks at all
+        response = await _claim_existing(request.sha256.lower(), request.filename, db)
+        if response is not None:
+            return {"upload_id": None, "complete": True, "file": response}
+    
+    try:
+        session = await run_in_threadpool(
+            UploadSessions.create, request.filename, request.size, request.chunk_size, request.sha256
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return session.to_dict()
+
+@router.get("/upload-sessions/{upload_id}", summary="Get chunked upload progress")
+async def get_upload_session(upload_id: str):
+    """
+    Report which chunks have been received, so an interrupted client can
+    resume with only the missing ones.
+    """
+    session = UploadSessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session.to_dict()
+
+@router.put("/upload-sessions/{upload_id}/chunks/{index}", summary="Upload one chunk")
+async def upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    x_chunk_sha256: str = Header(..., description="sha256 hex digest of this chunk")
+):
+    """
+    Write one chunk at its offset. The chunk is only written once its
+    sha256 matches X-Chunk-SHA256; a failed or interrupted chunk can be re-sent.
+    Re-sending a received chunk is accepted if it is identical, and rejected
+    with 409 otherwise.
+    """
+    session = UploadSessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    
+    try:
+        await UploadSessions.write_chunk(session, index, request.stream(), x_chunk_sha256)
+    except ChunkConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientDisconnect:
+        logger.info(f"Client disconnected during chunk {index} of upload {upload_id}")
+        raise HTTPException(status_code=400, detail=f"Chunk {index} was interrupted")
+    
+    return {
+        "upload_id": upload_id,
+        "index": index,
+        "received": True,
+        "bytes_received": session.bytes_received,
+        "missing_chunks": len(session.missing_chunks())
+    }
+
+@router.post("/upload-sessions/{upload_id}/complete", summary="Assemble a chunked upload")
+async def complete_upload_session(upload_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Finish a chunked upload once every chunk is received. The file was hashed
+    and parsed as chunks arrived, so completing only moves it into the store.
+    """
+    session = UploadSessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    
+    try:
+        result, uploads_path, deduplicated = await UploadSessions.complete(session)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    DNAService.forget_missing(result.file_hash)
+    try:
+        return await _finalize_upload(result, uploads_path, deduplicated, session.filename, db)
+    except Exception as e:
+        logger.error(f"Error processing DNA file: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing DNA file: {str(e)}")
+
+@router.delete("/upload-sessions/{upload_id}", summary="Abort a chunked upload")
+async def abort_upload_session(upload_id: str):
+    """
+    Discard a chunked upload and its partial data.
+    """
+    if not await run_in_threadpool(UploadSessions.discard, upload_id):
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return {"upload_id": upload_id, "status": "aborted"}
 
 @router.get("/formats")
 async def get_supported_formats():
@@ -117,66 +295,55 @@ async def get_supported_formats():
 
 @router.get("/uploads", summary="List uploaded DNA files")
 async def list_uploaded_files(
-    limit: int = Query(50, description="Maximum number of files to return"),
-    offset: int = Query(0, description="Number of files to skip")
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of files to return"),
+    offset: int = Query(0, ge=0, description="Number of files to skip (prefer cursor)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    List all DNA files in the uploads directory with detailed information.
+    List uploaded DNA files, newest first, from the dna_files index.
+    Pass the returned next_cursor to get the following page; each page
+    is a single indexed query regardless of how many files are stored.
     """
     try:
-        uploads_dir = Path(settings.UPLOADS_DIR)
-        
-        # Check if the uploads directory exists
-        if not uploads_dir.exists():
-            return {
-                "files": [],
-                "count": 0,
-                "message": "Uploads directory does not exist"
-            }
-            
-        # Get all files in the uploads directory
-        all_files = []
-        for file_path in uploads_dir.glob("*.*"):
-            # Skip directories
-            if file_path.is_dir():
-                continue
-                
-            # Get file stats
-            stats = file_path.stat()
-            
-            # Calculate a simple hash from filename for demo purposes
-            # In production, you'd use the actual file hash stored in your database
-            simple_hash = hashlib.md5(file_path.name.encode()).hexdigest()
-            
-            file_info = {
-                "filename": file_path.name,
-                "path": str(file_path),
-                "size": stats.st_size,
-                "size_mb": round(stats.st_size / (1024 * 1024), 2),
-                "created_at": datetime.fromtimestamp(stats.st_ctime).isoformat(),
-                "modified_at": datetime.fromtimestamp(stats.st_mtime).isoformat(),
-                "file_hash": simple_hash,
-                "extension": file_path.suffix.lstrip('.')
-            }
-            all_files.append(file_info)
-            
-        # Sort files by modification time (newest first)
-        all_files.sort(key=lambda x: x["modified_at"], reverse=True)
-        
-        # Apply pagination
-        total_count = len(all_files)
-        paginated_files = all_files[offset:offset+limit]
-        
-        return {
-            "files": paginated_files,
-            "count": total_count,
-            "limit": limit,
-            "offset": offset,
-            "uploads_directory": str(uploads_dir)
-        }
+        records, next_cursor = await DNAService.list_file_records(db, limit=limit, cursor=cursor, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing uploaded files: {str(e)}")
         raise HTTPException(
             status_code=500, 
             detail=f"Error listing uploaded files: {str(e)}"
-        )
\ No newline at end of file
+        )
+    
+    files = []
+    for record in records:
+        file_path = Path(record["file_path"]) if record["file_path"] else None
+        try:
+            size = file_path.stat().st_size if file_path else None
+        except OSError:
+            size = None
+        created_at = record["created_at"].isoformat()
+        
+        files.append({
+            "filename": record["filename"],
+            "path": str(file_path) if file_path else None,
+            "size": size,
+            "size_mb": round(size / (1024 * 1024), 2) if size is not None else None,
+            "created_at": created_at,
+            "modified_at": created_at,
+            "file_hash": record["file_hash"],
+            "extension": file_path.suffix.lstrip('.') if file_path else None,
+            "file_format": record["file_format"],
+            "snp_count": record["snp_count"],
+            "status": record["status"]
+        })
+    
+    return {
+        "files": files,
+        "count": len(files),
+        "limit": limit,
+        "offset": offset if cursor is None else None,
+        "next_cursor": next_cursor,
+        "uploads_directory": str(settings.UPLOADS_DIR)
+    }
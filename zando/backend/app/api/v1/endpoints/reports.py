@@ -11,6 +11,7 @@ from app.services.dna_service import DNAService
 from app.services.analysis_service import AnalysisService
 from app.services.report_service import ReportService
 from app.services.pdf_service import PDFService
+from app.services.pipeline_service import PipelineService
 from app.schemas.report import ReportRequest, ReportResponse, ReportMetadata
 from app.core.dependencies import get_db
 from app.core.config import settings
@@ -50,17 +51,22 @@ async def generate_report(
         report_path = os.path.join(settings.REPORTS_DIR, report_filename)
         report_data = None
         if request.file_hash:
+            # An eager run started at upload time is about to fill the caches
+            await PipelineService.join(request.file_hash)
+            
             # Check for cached analysis data
-            cached_analysis = AnalysisService.get_cached_analysis(request.file_hash)
+            reference_version = await AnalysisService.get_reference_version(await db.connection())
+            cached_analysis = AnalysisService.get_cached_analysis(request.file_hash, reference_version)
             
             if cached_analysis:
                 # Use cached analysis data
                 report_data = cached_analysis
                 logger.info(f"Using cached analysis data for file hash: {request.file_hash}")
             else:
-                # Retrieve DNA data from cache or database
-                snp_data = await DNAService.get_snp_data_by_hash(request.file_hash, db)
-                if not snp_data:
+                # Retrieve the reference panel SNPs from cache or database
+                panel_rsids = await AnalysisService.get_panel_rsids(db)
+                snp_data = await DNAService.get_snp_data_by_hash(request.file_hash, db, panel_rsids=panel_rsids)
+                if snp_data is None:
                     raise HTTPException(
                         status_code=404,
                         detail=f"No DNA data found for file hash: {request.file_hash}"
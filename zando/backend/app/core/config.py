@@ -57,6 +57,53 @@ class Settings(BaseSettings):
     UPLOADS_CACHE_DIR: Path = Path(os.getenv("UPLOADS_CACHE_DIR", CACHE_DIR / "uploads"))
     CACHE_EXPIRY: timedelta = timedelta(days=int(os.getenv("CACHE_EXPIRY_DAYS", "7")))
     
+    # DNA parsing settings ("streaming" or "pandas")
+    DNA_PARSER: str = os.getenv("DNA_PARSER", "streaming")
+    DNA_PARSER_BLOCK_SIZE: int = int(os.getenv("DNA_PARSER_BLOCK_SIZE", str(1024 * 1024)))
+    
+    # Upload settings
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    FILE_INDEX_NEGATIVE_TTL: int = int(os.getenv("FILE_INDEX_NEGATIVE_TTL", "300"))
+    UPLOAD_MAX_SIZE: int = int(os.getenv("UPLOAD_MAX_SIZE", str(2 * 1024 * 1024 * 1024)))
+    PANEL_SUPERSET_FILE: Optional[str] = os.getenv("PANEL_SUPERSET_FILE")  # extra rsids stored per upload
+    
+    # Chunked, resumable upload sessions
+    UPLOAD_SESSION_CHUNK_SIZE: int = int(os.getenv("UPLOAD_SESSION_CHUNK_SIZE", str(8 * 1024 * 1024)))
+    UPLOAD_SESSION_MAX_CHUNK_SIZE: int = int(os.getenv("UPLOAD_SESSION_MAX_CHUNK_SIZE", str(64 * 1024 * 1024)))
+    UPLOAD_SESSION_TTL_HOURS: int = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+    
+    # Reference data caches. With the reference_data_version counter in the
+    # database they are invalidated exactly, so the TTL is only a backstop
+    REFERENCE_CACHE_TTL_HOURS: int = int(os.getenv("REFERENCE_CACHE_TTL_HOURS", str(30 * 24)))
+    REFERENCE_VERSION_CHECK_SECONDS: float = float(os.getenv("REFERENCE_VERSION_CHECK_SECONDS", "1"))
+    # How the caches are loaded: "bundle" (one query for all three) or "tables" (one per table)
+    REFERENCE_LOADER: str = os.getenv("REFERENCE_LOADER", "bundle")
+    # Background refresh (stale-while-revalidate) started with the app
+    REFERENCE_BACKGROUND_REFRESH: bool = os.getenv("REFERENCE_BACKGROUND_REFRESH", "true").lower() == "true"
+    REFERENCE_REFRESH_AHEAD_SECONDS: float = float(os.getenv("REFERENCE_REFRESH_AHEAD_SECONDS", "600"))
+    # Compiled snapshot shared by the worker processes of a host (needs reference_data_version)
+    SHARED_REFERENCE_SNAPSHOT: bool = os.getenv("SHARED_REFERENCE_SNAPSHOT", "true").lower() == "true"
+    REFERENCE_SNAPSHOT_DIR: Path = Path(os.getenv("REFERENCE_SNAPSHOT_DIR", CACHE_DIR / "reference"))
+    # Announces reference data changes to every instance: "postgres" (LISTEN/NOTIFY),
+    # "file" (a file all instances can see), "memory" (this process only) or "none"
+    REFERENCE_INVALIDATION_BUS: str = os.getenv("REFERENCE_INVALIDATION_BUS", "postgres")
+    REFERENCE_INVALIDATION_FILE: Path = Path(os.getenv("REFERENCE_INVALIDATION_FILE", CACHE_DIR / "reference_invalidation"))
+    REFERENCE_INVALIDATION_POLL_SECONDS: float = float(os.getenv("REFERENCE_INVALIDATION_POLL_SECONDS", "0.5"))
+    
+    # Summary section generator: "sql" (generate_summary_section) or "python" (in
+    # process; check it with scripts/check_summary_engine.py before switching)
+    SUMMARY_ENGINE: str = os.getenv("SUMMARY_ENGINE", "sql")
+    
+    # Eager analysis after upload (opt-in)
+    EAGER_ANALYSIS: bool = os.getenv("EAGER_ANALYSIS", "false").lower() == "true"
+    EAGER_ANALYSIS_CONCURRENCY: int = int(os.getenv("EAGER_ANALYSIS_CONCURRENCY", "2"))
+    EAGER_ANALYSIS_JOIN_TIMEOUT: float = float(os.getenv("EAGER_ANALYSIS_JOIN_TIMEOUT", "60"))
+    EAGER_REPORT_TYPES: str = os.getenv("EAGER_REPORT_TYPES", "markdown")  # comma-separated
+    
+    # Batch analysis (/api/v1/analysis/batch)
+    ANALYSIS_BATCH_WORKERS: int = int(os.getenv("ANALYSIS_BATCH_WORKERS", "0"))  # 0 = one per CPU
+    ANALYSIS_BATCH_MAX_ITEMS: int = int(os.getenv("ANALYSIS_BATCH_MAX_ITEMS", "500"))
+    
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
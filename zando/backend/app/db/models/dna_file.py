@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -9,6 +9,10 @@ class DNAFile(Base):
     DNA file model for tracking uploaded DNA files.
     """
     __tablename__ = "dna_files"
+    __table_args__ = (
+        # Serves the newest-first keyset pagination of /dna/uploads
+        Index("ix_dna_files_created_at_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     file_hash = Column(String, unique=True, index=True, nullable=False)
@@ -171,6 +171,10 @@ async def init_db():
         with engine.begin() as conn:
             # Create all tables
             Base.metadata.create_all(bind=conn)
+            # create_all skips existing tables, so add indexes defined since
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
         logger.info("Database tables created successfully")
         return True
     except Exception as e:
@@ -9,6 +9,14 @@ class AnalysisRequest(BaseModel):
     raw_snp_data: Optional[List[Dict[str, Any]]] = None
     force_refresh: bool = False
 
+class AnalysisBatchItem(BaseModel):
+    file_hash: Optional[str] = None
+    raw_snp_data: Optional[List[Dict[str, Any]]] = None
+
+class AnalysisBatchRequest(BaseModel):
+    items: List[AnalysisBatchItem]
+    force_refresh: bool = False
+
 # Analysis response schemas
 class AnalysisResponse(BaseModel):
     analysis_id: str
@@ -19,6 +27,21 @@ class AnalysisResponse(BaseModel):
     processing_time: Optional[float] = None
     cached: bool = False
 
+class AnalysisBatchItemResult(BaseModel):
+    index: int
+    status: str
+    analysis_id: Optional[str] = None
+    file_hash: Optional[str] = None
+    snp_count: int = 0
+    cached: bool = False
+    error: Optional[str] = None
+
+class AnalysisBatchResponse(BaseModel):
+    results: List[AnalysisBatchItemResult]
+    succeeded: int
+    failed: int
+    processing_time: float
+
 class AnalysisResult(BaseModel):
     analysis_id: str
     created_at: Union[datetime, str]
@@ -63,4 +63,10 @@ class SNP(BaseModel):
     allele2: str
 
 class SNPBatch(BaseModel):
-    snps: List[SNP] = []
\ No newline at end of file
+    snps: List[SNP] = []
+# Chunked upload schemas
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int = Field(..., gt=0, description="Total file size in bytes")
+    chunk_size: Optional[int] = Field(None, description="Bytes per chunk; server default if omitted")
+    sha256: Optional[str] = Field(None, description="Expected sha256 of the whole file, verified on completion")
@@ -5,7 +5,8 @@ import logging
 import json
 import pickle
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
@@ -13,9 +14,20 @@ from sqlalchemy import text
 from app.db.models.analysis import Analysis
 from app.core.config import settings
 from app.services.dna_service import DNAService
+from app.services.genotype_data import GenotypeData
+from app.services.invalidation_bus import InvalidationBus
+from app.services.panel_matcher import PanelMatcher
+from app.services.reference_snapshot import ReferenceSnapshot
+from app.services.shared_snapshot import SharedSnapshot
+from app.services.single_flight import SingleFlight
+from app.services.snapshot_file import read_snapshot_file
+from app.services.summary_engine import SummaryEngine
 
 logger = logging.getLogger(__name__)
 
+# Used when the SQL summary function is unavailable or fails
+DEFAULT_SUMMARY = "Your genes reveal how your skin naturally behaves. This report guides you on how to optimize your skincare based on your genetics."
+
 class AnalysisService:
     """
     Service for performing genetic analysis on DNA data.
@@ -32,9 +44,160 @@ class AnalysisService:
     _ingredients_cache = {}
     _ingredients_cache_timestamp = None
     
-    # Cache duration set to 1 day in seconds
+    # Compiled, immutable view of the three caches above; rebuilt and swapped
+    # whenever any of them is replaced
+    _reference_snapshot: Optional[ReferenceSnapshot] = None
+    _reference_snapshot_sources: Tuple = ()
+    
+    # Set while ReferenceRefresher keeps the snapshot fresh in the background
+    _background_refresh = False
+    
+    # In-process summary generator for the current snapshot (SUMMARY_ENGINE=python)
+    _summary_engine: Optional[SummaryEngine] = None
+    
+    # Cache duration set to 1 day in seconds, used when the database has no
+    # reference data version to invalidate the caches by
     _CACHE_DURATION = 24 * 60 * 60  # 1 day in seconds
     
+    # Last reference_data_version counter read from the database (None if
+    # unavailable) and when it was read
+    _reference_version: Optional[int] = None
+    _reference_version_checked = 0.0
+    
+    # Back-off before looking for the version counter again when it's missing
+    _VERSION_RETRY_SECONDS = 5 * 60
+    
+    # Reloads of the caches above, one at a time per cache
+    _reference_loads = SingleFlight()
+    
+    @staticmethod
+    def _is_fresh(cache: Dict, timestamp: Optional[float], margin: float = 0) -> bool:
+        return bool(cache) and bool(timestamp) and time.time() - timestamp < AnalysisService.cache_duration() - margin
+    
+    @staticmethod
+    def expire_reference_caches(within: float = 0) -> List[str]:
+        """
+        Mark the reference caches that expire within `within` seconds for reloading.
+        
+        Args:
+            within: Seconds ahead of expiry to treat a cache as expired
+            
+        Returns:
+            Names of the caches marked
+        """
+        expired = []
+        for name, cache, timestamp in (('snp', '_snp_cache', '_snp_cache_timestamp'),
+                                       ('characteristics', '_characteristics_cache', '_characteristics_cache_timestamp'),
+                                       ('ingredients', '_ingredients_cache', '_ingredients_cache_timestamp')):
+            if not AnalysisService._is_fresh(getattr(AnalysisService, cache), getattr(AnalysisService, timestamp), within):
+                setattr(AnalysisService, timestamp, None)
+                expired.append(name)
+        return expired
+    
+    @staticmethod
+    def cache_duration() -> float:
+        """
+        Lifetime of the reference data caches, in seconds.
+        
+        With a reference data version they are invalidated exactly when the
+        data changes, so the TTL (REFERENCE_CACHE_TTL_HOURS) is only a
+        backstop; without one they expire after a day.
+        """
+        if AnalysisService._reference_version is not None:
+            return settings.REFERENCE_CACHE_TTL_HOURS * 3600
+        return AnalysisService._CACHE_DURATION
+    
+    @staticmethod
+    async def check_reference_version(conn) -> Optional[str]:
+        """
+        Check the reference data version and drop the reference caches if it moved.
+        
+        The version is the single-row counter in reference_data_version,
+        bumped by triggers on the snp, characteristic and ingredient tables
+        and their link tables. Reading it is one primary-key lookup, done at
+        most every REFERENCE_VERSION_CHECK_SECONDS.
+        
+        Args:
+            conn: Database connection
+            
+        Returns:
+            Version key ("v<counter>"), or None if the database has no version counter
+        """
+        current_time = time.time()
+        if current_time - AnalysisService._reference_version_checked >= settings.REFERENCE_VERSION_CHECK_SECONDS:
+            # Concurrent requests keep using the version last read
+            AnalysisService._reference_version_checked = current_time
+            try:
+                result = await conn.execute(text("SELECT version FROM reference_data_version"))
+                row = result.fetchone()
+                # No row until the first write to a reference table
+                version = row[0] if row else 0
+            except Exception as e:
+                logger.warning(f"Reference data version unavailable, falling back to cache expiry: {e}")
+                try:
+                    await conn.rollback()
+                except Exception:
+                    pass
+                AnalysisService._reference_version_checked = current_time + AnalysisService._VERSION_RETRY_SECONDS
+                version = None
+            
+            if version != AnalysisService._reference_version:
+                if AnalysisService._reference_version is not None:
+                    logger.info(f"Reference data version changed from {AnalysisService._reference_version} "
+                                f"to {version}; reloading reference caches")
+                AnalysisService._snp_cache_timestamp = None
+                AnalysisService._characteristics_cache_timestamp = None
+                AnalysisService._ingredients_cache_timestamp = None
+                AnalysisService._reference_version = version
+        
+        if AnalysisService._reference_version is None:
+            return None
+        return f"v{AnalysisService._reference_version}"
+    
+    @staticmethod
+    async def announce_reference_change(conn) -> Optional[int]:
+        """
+        Bump the reference data version and announce it on the invalidation bus.
+        
+        Every instance, this one included, reloads its reference data on its
+        next version check; listening instances check right away.
+        
+        Args:
+            conn: Database connection
+            
+        Returns:
+            The new version, or None if the database has no version counter
+        """
+        try:
+            result = await conn.execute(text("""
+                INSERT INTO reference_data_version (id, version, updated_at)
+                VALUES (true, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT (id) DO UPDATE
+                    SET version = reference_data_version.version + 1,
+                        updated_at = CURRENT_TIMESTAMP
+                RETURNING version
+            """))
+            version = result.fetchone()[0]
+            await conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not bump the reference data version, announcing an unversioned change: {e}")
+            try:
+                await conn.rollback()
+            except Exception:
+                pass
+            version = None
+            AnalysisService.expire_reference_caches(float('inf'))
+        AnalysisService._reference_version_checked = 0.0
+        
+        bus = InvalidationBus.get()
+        if bus is not None:
+            try:
+                await bus.publish(version)
+            except Exception as e:
+                # Other instances still pick the version up at their next check
+                logger.error(f"Failed to announce reference data version {version}: {e}")
+        return version
+    
     @staticmethod
     async def get_all_snps_cached(conn) -> Dict[str, Dict[str, Any]]:
         """
@@ -46,16 +209,160 @@ class AnalysisService:
         Returns:
             Dictionary mapping rsids to their details
         """
-        # Check if cache is valid
-        current_time = time.time()
-        
         # If cache exists and is not expired, use it
-        if (AnalysisService._snp_cache and 
-            AnalysisService._snp_cache_timestamp and 
-            current_time - AnalysisService._snp_cache_timestamp < AnalysisService._CACHE_DURATION):
+        if AnalysisService._is_fresh(AnalysisService._snp_cache, AnalysisService._snp_cache_timestamp):
             logger.info(f"Using cached SNP table ({len(AnalysisService._snp_cache)} records)")
             return AnalysisService._snp_cache
         
+        # One load per expiry: concurrent callers, in any thread, wait for it
+        if settings.REFERENCE_LOADER == "bundle":
+            await AnalysisService._reference_loads.run(
+                'bundle', lambda: AnalysisService._load_reference_bundle(conn)
+            )
+            return AnalysisService._snp_cache
+        return await AnalysisService._reference_loads.run(
+            'snp', lambda: AnalysisService._load_all_snps(conn)
+        )
+    
+    @staticmethod
+    async def _load_reference_bundle(conn) -> None:
+        """
+        Load all three reference caches in one round trip.
+        
+        One row per snp_id carries the SNP's details and its characteristics,
+        beneficial ingredients and cautions as JSON arrays, replacing the five
+        sequential queries of the per-table loaders. Only run through
+        _reference_loads.
+        
+        Args:
+            conn: Database connection
+        """
+        if all((
+            AnalysisService._is_fresh(AnalysisService._snp_cache, AnalysisService._snp_cache_timestamp),
+            AnalysisService._is_fresh(AnalysisService._characteristics_cache,
+                                      AnalysisService._characteristics_cache_timestamp),
+            AnalysisService._is_fresh(AnalysisService._ingredients_cache, AnalysisService._ingredients_cache_timestamp),
+        )):
+            return
+        current_time = time.time()
+        
+        logger.info("Fetching reference data bundle from database and caching")
+        
+        # Same rows, in the same order, as the per-table loaders; snp_ids that
+        # only appear in the link tables come back without SNP details
+        query = """
+            WITH snp_ids AS (
+                SELECT snp_id FROM snp
+                UNION SELECT snp_id FROM SNP_Characteristic_Link
+                UNION SELECT snp_id FROM SNP_IngredientCaution_Link
+            ),
+            characteristics AS (
+                SELECT scl.snp_id,
+                       json_agg(json_build_array(c.name, c.description, scl.effect_direction,
+                                                 scl.evidence_strength)) AS items
+                FROM SNP_Characteristic_Link scl
+                JOIN SkinCharacteristic c ON scl.characteristic_id = c.characteristic_id
+                GROUP BY scl.snp_id
+            ),
+            beneficial AS (
+                SELECT s.snp_id,
+                       json_agg(json_build_array(bi.ingredient_name, bi.ingredient_mechanism, bi.benefit_mechanism,
+                                                 bi.recommendation_strength, bi.evidence_level)
+                                ORDER BY bi.evidence_level DESC, bi.recommendation_strength) AS items
+                FROM snp s
+                JOIN snp_beneficial_ingredients bi ON s.rsid = bi.rsid
+                GROUP BY s.snp_id
+            ),
+            cautions AS (
+                SELECT sicl.snp_id,
+                       json_agg(json_build_array(ic.ingredient_name, ic.risk_mechanism,
+                                                 ic.alternative_ingredients)) AS items
+                FROM SNP_IngredientCaution_Link sicl
+                JOIN IngredientCaution ic ON sicl.caution_id = ic.caution_id
+                GROUP BY sicl.snp_id
+            )
+            SELECT i.snp_id, s.rsid, s.gene, s.risk_allele, s.effect, s.evidence_strength, s.category,
+                   c.items, b.items, ca.items
+            FROM snp_ids i
+            LEFT JOIN snp s ON s.snp_id = i.snp_id
+            LEFT JOIN characteristics c ON c.snp_id = i.snp_id
+            LEFT JOIN beneficial b ON b.snp_id = i.snp_id
+            LEFT JOIN cautions ca ON ca.snp_id = i.snp_id
+        """
+        
+        results = await conn.execute(text(query))
+        results = results.fetchall()
+        logger.info(f"Fetched reference data bundle for {len(results)} SNP IDs")
+        
+        def items(value) -> List[list]:
+            # psycopg2 and pg8000 decode json columns; other drivers return text
+            if value is None:
+                return []
+            return json.loads(value) if isinstance(value, str) else value
+        
+        snp_details = {}
+        characteristics_by_snp = {}
+        ingredients_by_snp = {}
+        # Index positions: 0=snp_id, 1=rsid, 2=gene, 3=risk_allele, 4=effect, 5=evidence_strength,
+        # 6=category, 7=characteristics, 8=beneficial ingredients, 9=cautions
+        for row in results:
+            snp_id, rsid = row[0], row[1]
+            if rsid is not None:
+                snp_details[rsid] = {
+                    'snp_id': snp_id,
+                    'gene': row[2],
+                    'risk_allele': row[3],
+                    'effect': row[4],
+                    'evidence_strength': row[5],
+                    'category': row[6]
+                }
+            
+            characteristics = items(row[7])
+            if characteristics:
+                characteristics_by_snp[snp_id] = [
+                    {'name': name, 'description': description, 'effect_direction': effect_direction,
+                     'evidence_strength': evidence_strength}
+                    for name, description, effect_direction, evidence_strength in characteristics
+                ]
+            
+            beneficials = [
+                {'ingredient_name': name, 'ingredient_mechanism': ingredient_mechanism,
+                 'benefit_mechanism': benefit_mechanism, 'recommendation_strength': recommendation_strength,
+                 'evidence_level': evidence_level}
+                for name, ingredient_mechanism, benefit_mechanism, recommendation_strength, evidence_level
+                in items(row[8])
+            ]
+            cautions = [
+                {'ingredient_name': name, 'risk_mechanism': risk_mechanism,
+                 'alternative_ingredients': alternative_ingredients}
+                for name, risk_mechanism, alternative_ingredients in items(row[9])
+            ]
+            # Every SNP gets an entry, as in _load_all_ingredients
+            if rsid is not None or beneficials or cautions:
+                ingredients_by_snp[snp_id] = (beneficials, cautions)
+        
+        # Update the caches
+        AnalysisService._snp_cache = snp_details
+        AnalysisService._snp_cache_timestamp = current_time
+        AnalysisService._characteristics_cache = characteristics_by_snp
+        AnalysisService._characteristics_cache_timestamp = current_time
+        AnalysisService._ingredients_cache = ingredients_by_snp
+        AnalysisService._ingredients_cache_timestamp = current_time
+        
+        total_chars = sum(len(chars) for chars in characteristics_by_snp.values())
+        total_beneficial = sum(len(b) for b, _ in ingredients_by_snp.values())
+        total_cautions = sum(len(c) for _, c in ingredients_by_snp.values())
+        logger.info(f"Reference caches updated with {len(snp_details)} SNPs, {total_chars} characteristics, "
+                    f"{total_beneficial} beneficial and {total_cautions} cautions")
+    
+    @staticmethod
+    async def _load_all_snps(conn) -> Dict[str, Dict[str, Any]]:
+        # Only run through _reference_loads; a load may have finished while
+        # this caller was starting its own
+        if AnalysisService._is_fresh(AnalysisService._snp_cache, AnalysisService._snp_cache_timestamp):
+            return AnalysisService._snp_cache
+        current_time = time.time()
+        
         # Otherwise, fetch all SNPs from database
         logger.info("Fetching complete SNP table from database and caching")
         
@@ -121,15 +428,188 @@ class AnalysisService:
         
         logger.info(f"Looking up {len(rsids)} SNP records")
         
-        # Get the full SNP cache
-        all_snps = await AnalysisService.get_all_snps_cached(conn)
-        
-        # Filter only the requested RSIDs
-        snp_details = {rsid: details for rsid, details in all_snps.items() if rsid in rsids}
+        # Filter through the panel index instead of scanning the rsid list per SNP
+        matcher = await AnalysisService.get_panel_matcher(conn)
+        snp_details = matcher.details_for(rsids)
         
         logger.info(f"Found {len(snp_details)} matching SNPs in cache")
         return snp_details
     
+    @staticmethod
+    async def get_reference_snapshot(conn) -> ReferenceSnapshot:
+        """
+        Get the compiled reference snapshot for the current reference caches.
+        
+        The snapshot is never modified; when a cache is refreshed a new one is
+        compiled and the class attribute swapped, so callers can keep using
+        the reference they already hold. While ReferenceRefresher runs, the
+        current snapshot is served as is and kept fresh in the background;
+        otherwise it is refreshed inline when needed.
+        
+        Args:
+            conn: Database connection
+            
+        Returns:
+            ReferenceSnapshot built from the cached SNP, characteristic and ingredient tables
+        """
+        snapshot = AnalysisService._reference_snapshot
+        if snapshot is not None and AnalysisService._background_refresh:
+            return snapshot
+        return await AnalysisService.refresh_reference_snapshot(conn)
+    
+    @staticmethod
+    def _uses_shared_snapshot() -> bool:
+        # Shared files are named by version, so they need the version counter
+        return settings.SHARED_REFERENCE_SNAPSHOT and AnalysisService._reference_version is not None
+    
+    @staticmethod
+    def reference_refresh_due(within: float = 0) -> bool:
+        """
+        Whether the snapshot is missing, behind the reference data version, or
+        expires within `within` seconds.
+        
+        Args:
+            within: Seconds ahead of expiry to treat the snapshot as due
+            
+        Returns:
+            True if refresh_reference_snapshot would load or attach a new snapshot
+        """
+        snapshot = AnalysisService._reference_snapshot
+        if snapshot is None:
+            return True
+        if AnalysisService._uses_shared_snapshot():
+            return (snapshot.version != f"v{AnalysisService._reference_version}"
+                    or time.time() - snapshot.built_at >= AnalysisService.cache_duration() - within)
+        return not all((
+            AnalysisService._is_fresh(AnalysisService._snp_cache, AnalysisService._snp_cache_timestamp, within),
+            AnalysisService._is_fresh(AnalysisService._characteristics_cache,
+                                      AnalysisService._characteristics_cache_timestamp, within),
+            AnalysisService._is_fresh(AnalysisService._ingredients_cache,
+                                      AnalysisService._ingredients_cache_timestamp, within),
+        ))
+    
+    @staticmethod
+    async def refresh_reference_snapshot(conn, within: float = 0, force: bool = False) -> ReferenceSnapshot:
+        """
+        Check the reference data version, reload expired caches and swap in a
+        new snapshot if any of them changed.
+        
+        With SHARED_REFERENCE_SNAPSHOT the snapshot is instead attached from
+        the file another worker published for the version, or loaded and
+        published for them (see SharedSnapshot).
+        
+        Args:
+            conn: Database connection
+            within: Seconds ahead of expiry to reload a cache or snapshot
+            force: Load and publish from the database even if a shared
+                snapshot for the version is already published
+            
+        Returns:
+            The current ReferenceSnapshot
+        """
+        reference_version = await AnalysisService.check_reference_version(conn)
+        if reference_version is not None and settings.SHARED_REFERENCE_SNAPSHOT:
+            return await AnalysisService._refresh_shared_snapshot(conn, reference_version, within, force)
+        
+        if within:
+            AnalysisService.expire_reference_caches(within)
+        sources = (
+            await AnalysisService.get_all_snps_cached(conn),
+            await AnalysisService.get_all_characteristics_cached(conn),
+            await AnalysisService.get_all_ingredients_cached(conn),
+        )
+        
+        snapshot = AnalysisService._reference_snapshot
+        current = AnalysisService._reference_snapshot_sources
+        if (snapshot is None or len(current) != len(sources) or any(a is not b for a, b in zip(current, sources))
+                or (reference_version is not None and snapshot.version != reference_version)):
+            snapshot = ReferenceSnapshot(*sources, version=reference_version)
+            AnalysisService._reference_snapshot = snapshot
+            AnalysisService._reference_snapshot_sources = sources
+        
+        return snapshot
+    
+    @staticmethod
+    async def _refresh_shared_snapshot(conn, reference_version: str, within: float, force: bool) -> ReferenceSnapshot:
+        max_age = AnalysisService.cache_duration() - within
+        snapshot = AnalysisService._reference_snapshot
+        if (not force and snapshot is not None and snapshot.version == reference_version
+                and time.time() - snapshot.built_at < max_age):
+            return snapshot
+        
+        shared = None if force else SharedSnapshot.attach(reference_version, max_age)
+        if shared is None:
+            lock = SharedSnapshot.lock()
+            # Blocks while another worker on the host loads and publishes
+            await run_in_threadpool(lock.__enter__)
+            try:
+                shared = None if force else SharedSnapshot.attach(reference_version, max_age)
+                if shared is None:
+                    AnalysisService.expire_reference_caches(within)
+                    path = SharedSnapshot.publish(
+                        await AnalysisService.get_all_snps_cached(conn),
+                        await AnalysisService.get_all_characteristics_cached(conn),
+                        await AnalysisService.get_all_ingredients_cached(conn),
+                        reference_version,
+                    )
+                    shared = read_snapshot_file(path)
+            finally:
+                lock.__exit__(None, None, None)
+        else:
+            logger.info(f"Attached shared reference snapshot {shared.path}")
+        
+        # The mapped file replaces the per-worker tables
+        AnalysisService._snp_cache = {}
+        AnalysisService._characteristics_cache = {}
+        AnalysisService._ingredients_cache = {}
+        AnalysisService._reference_snapshot = shared
+        AnalysisService._reference_snapshot_sources = ()
+        return shared
+    
+    @staticmethod
+    async def get_reference_version(conn) -> str:
+        """
+        Get the version of the reference data analyses are currently made against.
+        
+        Args:
+            conn: Database connection
+            
+        Returns:
+            The database version key, or a digest of the reference content
+            when the database has no version counter
+        """
+        snapshot = await AnalysisService.get_reference_snapshot(conn)
+        return snapshot.version
+    
+    @staticmethod
+    async def get_panel_matcher(conn) -> PanelMatcher:
+        """
+        Get the hash-indexed matcher for the cached SNP panel.
+        
+        Args:
+            conn: Database connection
+            
+        Returns:
+            PanelMatcher of the current reference snapshot
+        """
+        snapshot = await AnalysisService.get_reference_snapshot(conn)
+        return snapshot.matcher
+    
+    @staticmethod
+    async def get_panel_rsids(db: AsyncSession) -> frozenset:
+        """
+        Get the rsids of the current reference panel, for panel-filtered parsing.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Frozen set of panel rsids
+        """
+        conn = await db.connection()
+        matcher = await AnalysisService.get_panel_matcher(conn)
+        return matcher.rsids
+    
     @staticmethod
     async def get_all_characteristics_cached(conn) -> Dict[int, List[Dict[str, Any]]]:
         """
@@ -141,16 +621,29 @@ class AnalysisService:
         Returns:
             Dictionary mapping SNP IDs to lists of characteristic dictionaries
         """
-        # Check if cache is valid
-        current_time = time.time()
-        
         # If cache exists and is not expired, use it
-        if (AnalysisService._characteristics_cache and 
-            AnalysisService._characteristics_cache_timestamp and 
-            current_time - AnalysisService._characteristics_cache_timestamp < AnalysisService._CACHE_DURATION):
+        if AnalysisService._is_fresh(AnalysisService._characteristics_cache, AnalysisService._characteristics_cache_timestamp):
             logger.info(f"Using cached characteristics (for {len(AnalysisService._characteristics_cache)} SNPs)")
             return AnalysisService._characteristics_cache
         
+        # One load per expiry: concurrent callers, in any thread, wait for it
+        if settings.REFERENCE_LOADER == "bundle":
+            await AnalysisService._reference_loads.run(
+                'bundle', lambda: AnalysisService._load_reference_bundle(conn)
+            )
+            return AnalysisService._characteristics_cache
+        return await AnalysisService._reference_loads.run(
+            'characteristics', lambda: AnalysisService._load_all_characteristics(conn)
+        )
+    
+    @staticmethod
+    async def _load_all_characteristics(conn) -> Dict[int, List[Dict[str, Any]]]:
+        # Only run through _reference_loads; a load may have finished while
+        # this caller was starting its own
+        if AnalysisService._is_fresh(AnalysisService._characteristics_cache, AnalysisService._characteristics_cache_timestamp):
+            return AnalysisService._characteristics_cache
+        current_time = time.time()
+        
         # Otherwise, fetch all characteristic data from database
         logger.info("Fetching all characteristic data from database and caching")
         
@@ -225,8 +718,8 @@ class AnalysisService:
         # Get the full characteristics cache
         all_characteristics = await AnalysisService.get_all_characteristics_cached(conn)
         
-        # Filter only the requested SNP IDs
-        characteristics_by_snp = {snp_id: chars for snp_id, chars in all_characteristics.items() if snp_id in snp_ids}
+        # Look up only the requested SNP IDs
+        characteristics_by_snp = {snp_id: all_characteristics[snp_id] for snp_id in set(snp_ids) if snp_id in all_characteristics}
         
         # Log results summary
         found_snps = len(characteristics_by_snp)
@@ -246,16 +739,29 @@ class AnalysisService:
         Returns:
             Dictionary mapping SNP IDs to tuples of (beneficial_list, caution_list)
         """
-        # Check if cache is valid
-        current_time = time.time()
-        
         # If cache exists and is not expired, use it
-        if (AnalysisService._ingredients_cache and 
-            AnalysisService._ingredients_cache_timestamp and 
-            current_time - AnalysisService._ingredients_cache_timestamp < AnalysisService._CACHE_DURATION):
+        if AnalysisService._is_fresh(AnalysisService._ingredients_cache, AnalysisService._ingredients_cache_timestamp):
             logger.info(f"Using cached ingredients (for {len(AnalysisService._ingredients_cache)} SNPs)")
             return AnalysisService._ingredients_cache
         
+        # One load per expiry: concurrent callers, in any thread, wait for it
+        if settings.REFERENCE_LOADER == "bundle":
+            await AnalysisService._reference_loads.run(
+                'bundle', lambda: AnalysisService._load_reference_bundle(conn)
+            )
+            return AnalysisService._ingredients_cache
+        return await AnalysisService._reference_loads.run(
+            'ingredients', lambda: AnalysisService._load_all_ingredients(conn)
+        )
+    
+    @staticmethod
+    async def _load_all_ingredients(conn) -> Dict[int, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        # Only run through _reference_loads; a load may have finished while
+        # this caller was starting its own
+        if AnalysisService._is_fresh(AnalysisService._ingredients_cache, AnalysisService._ingredients_cache_timestamp):
+            return AnalysisService._ingredients_cache
+        current_time = time.time()
+        
         # Otherwise, fetch all ingredients data from database
         logger.info("Fetching all ingredients data from database and caching")
         
@@ -264,12 +770,13 @@ class AnalysisService:
         snp_id_result = await conn.execute(text(snp_id_query))
         snp_ids = [row[0] if not hasattr(row, 'snp_id') else row.snp_id for row in snp_id_result.fetchall()]
         
-        # Get all beneficial ingredients
+        # Get all beneficial ingredients, in the order of the snp_beneficial_ingredients view
         beneficial_query = """
             SELECT s.snp_id, bi.ingredient_name, bi.ingredient_mechanism, 
                    bi.benefit_mechanism, bi.recommendation_strength, bi.evidence_level
             FROM snp s
             JOIN snp_beneficial_ingredients bi ON s.rsid = bi.rsid
+            ORDER BY bi.evidence_level DESC, bi.recommendation_strength
         """
         
         # Get all cautionary ingredients
@@ -387,8 +894,8 @@ class AnalysisService:
         # Get the full ingredients cache
         all_ingredients = await AnalysisService.get_all_ingredients_cached(conn)
         
-        # Filter only the requested SNP IDs
-        ingredients_by_snp = {snp_id: ingredients for snp_id, ingredients in all_ingredients.items() if snp_id in snp_ids}
+        # Look up only the requested SNP IDs
+        ingredients_by_snp = {snp_id: all_ingredients[snp_id] for snp_id in set(snp_ids) if snp_id in all_ingredients}
         
         # Ensure all requested SNP IDs are in the result even if they have no ingredients
         for snp_id in snp_ids:
@@ -403,18 +910,55 @@ class AnalysisService:
         return ingredients_by_snp
     
     @staticmethod
-    async def get_dynamic_summary(conn, report_data: Dict[str, Any]) -> str:
+    async def get_summary_engine(conn) -> SummaryEngine:
         """
-        Gets dynamically generated summary using the SQL summary function
+        Get the in-process summary engine for the current reference snapshot.
+        
+        When a new snapshot is built, the terms the summary sorts are ordered
+        once by the database so the engine follows its collation.
         
         Args:
             conn: Database connection
-            report_data: Complete report data
+            
+        Returns:
+            SummaryEngine bound to the current snapshot
+        """
+        snapshot = await AnalysisService.get_reference_snapshot(conn)
+        engine = AnalysisService._summary_engine
+        if engine is not None and engine.snapshot is snapshot:
+            return engine
+        
+        terms = SummaryEngine.collation_terms(snapshot)
+        query = """
+        SELECT term FROM jsonb_array_elements_text(CAST(:terms AS jsonb)) AS term ORDER BY term
+        """
+        try:
+            result = await conn.execute(text(query), {"terms": json.dumps(terms)})
+            collation_order = [row[0] for row in result.fetchall()]
+        except Exception as e:
+            logger.warning(f"Could not read the database collation order, using code point order: {e}")
+            try:
+                await conn.rollback()
+            except Exception:
+                pass
+            collation_order = None
+        
+        engine = SummaryEngine(snapshot, collation_order)
+        AnalysisService._summary_engine = engine
+        return engine
+    
+    @staticmethod
+    async def get_sql_summary(conn, variants: List[str]) -> str:
+        """
+        Gets the summary from the generate_summary_section SQL function.
+        
+        Args:
+            conn: Database connection
+            variants: rsids of the report's mutations
             
         Returns:
             Generated summary text
         """
-        variants = [m['rsid'] for m in report_data.get('mutations', [])]
         variants_str = '{' + ','.join(f'"{v}"' for v in variants) + '}'
        
         query = """
@@ -427,40 +971,117 @@ class AnalysisService:
         );
         """
         
+        # Create the SQLAlchemy text object with parameters
+        sql = text(query).bindparams(variants_str=variants_str)
+        
+        # Execute the query
+        result = await conn.execute(sql)
+        
+        # Try to get the scalar result
         try:
-            # Create the SQLAlchemy text object with parameters
-            sql = text(query).bindparams(variants_str=variants_str)
-            
-            # Execute the query
-            result = await conn.execute(sql)
+            # First try scalar() method
+            return result.scalar()
+        except (AttributeError, TypeError):
+            # If that fails, try to get the first element of the first row
+            # For tuple-like results
+            row = result.fetchone()
+            if row:
+                return row[0]
+            raise ValueError("No summary generated")
+    
+    @staticmethod
+    async def get_dynamic_summary(conn, report_data: Dict[str, Any]) -> str:
+        """
+        Gets the dynamically generated summary, from the engine chosen by SUMMARY_ENGINE
+        
+        Args:
+            conn: Database connection
+            report_data: Complete report data
             
-            # Try to get the scalar result
-            try:
-                # First try scalar() method
-                summary = result.scalar()
-            except (AttributeError, TypeError):
-                # If that fails, try to get the first element of the first row
-                # For tuple-like results
-                row = result.fetchone()
-                if row:
-                    summary = row[0]
-                else:
-                    raise ValueError("No summary generated")
-                    
+        Returns:
+            Generated summary text
+        """
+        variants = [m['rsid'] for m in report_data.get('mutations', [])]
+        
+        try:
+            if settings.SUMMARY_ENGINE == "python":
+                engine = await AnalysisService.get_summary_engine(conn)
+                summary = engine.summarize(variants)
+            else:
+                summary = await AnalysisService.get_sql_summary(conn, variants)
         except Exception as e:
             logger.error(f"Error generating summary: {e}")
-            summary = "Your genes reveal how your skin naturally behaves. This report guides you on how to optimize your skincare based on your genetics."
+            summary = DEFAULT_SUMMARY
         
         return summary
     
     @staticmethod
-    async def process_snp_data(parsed_snps: List[Dict[str, Any]], db: AsyncSession) -> Dict[str, Any]:
+    async def get_dynamic_summaries(conn, reports: List[Dict[str, Any]]) -> List[str]:
+        """
+        Gets the summaries for many reports.
+        
+        With SUMMARY_ENGINE=python they are generated in process; otherwise
+        each distinct set of variants is sent to the SQL functions in a
+        single query, falling back to one get_dynamic_summary per set if the
+        batched query fails.
+        
+        Args:
+            conn: Database connection
+            reports: Complete report data, one per genome
+            
+        Returns:
+            Summary text for each report, in order
+        """
+        variant_sets = [tuple(m['rsid'] for m in report.get('mutations', [])) for report in reports]
+        distinct = list(dict.fromkeys(variant_sets))
+        if not distinct:
+            return []
+        
+        if settings.SUMMARY_ENGINE == "python":
+            try:
+                engine = await AnalysisService.get_summary_engine(conn)
+                return [engine.summarize(variants) for variants in variant_sets]
+            except Exception as e:
+                logger.error(f"Error generating summaries: {e}")
+                return [DEFAULT_SUMMARY] * len(variant_sets)
+        
+        query = """
+        SELECT batch.key, generate_summary_section(
+            batch.variants,
+            (SELECT findings FROM generate_genetic_analysis_section(batch.variants))
+        )
+        FROM jsonb_to_recordset(CAST(:batch AS jsonb)) AS batch(key int, variants text[])
+        """
+        batch = json.dumps([{"key": key, "variants": list(variants)} for key, variants in enumerate(distinct)])
+        
+        try:
+            result = await conn.execute(text(query), {"batch": batch})
+            summaries = {distinct[row[0]]: row[1] or DEFAULT_SUMMARY for row in result.fetchall()}
+            logger.info(f"Generated {len(summaries)} summaries for {len(reports)} reports in one query")
+        except Exception as e:
+            logger.error(f"Error generating batched summaries, falling back to one query each: {e}")
+            try:
+                await conn.rollback()
+            except Exception:
+                pass
+            summaries = {}
+            for variants in distinct:
+                mutations = [{'rsid': rsid} for rsid in variants]
+                summaries[variants] = await AnalysisService.get_dynamic_summary(conn, {'mutations': mutations})
+        
+        return [summaries.get(variants, DEFAULT_SUMMARY) for variants in variant_sets]
+    
+    @staticmethod
+    async def process_snp_data(parsed_snps: Union[GenotypeData, List[Dict[str, Any]]], db: AsyncSession,
+                               force_refresh: bool = False) -> Dict[str, Any]:
         """
         Processes SNP data and creates a complete analysis report.
         
         Args:
-            parsed_snps: List of SNP dictionaries from the DNA file
+            parsed_snps: GenotypeData or list of SNP dictionaries from the DNA file
             db: Database session
+            force_refresh: Don't reuse the report shared by the genotype profile;
+                the fresh report replaces it
             
         Returns:
             Complete report data structure
@@ -468,95 +1089,40 @@ class AnalysisService:
         logger.info(f"Assembling report data for {len(parsed_snps)} SNPs")
         start_time = time.time()
         
-        # Extract rsids from parsed SNPs
-        rsids = [snp['rsid'] for snp in parsed_snps]
-        
         # Use the connection from the session - now awaiting it properly
         conn = await db.connection()
         
-        # Use the optimized batch query to get SNP details
-        logger.info("Fetching SNP details in batch")
-        snp_details = await AnalysisService.get_batch_snp_details(conn, rsids)
-        
-        # Initialize report structure
-        report = {
-            'mutations': [],
-            'ingredient_recommendations': {
-                'prioritize': [],
-                'caution': []
-            }
-        }
-        
-        # Filter SNPs that match user's risk allele
-        matching_snps = []
-        matching_snp_ids = []
-        
-        for snp in parsed_snps:
-            # Skip if not in our database
-            if snp['rsid'] not in snp_details:
-                continue
-                
-            snp_detail = snp_details[snp['rsid']]
-            user_alleles = [snp['allele1'].upper(), snp['allele2'].upper()]
-            risk_allele = snp_detail['risk_allele'].upper()
-            
-            # Skip if risk allele not present
-            if risk_allele not in user_alleles:
-                continue
-                
-            # Store matching SNPs and their IDs
-            matching_snps.append({
-                'parsed_snp': snp,
-                'snp_detail': snp_detail
-            })
-            matching_snp_ids.append(snp_detail['snp_id'])
-        
-        logger.info(f"Found {len(matching_snps)} SNPs with matching risk alleles")
-        
-        if not matching_snps:
+        # Every panel SNP and genotype was joined and compiled ahead of time,
+        # so this is a lookup per panel SNP
+        logger.info("Matching SNPs against reference panel")
+        snapshot = await AnalysisService.get_reference_snapshot(conn)
+        report = snapshot.analyze(parsed_snps)
+        
+        logger.info(f"Found {len(report['mutations'])} SNPs with matching risk alleles")
+        
+        # Genomes with the same carrier calls share one finished report
+        report['fingerprint'] = snapshot.fingerprint(report)
+        report['reference_version'] = snapshot.version
+        shared_report = None if force_refresh else AnalysisService.get_cached_profile(report['fingerprint'])
+        if shared_report is not None:
+            logger.info(f"Reusing the report for genotype profile {report['fingerprint']}")
+            # The fingerprint covers the version, so the shared report was made against it
+            shared_report['reference_version'] = snapshot.version
+            return shared_report
+        
+        if not report['mutations']:
             logger.info("No matching SNPs found")
+            AnalysisService.cache_profile(report, overwrite=force_refresh)
             return report
         
-        # Batch fetch characteristics and ingredients
-        characteristics_by_snp = await AnalysisService.get_batch_characteristics(conn, matching_snp_ids)
-        ingredients_by_snp = await AnalysisService.get_batch_ingredients(conn, matching_snp_ids)
-        
-        # Assemble the report
-        for match in matching_snps:
-            snp = match['parsed_snp']
-            snp_detail = match['snp_detail']
-            snp_id = snp_detail['snp_id']
-            
-            # Get characteristics
-            characteristics = characteristics_by_snp.get(snp_id, [])
-            
-            # Create mutation entry
-            mutation = {
-                'gene': snp_detail['gene'],
-                'rsid': snp['rsid'],
-                'allele1': snp['allele1'],
-                'allele2': snp['allele2'],
-                'risk_allele': snp_detail['risk_allele'],
-                'effect': snp_detail['effect'],
-                'evidence_strength': snp_detail['evidence_strength'],
-                'category': snp_detail['category'],
-                'characteristics': characteristics
-            }
-            report['mutations'].append(mutation)
-            
-            # Add ingredients if available
-            if snp_id in ingredients_by_snp:
-                beneficials, cautions = ingredients_by_snp[snp_id]
-                report['ingredient_recommendations']['prioritize'].extend(beneficials)
-                report['ingredient_recommendations']['caution'].extend(cautions)
-        
         # Get a dynamic summary if enough mutations found
         if len(report['mutations']) > 0:
             try:
                 report['summary'] = await AnalysisService.get_dynamic_summary(conn, report)
             except Exception as e:
                 logger.error(f"Error getting dynamic summary: {e}")
-                report['summary'] = "Your genes reveal how your skin naturally behaves. This report guides you on how to optimize your skincare based on your genetics."
+                report['summary'] = DEFAULT_SUMMARY
+        AnalysisService.cache_profile(report, overwrite=force_refresh)
         
         # Calculate and log performance metrics
         elapsed_time = time.time() - start_time
@@ -568,28 +1134,88 @@ class AnalysisService:
         return report
     
     @staticmethod
-    def get_cached_analysis(file_hash: str) -> Optional[Dict[str, Any]]:
+    def get_cached_profile(fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve the shared report for a genotype profile.
+        
+        Args:
+            fingerprint: Profile fingerprint from ReferenceSnapshot.fingerprint
+            
+        Returns:
+            The cached report if available, None otherwise
+        """
+        return DNAService.load_from_cache(f"profile_{fingerprint}")
+    
+    @staticmethod
+    def cache_profile(analysis_data: Dict[str, Any], overwrite: bool = False) -> bool:
+        """
+        Cache a finished report under its genotype profile fingerprint.
+        
+        The entry is shared by every genome with the profile, so a report
+        whose summary fell back to DEFAULT_SUMMARY (after a failed summary
+        query) is not cached; the next analysis of the profile retries it.
+        
+        Args:
+            analysis_data: Report with a 'fingerprint'
+            overwrite: Replace an existing entry, as after a forced refresh
+            
+        Returns:
+            True if the profile has a cached report
+        """
+        if analysis_data.get('mutations') and analysis_data.get('summary') == DEFAULT_SUMMARY:
+            logger.warning(f"Not caching genotype profile {analysis_data['fingerprint']} with the default summary")
+            return False
+        cache_key = f"profile_{analysis_data['fingerprint']}"
+        if overwrite or not DNAService.get_cache_path(cache_key).exists():
+            DNAService.save_to_cache(analysis_data, cache_key)
+        return True
+    
+    @staticmethod
+    def get_cached_analysis(file_hash: str, reference_version: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Retrieve cached analysis results for a given file hash.
         
         Args:
             file_hash: Hash of the DNA file
+            reference_version: If given, results made against any other
+                reference data version (as from get_reference_version) are ignored
             
         Returns:
             The cached analysis data if available, None otherwise
         """
-        return DNAService.load_from_cache(f"analysis_{file_hash}")
+        cached = DNAService.load_from_cache(f"analysis_{file_hash}")
+        if (reference_version is not None and isinstance(cached, dict)
+                and cached.get('reference_version') != reference_version):
+            logger.info(f"Cached analysis for {file_hash} predates reference data version {reference_version}")
+            return None
+        if isinstance(cached, dict) and 'mutations' not in cached and 'profile' in cached:
+            # Pointer to the report shared by every genome with this profile
+            return AnalysisService.get_cached_profile(cached['profile'])
+        return cached
     
     @staticmethod
     def cache_analysis_results(file_hash: str, analysis_data: Dict[str, Any]) -> None:
         """
         Cache analysis results for future use.
         
+        Reports with a fingerprint are stored once per genotype profile and
+        the file hash only keeps a pointer, so the cache grows with distinct
+        profiles rather than with uploads. Nothing is cached when the
+        profile can't be (see cache_profile).
+        
         Args:
             file_hash: Hash of the DNA file
             analysis_data: Analysis results to cache
         """
-        DNAService.save_to_cache(analysis_data, f"analysis_{file_hash}")
+        if analysis_data.get('fingerprint'):
+            if not AnalysisService.cache_profile(analysis_data):
+                return
+            DNAService.save_to_cache({
+                'profile': analysis_data['fingerprint'],
+                'reference_version': analysis_data.get('reference_version'),
+            }, f"analysis_{file_hash}")
+        else:
+            DNAService.save_to_cache(analysis_data, f"analysis_{file_hash}")
     
     @staticmethod
     async def record_analysis(db: AsyncSession, file_hash: Optional[str], analysis_data: Dict[str, Any]) -> str:
@@ -667,6 +1293,49 @@ class AnalysisService:
                 logger.error(f"Alternative insertion failed: {str(alt_error)}")
                 raise e
     
+    @staticmethod
+    async def record_analyses(db: AsyncSession, entries: List[Tuple[Optional[str], Dict[str, Any]]]) -> List[str]:
+        """
+        Record many analyses with a single multi-row insert and commit.
+        
+        Args:
+            db: Database session
+            entries: (file_hash, analysis_data) pairs
+            
+        Returns:
+            IDs of the created analysis records, in order
+        """
+        if not entries:
+            return []
+        
+        created_at_str = datetime.now().isoformat()
+        params = [
+            {
+                "analysis_id": str(uuid.uuid4()),
+                "file_hash": file_hash,
+                "data": json.dumps(analysis_data),
+                "created_at": created_at_str,
+                "status": "completed"
+            }
+            for file_hash, analysis_data in entries
+        ]
+        
+        query = """
+        INSERT INTO analyses (analysis_id, file_hash, data, created_at, status)
+        VALUES (:analysis_id, :file_hash, :data, :created_at, :status)
+        """
+        
+        try:
+            await db.execute(text(query), params)
+            await db.commit()
+        except Exception as e:
+            logger.error(f"Error inserting {len(params)} analysis records: {str(e)}")
+            await db.rollback()
+            raise
+        
+        logger.info(f"Inserted {len(params)} analysis records")
+        return [p["analysis_id"] for p in params]
+    
     @staticmethod
     async def get_analysis_by_id(analysis_id: str, db: AsyncSession) -> Optional[Dict[str, Any]]:
         """
@@ -0,0 +1,293 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.dna_service import DNAService
+from app.services.analysis_service import AnalysisService
+from app.services.pipeline_service import PipelineService
+from app.services.reference_snapshot import ReferenceSnapshot
+
+logger = logging.getLogger(__name__)
+
+# (file_hash, file_path, raw_snp_data): a stored genome or a raw dataset to analyse
+BatchJob = Tuple[Optional[str], Optional[str], Optional[List[Dict[str, Any]]]]
+
+# Snapshot held by each pool worker, installed once by _init_worker
+_worker_snapshot: Optional[ReferenceSnapshot] = None
+
+
+def _init_worker(snapshot: ReferenceSnapshot) -> None:
+    global _worker_snapshot
+    _worker_snapshot = snapshot
+
+
+def _pooled_job(job: BatchJob) -> Dict[str, Any]:
+    return run_job(_worker_snapshot, job)
+
+
+def run_job(snapshot: ReferenceSnapshot, job: BatchJob) -> Dict[str, Any]:
+    """
+    Load (or parse) one genome and match it against the reference snapshot.
+
+    Args:
+        snapshot: Compiled reference panel
+        job: (file_hash, file_path, raw_snp_data)
+
+    Returns:
+        Report dictionary with 'mutations' and 'ingredient_recommendations'
+    """
+    file_hash, file_path, raw_snp_data = job
+    if raw_snp_data is not None:
+        return snapshot.analyze(raw_snp_data)
+
+    genome = DNAService.load_cached_snp_data(file_hash, snapshot.rsids)
+    if genome is None:
+        if file_path is None:
+            raise ValueError(f"No DNA data found for file hash: {file_hash}")
+        genome = DNAService.read_dna_file(file_path, use_cache=True, panel_rsids=snapshot.rsids, file_hash=file_hash)
+    return snapshot.analyze(genome)
+
+
+class BatchAnalysisService:
+    """
+    Analysis of many genomes per request, for partner lab submissions.
+
+    The reference snapshot is resolved once per batch and handed to a pool
+    of worker processes when the pool starts, so the CPU-bound part (parsing
+    uncached files and matching) scales with cores without re-sending the
+    panel with every genome. Genomes that share a genotype profile share one
+    report, summaries are generated in one pass over the distinct variant
+    sets and the analyses recorded with one multi-row insert. Failures are
+    reported per item and never fail the batch.
+    """
+    _pool: Optional[ProcessPoolExecutor] = None
+    _pool_snapshot: Optional[ReferenceSnapshot] = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def worker_count() -> int:
+        """Number of worker processes, from ANALYSIS_BATCH_WORKERS (0 means one per CPU)."""
+        return settings.ANALYSIS_BATCH_WORKERS or os.cpu_count() or 1
+
+    @staticmethod
+    def get_pool(snapshot: ReferenceSnapshot) -> ProcessPoolExecutor:
+        """
+        Get the worker pool for a snapshot, replacing the pool when the snapshot changes.
+
+        Args:
+            snapshot: Reference snapshot the workers should hold
+
+        Returns:
+            ProcessPoolExecutor whose workers have the snapshot installed
+        """
+        with BatchAnalysisService._pool_lock:
+            if BatchAnalysisService._pool is None or BatchAnalysisService._pool_snapshot is not snapshot:
+                if BatchAnalysisService._pool is not None:
+                    # Jobs already submitted finish on the old workers
+                    BatchAnalysisService._pool.shutdown(wait=False)
+                workers = BatchAnalysisService.worker_count()
+                BatchAnalysisService._pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(snapshot,),
+                )
+                BatchAnalysisService._pool_snapshot = snapshot
+                logger.info(f"Started batch analysis pool with {workers} workers")
+            return BatchAnalysisService._pool
+
+    @staticmethod
+    def shutdown() -> None:
+        """Stop the worker pool, if one was started."""
+        with BatchAnalysisService._pool_lock:
+            if BatchAnalysisService._pool is not None:
+                BatchAnalysisService._pool.shutdown(wait=True, cancel_futures=True)
+                BatchAnalysisService._pool = None
+                BatchAnalysisService._pool_snapshot = None
+
+    @staticmethod
+    async def run_jobs(snapshot: ReferenceSnapshot, jobs: List[BatchJob]) -> List[Any]:
+        """
+        Run analysis jobs, on the worker pool when there is more than one.
+
+        Args:
+            snapshot: Compiled reference panel
+            jobs: Jobs to run
+
+        Returns:
+            Report dictionary or exception for each job, in order
+        """
+        if len(jobs) <= 1 or BatchAnalysisService.worker_count() <= 1:
+            def run_inline() -> List[Any]:
+                outcomes = []
+                for job in jobs:
+                    try:
+                        outcomes.append(run_job(snapshot, job))
+                    except Exception as e:
+                        outcomes.append(e)
+                return outcomes
+            return await run_in_threadpool(run_inline)
+
+        pool = BatchAnalysisService.get_pool(snapshot)
+        loop = asyncio.get_running_loop()
+        outcomes = await asyncio.gather(
+            *(loop.run_in_executor(pool, _pooled_job, job) for job in jobs),
+            return_exceptions=True
+        )
+        if any(isinstance(outcome, BrokenProcessPool) for outcome in outcomes):
+            logger.error("Batch analysis pool broke; it will be restarted for the next batch")
+            with BatchAnalysisService._pool_lock:
+                if BatchAnalysisService._pool is pool:
+                    BatchAnalysisService._pool = None
+                    BatchAnalysisService._pool_snapshot = None
+        return outcomes
+
+    @staticmethod
+    async def process_batch(items: List[Dict[str, Any]], db: AsyncSession,
+                            force_refresh: bool = False) -> Dict[str, Any]:
+        """
+        Analyse a batch of genomes.
+
+        Args:
+            items: Dictionaries with either 'file_hash' or 'raw_snp_data'
+            db: Database session
+            force_refresh: Ignore cached analyses and shared profile reports,
+                replacing them with the fresh ones
+
+        Returns:
+            Dictionary with per-item 'results', 'succeeded', 'failed' and 'processing_time'
+        """
+        if not items:
+            raise ValueError("Batch contains no items")
+        if len(items) > settings.ANALYSIS_BATCH_MAX_ITEMS:
+            raise ValueError(f"Batch too large; maximum is {settings.ANALYSIS_BATCH_MAX_ITEMS} items")
+
+        start_time = time.time()
+        results: List[Dict[str, Any]] = [
+            {"index": index, "file_hash": item.get("file_hash"), "status": "error"}
+            for index, item in enumerate(items)
+        ]
+        reports: List[Optional[Dict[str, Any]]] = [None] * len(items)
+
+        hashes = []
+        for index, item in enumerate(items):
+            if bool(item.get("file_hash")) == (item.get("raw_snp_data") is not None):
+                results[index]["error"] = "Exactly one of file_hash or raw_snp_data must be provided"
+            elif item.get("file_hash") and item["file_hash"] not in hashes:
+                hashes.append(item["file_hash"])
+
+        # Eager runs started at upload time are about to fill the caches
+        await asyncio.gather(*(PipelineService.join(file_hash) for file_hash in hashes))
+
+        conn = await db.connection()
+        snapshot = await AnalysisService.get_reference_snapshot(conn)
+
+        # Each stored genome is analysed once, however often it appears
+        jobs: List[BatchJob] = []
+        job_keys: List[Any] = []
+        by_hash: Dict[str, Dict[str, Any]] = {}
+        cached_hashes = set()
+        for file_hash in hashes:
+            cached = None if force_refresh else AnalysisService.get_cached_analysis(file_hash, snapshot.version)
+            if cached is not None:
+                by_hash[file_hash] = cached
+                cached_hashes.add(file_hash)
+                continue
+            file_path = await DNAService.resolve_file_path(file_hash, db)
+            jobs.append((file_hash, file_path, None))
+            job_keys.append(file_hash)
+        for index, item in enumerate(items):
+            if "error" not in results[index] and item.get("raw_snp_data") is not None:
+                jobs.append((None, None, item["raw_snp_data"]))
+                job_keys.append(index)
+
+        logger.info(f"Batch of {len(items)} items: {len(cached_hashes)} cached, {len(jobs)} to analyse")
+        outcomes = await BatchAnalysisService.run_jobs(snapshot, jobs)
+
+        # Genomes with the same genotype profile share one report
+        profiles: Dict[str, Dict[str, Any]] = {}
+        fresh = []
+        job_errors: Dict[Any, str] = {}
+        for key, outcome in zip(job_keys, outcomes):
+            if isinstance(outcome, BaseException):
+                job_errors[key] = str(outcome) or type(outcome).__name__
+                continue
+            fingerprint = snapshot.fingerprint(outcome)
+            report = profiles.get(fingerprint)
+            if report is None and not force_refresh:
+                report = AnalysisService.get_cached_profile(fingerprint)
+            if report is None:
+                report = outcome
+                report['fingerprint'] = fingerprint
+                fresh.append(report)
+            report['reference_version'] = snapshot.version
+            profiles[fingerprint] = report
+            if isinstance(key, str):
+                by_hash[key] = report
+            else:
+                reports[key] = report
+
+        # One summary query for every distinct variant set in the batch
+        summarized = [report for report in fresh if report['mutations']]
+        if summarized:
+            summaries = await AnalysisService.get_dynamic_summaries(conn, summarized)
+            for report, summary in zip(summarized, summaries):
+                report['summary'] = summary
+
+        # Reports whose summary fell back to the default are left uncached
+        for report in fresh:
+            AnalysisService.cache_profile(report, overwrite=force_refresh)
+        for file_hash, report in by_hash.items():
+            if file_hash not in cached_hashes:
+                AnalysisService.cache_analysis_results(file_hash, report)
+
+        recorded = []
+        for index, item in enumerate(items):
+            if "error" in results[index]:
+                continue
+            key = item.get("file_hash") or index
+            if key in job_errors:
+                results[index]["error"] = job_errors[key]
+                continue
+            if item.get("file_hash"):
+                reports[index] = by_hash[item["file_hash"]]
+            recorded.append(index)
+
+        try:
+            analysis_ids = await AnalysisService.record_analyses(
+                db, [(items[index].get("file_hash"), reports[index]) for index in recorded]
+            )
+        except Exception as db_error:
+            logger.error(f"Failed to record batch analyses in DB: {str(db_error)}")
+            # Generate IDs if DB insertion fails, as /process does
+            analysis_ids = [str(uuid.uuid4()) for _ in recorded]
+
+        for index, analysis_id in zip(recorded, analysis_ids):
+            results[index].update(
+                status="success",
+                analysis_id=analysis_id,
+                snp_count=len(reports[index].get("mutations", [])),
+                cached=results[index]["file_hash"] in cached_hashes,
+            )
+
+        elapsed_time = time.time() - start_time
+        succeeded = len(recorded)
+        logger.info(f"Batch analysis of {len(items)} items completed in {elapsed_time:.2f}s "
+                    f"({succeeded} succeeded, {len(items) - succeeded} failed)")
+        return {
+            "results": results,
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+            "processing_time": elapsed_time,
+        }
@@ -1,28 +1,49 @@
 import os
+import re
+import base64
 import hashlib
 import time
 import logging
 import pickle
+import tempfile
 import pandas as pd
 from pathlib import Path
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Tuple, AbstractSet
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 
 from app.db.models.dna_file import DNAFile
 from app.core.config import settings
+from app.services.genotype_data import GenotypeData
+from app.services.upload_store import UploadStore
+from app.services.panel_genotypes import PanelGenotypes
+from app.services.genome_parser import GenomeIngestor, GenomeIngestResult, detect_columns
+from app.services.genome_cache import (
+    GenomeCacheError, write_genome_cache, read_genome_cache, read_genome_cache_header
+)
 
 logger = logging.getLogger(__name__)
 
 # Create cache directory if it doesn't exist
 os.makedirs(settings.CACHE_DIR, exist_ok=True)
 
+class HashMismatchError(ValueError):
+    """Uploaded content doesn't match the sha256 the client declared for it."""
+
 class DNAService:
     """
     Service for handling DNA file operations including parsing, validation,
     and storage.
     """
+    # Negative lookup cache for resolve_file_path: file_hash -> expiry (monotonic seconds)
+    _missing_hashes: "OrderedDict[str, float]" = OrderedDict()
+    _MISSING_HASHES_MAX = 10000
+    _HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+    # {hash[:8]}_{filename}, as stored by the upload path before the upload store
+    _LEGACY_UPLOAD_PATTERN = re.compile(r'[0-9a-f]{8}_(.+\.txt)')
     
     @staticmethod
     def compute_file_hash_from_content(content: bytes) -> str:
@@ -63,7 +84,7 @@ class DNAService:
         
         Args:
             file_hash: Hash of the file content
-            format_type: Type of cache file ('json', 'pdf', 'md')
+            format_type: Type of cache file ('json', 'genome', 'pdf', 'md')
             
         Returns:
             Path: Path object for the cache file
@@ -74,19 +95,37 @@ class DNAService:
         else:
             return Path(settings.CACHE_DIR) / f"{file_hash}.{format_type}"
     
+    @staticmethod
+    def get_panel_cache_key(file_hash: str, panel_rsids: AbstractSet[str]) -> str:
+        """
+        Get the cache key for a genome filtered down to a reference panel.
+        
+        Args:
+            file_hash: Hash of the file content
+            panel_rsids: rsids of the reference panel
+            
+        Returns:
+            str: Cache key that changes whenever the panel changes
+        """
+        panel_digest = hashlib.sha256('\n'.join(sorted(panel_rsids)).encode()).hexdigest()
+        return f"{file_hash}_panel_{panel_digest[:16]}"
+    
     @staticmethod
     def save_to_cache(data: Any, file_hash: str, format_type: str = 'json') -> None:
         """
         Save data to the cache.
         
         Args:
-            data: Data to cache (dict for 'json', bytes for 'pdf'/'md')
+            data: Data to cache (dict for 'json', GenotypeData for 'genome', bytes for 'pdf'/'md')
             file_hash: Hash of the file content
-            format_type: Type of data being cached ('json', 'pdf', 'md')
+            format_type: Type of data being cached ('json', 'genome', 'pdf', 'md')
         """
         cache_path = DNAService.get_cache_path(file_hash, format_type)
         
-        if format_type == 'json':
+        if format_type == 'genome':
+            # Versioned columnar format that load_from_cache can memory-map
+            write_genome_cache(cache_path, data, file_hash)
+        elif format_type == 'json':
             # Save metadata with the cache
             cache_data = {
                 'data': data,
@@ -109,7 +148,7 @@ class DNAService:
         
         Args:
             file_hash: Hash of the file content
-            format_type: Type of data to load ('json', 'pdf', 'md')
+            format_type: Type of data to load ('json', 'genome', 'pdf', 'md')
             
         Returns:
             The cached data if available and not expired, None otherwise
@@ -126,7 +165,17 @@ class DNAService:
             cache_path.unlink(missing_ok=True)
             return None
         
-        if format_type == 'json':
+        if format_type == 'genome':
+            try:
+                # Zero-copy: the arrays are views into a read-only mapping of the file
+                data, header = read_genome_cache(cache_path)
+                logger.info(f"Mapped genome cache from {cache_path}, created at {header['timestamp']}")
+                return data
+            except (GenomeCacheError, OSError, ValueError) as e:
+                logger.warning(f"Error loading genome cache: {e}")
+                cache_path.unlink(missing_ok=True)
+                return None
+        elif format_type == 'json':
             try:
                 with open(cache_path, 'rb') as f:
                     cache_data = pickle.load(f)
@@ -148,6 +197,41 @@ class DNAService:
                 cache_path.unlink(missing_ok=True)
                 return None
                 
+    @staticmethod
+    def load_genome_from_cache(cache_key: str) -> Optional[GenotypeData]:
+        """
+        Load a parsed genome from the cache, migrating legacy pickle entries.
+        
+        Entries written before the binary genome format are pickled under the
+        'json' format type. They are converted, rewritten as 'genome' and the
+        old file is removed, so each legacy entry is unpickled at most once.
+        
+        Args:
+            cache_key: Hash of the file content, or a panel cache key
+            
+        Returns:
+            GenotypeData if cached and not expired, None otherwise
+        """
+        data = DNAService.load_from_cache(cache_key, format_type='genome')
+        if data is not None:
+            return data
+        
+        legacy_data = DNAService.load_from_cache(cache_key)
+        if legacy_data is None:
+            return None
+        
+        if not isinstance(legacy_data, GenotypeData):
+            try:
+                legacy_data = GenotypeData.from_records(legacy_data)
+            except (TypeError, KeyError, AttributeError) as e:
+                logger.warning(f"Legacy cache entry {cache_key} is not SNP data: {e}")
+                return None
+        
+        DNAService.save_to_cache(legacy_data, cache_key, format_type='genome')
+        DNAService.delete_from_cache(cache_key)
+        logger.info(f"Migrated legacy pickle cache entry {cache_key} to the genome format")
+        return legacy_data
+    
     @staticmethod
     def get_cache_metadata(file_hash: str, format_type: str = 'json') -> Optional[Dict[str, Any]]:
         """
@@ -170,7 +254,26 @@ class DNAService:
         file_age = datetime.now() - datetime.fromtimestamp(stats.st_mtime)
         is_expired = file_age > settings.CACHE_EXPIRY
         
-        if format_type == 'json':
+        if format_type == 'genome':
+            try:
+                # Only the fixed header is read
+                header = read_genome_cache_header(cache_path)
+                
+                return {
+                    'file_hash': file_hash,
+                    'format': format_type,
+                    'size': stats.st_size,
+                    'created_at': header['timestamp'],
+                    'modified_at': datetime.fromtimestamp(stats.st_mtime).isoformat(),
+                    'age_days': file_age.days,
+                    'expired': is_expired,
+                    'path': str(cache_path),
+                    'snp_count': header['row_count'],
+                    'format_version': header['version']
+                }
+            except (GenomeCacheError, OSError) as e:
+                logger.warning(f"Error reading genome cache metadata: {e}")
+        elif format_type == 'json':
             try:
                 # For JSON, try to get the timestamp from the cached data
                 with open(cache_path, 'rb') as f:
@@ -237,7 +340,7 @@ class DNAService:
         Returns:
             Dict with cache metadata if available, None otherwise
         """
-        cached_data = DNAService.load_from_cache(file_hash)
+        cached_data = DNAService.load_genome_from_cache(file_hash)
         if cached_data is not None:
             return {
                 "snp_count": len(cached_data),
@@ -260,70 +363,243 @@ class DNAService:
         if not os.path.isfile(filepath):
             raise FileNotFoundError("The file does not exist")
     
-        # Define possible sets of valid columns
-        valid_columns_set1 = ['rsid', 'chromosome', 'position', 'allele1', 'allele2']
-        valid_columns_set2 = ['rsid', 'chromosome', 'position', 'genotype']
-    
-        # Read the first 100 lines of the file
+        # Check the first 100 lines for a known set of column names
         with open(filepath, 'r') as file:
-            for i, line in enumerate(file):
-                if i >= 100:
-                    break
-                # Check if all valid columns from set 1 are in the line
-                if all(column in line for column in valid_columns_set1):
-                    return valid_columns_set1
-                # Check if all valid columns from set 2 are in the line
-                if all(column in line for column in valid_columns_set2):
-                    return valid_columns_set2
+            return detect_columns(file)
+    
+    @staticmethod
+    def ingest_file(filepath: str, panel_rsids: Optional[AbstractSet[str]] = None) -> GenomeIngestResult:
+        """
+        Hash, detect the format of and parse a DNA file in a single read.
+        
+        Args:
+            filepath: Path to the DNA file
+            panel_rsids: If given, only SNPs with these rsids are parsed
+            
+        Returns:
+            GenomeIngestResult with the sha256, column layout and GenotypeData
+        """
+        ingestor = GenomeIngestor(settings.DNA_PARSER_BLOCK_SIZE, panel_rsids)
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(settings.DNA_PARSER_BLOCK_SIZE), b''):
+                ingestor.feed(chunk)
+        return ingestor.finish()
     
-        return []
+    @staticmethod
+    async def stream_upload(upload, filename: str,
+                            expected_hash: Optional[str] = None) -> Tuple[GenomeIngestResult, Path, bool]:
+        """
+        Stream an uploaded DNA file into the content-addressed upload store in one pass.
+        
+        The upload is read in UPLOAD_CHUNK_SIZE chunks; each chunk is hashed,
+        parsed and written to a temporary file in UPLOADS_DIR, which is moved
+        into the store once the hash is known. Only one chunk of raw bytes is
+        held in memory at a time.
+        
+        Args:
+            upload: Object with an async read(size) method, e.g. a FastAPI UploadFile
+            filename: Original filename, recorded as metadata
+            expected_hash: sha256 declared by the client; the upload is
+                rejected, and nothing stored, if the content doesn't match
+            
+        Returns:
+            Tuple of (GenomeIngestResult, stored path, True if the content was already stored)
+        """
+        uploads_dir = Path(settings.UPLOADS_DIR)
+        ingestor = GenomeIngestor(settings.DNA_PARSER_BLOCK_SIZE)
+        
+        def consume(out, chunk: bytes) -> None:
+            ingestor.feed(chunk)
+            out.write(chunk)
+        
+        fd, temp_path = tempfile.mkstemp(dir=uploads_dir, prefix='.upload-', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = await upload.read(settings.UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    # Parsing and disk writes stay off the event loop
+                    await run_in_threadpool(consume, out, chunk)
+            
+            result = await run_in_threadpool(ingestor.finish)
+            if expected_hash and expected_hash.lower() != result.file_hash:
+                raise HashMismatchError(f"File hash {result.file_hash} does not match declared hash {expected_hash}")
+            stored_path, deduplicated = UploadStore.add(temp_path, result.file_hash, filename, result.size)
+            DNAService.forget_missing(result.file_hash)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        
+        logger.info(f"Streamed {result.size} bytes for {result.file_hash} (deduplicated: {deduplicated})")
+        return result, stored_path, deduplicated
     
     @staticmethod
-    def read_dna_file(filepath: str, use_cache: bool = True) -> List[Dict[str, Any]]:
+    def find_parsed_upload(file_hash: str) -> Optional[Tuple[GenomeIngestResult, Path]]:
+        """
+        Look up content that is already stored and parsed, so it needn't be sent again.
+        
+        Args:
+            file_hash: sha256 declared by the client
+            
+        Returns:
+            Tuple of (GenomeIngestResult rebuilt from the genome cache, stored path),
+            or None if the content isn't stored or hasn't been parsed
+        """
+        if not DNAService._HASH_PATTERN.fullmatch(file_hash):
+            return None
+        
+        stored_path = UploadStore.find(file_hash)
+        if stored_path is None:
+            return None
+        
+        data = DNAService.load_genome_from_cache(file_hash)
+        if data is None:
+            return None
+        
+        # Only the header lines are read to recover the format
+        columns = DNAService.verify_dna_file_format(str(stored_path))
+        result = GenomeIngestResult(file_hash, stored_path.stat().st_size, columns, data)
+        return result, stored_path
+    
+    @staticmethod
+    async def get_upload_status(file_hash: str, db: Optional[AsyncSession]) -> Optional[Dict[str, Any]]:
+        """
+        Report whether content is known and how far it has been processed.
+        
+        Args:
+            file_hash: Hash of the file content
+            db: Database session (optional)
+            
+        Returns:
+            Dictionary with storage, parse and index status, or None if the hash is unknown
+        """
+        if not DNAService._HASH_PATTERN.fullmatch(file_hash):
+            return None
+        
+        stored_path = UploadStore.find(file_hash)
+        metadata = UploadStore.get_metadata(file_hash) if stored_path is not None else None
+        genome_cache = DNAService.get_cache_metadata(file_hash, 'genome')
+        
+        record = None
+        if db is not None:
+            try:
+                result = await db.execute(
+                    text("""
+                    SELECT id, filename, file_format, snp_count, status, created_at
+                    FROM dna_files WHERE file_hash = :file_hash
+                    """),
+                    {"file_hash": file_hash}
+                )
+                row = result.first()
+                if row is not None:
+                    record = {
+                        "id": row.id,
+                        "filename": row.filename,
+                        "file_format": row.file_format,
+                        "snp_count": row.snp_count,
+                        "status": row.status,
+                        "created_at": row.created_at.isoformat() if row.created_at else None
+                    }
+            except Exception as e:
+                logger.error(f"Error querying database for DNA file: {str(e)}")
+        
+        if stored_path is None and genome_cache is None and record is None:
+            return None
+        
+        return {
+            "file_hash": file_hash,
+            "stored": stored_path is not None,
+            "parsed": genome_cache is not None,
+            "size": metadata['size'] if metadata else None,
+            "filenames": metadata['filenames'] if metadata else [],
+            "first_uploaded_at": metadata.get('first_uploaded_at') if metadata else None,
+            "last_uploaded_at": metadata.get('last_uploaded_at') if metadata else None,
+            "snp_count": genome_cache['snp_count'] if genome_cache else (record or {}).get('snp_count'),
+            "record": record
+        }
+    
+    @staticmethod
+    def read_dna_file(filepath: str, use_cache: bool = True, parser: Optional[str] = None,
+                      panel_rsids: Optional[AbstractSet[str]] = None,
+                      file_hash: Optional[str] = None) -> GenotypeData:
         """
         Reads and parses a DNA file, with optional caching.
         
         Args:
             filepath: Path to the DNA file
             use_cache: Whether to use/update cache (default: True)
+            parser: "streaming" or "pandas"; defaults to settings.DNA_PARSER
+            panel_rsids: If given, only SNPs with these rsids are parsed and cached
+            file_hash: Hash of the file if the caller already knows it, saving a read
             
         Returns:
-            List of dictionaries with SNP data
+            GenotypeData with the parsed SNP calls
         """
         # Check for cached version if caching is enabled
         if use_cache:
-            file_hash = DNAService.compute_file_hash_from_path(filepath)
-            cached_data = DNAService.load_from_cache(file_hash)
+            file_hash = file_hash or DNAService.compute_file_hash_from_path(filepath)
+            cache_key = file_hash if panel_rsids is None else DNAService.get_panel_cache_key(file_hash, panel_rsids)
+            # Panel cache, stored panel genotypes, then a filtered full genome:
+            # each is cheaper than re-reading the file
+            cached_data = DNAService.load_cached_snp_data(file_hash, panel_rsids)
             if cached_data is not None:
                 logger.info(f"Using cached SNP data for {filepath}")
                 return cached_data
         
+        # The panel genotype record covers a superset, so parse for that
+        parse_rsids = panel_rsids
+        if use_cache and panel_rsids is not None:
+            parse_rsids = PanelGenotypes.superset(panel_rsids, file_hash)
+        
         # No cache hit or caching disabled, parse the file
-        logger.info(f"Parsing DNA file: {filepath}")
+        parser = parser or settings.DNA_PARSER
+        logger.info(f"Parsing DNA file with {parser} parser: {filepath}")
         start_time = time.time()
         
-        columns = DNAService.verify_dna_file_format(filepath)
-        if not columns:
-            raise ValueError("The file does not contain the expected columns")
-    
-        # Read the data into a DataFrame
-        df = pd.read_csv(filepath, sep='\t', comment='#', names=columns, dtype=str)
-    
-        # If the file contains a genotype column, split it into allele1 and allele2
-        if 'genotype' in df.columns:
-            df[['allele1', 'allele2']] = df['genotype'].apply(lambda x: pd.Series(list(x)))
-            df.drop(columns=['genotype'], inplace=True)
+        if parser == "streaming":
+            # One read: format detection and fixed-size block parsing with
+            # vectorized genotype splitting; panel filtering happens on the
+            # raw lines before any column splitting
+            result = DNAService.ingest_file(filepath, parse_rsids)
+            if not result.valid:
+                raise ValueError("The file does not contain the expected columns")
+            parsed_data = result.data
+            if use_cache and result.file_hash != file_hash:
+                # File changed between hashing and parsing; cache what was parsed
+                logger.warning(f"File {filepath} changed while being read")
+                file_hash = result.file_hash
+                cache_key = result.file_hash if panel_rsids is None else DNAService.get_panel_cache_key(result.file_hash, panel_rsids)
+        elif parser == "pandas":
+            columns = DNAService.verify_dna_file_format(filepath)
+            if not columns:
+                raise ValueError("The file does not contain the expected columns")
+            
+            # Read the data into a DataFrame
+            df = pd.read_csv(filepath, sep='\t', comment='#', names=columns, dtype=str)
         
-        # Convert to records
-        parsed_data = df.to_dict(orient='records')
+            # If the file contains a genotype column, split it into allele1 and allele2
+            if 'genotype' in df.columns:
+                df[['allele1', 'allele2']] = df['genotype'].apply(lambda x: pd.Series(list(x)))
+                df.drop(columns=['genotype'], inplace=True)
+            
+            # Convert to compact columnar arrays
+            parsed_data = GenotypeData.from_frame(df)
+            if parse_rsids is not None:
+                parsed_data = parsed_data.select(parse_rsids)
+        else:
+            raise ValueError(f"Unknown DNA parser: {parser}")
         
         elapsed_time = time.time() - start_time
-        logger.info(f"Parsed {len(parsed_data)} SNP records from {filepath} in {elapsed_time:.2f}s")
+        logger.info(f"Parsed {len(parsed_data)} SNP records ({parsed_data.nbytes / (1024 * 1024):.1f} MB) from {filepath} in {elapsed_time:.2f}s")
+        
+        if parse_rsids is not panel_rsids:
+            PanelGenotypes.save(file_hash, parsed_data, parse_rsids)
+            parsed_data = parsed_data.select(panel_rsids)
         
         # Cache the parsed data if caching is enabled
         if use_cache:
-            file_hash = DNAService.compute_file_hash_from_path(filepath)
-            DNAService.save_to_cache(parsed_data, file_hash)
+            DNAService.save_to_cache(parsed_data, cache_key, format_type='genome')
             logger.info(f"Cached parsed SNP data for {filepath}")
         
         return parsed_data
@@ -340,176 +616,444 @@ class DNAService:
             Dictionary with validation results and statistics
         """
         try:
-            # Check the file format
-            columns = DNAService.verify_dna_file_format(filepath)
-            format_valid = len(columns) > 0
-            
-            if not format_valid:
-                return {
-                    "valid": False,
-                    "format": "unknown",
-                    "snp_count": 0,
-                    "chromosomes": {},
-                    "statistics": {},
-                    "errors": ["Unrecognized file format"]
-                }
-            
-            # Determine the format name
-            format_name = "AncestryDNA" if 'allele1' in columns else "23andMe"
-            
-            # Parse the file
-            snps = DNAService.read_dna_file(filepath, use_cache=False)
-            
-            # Collect statistics
-            chromosome_counts = {}
-            allele_stats = {'A': 0, 'T': 0, 'G': 0, 'C': 0, 'other': 0}
-            rsid_patterns = {}
-            errors = []
-            
-            # Analyze SNPs
-            for snp in snps:
-                # Count by chromosome
-                chrom = snp.get('chromosome', 'unknown')
-                chromosome_counts[chrom] = chromosome_counts.get(chrom, 0) + 1
-                
-                # Count alleles
-                for allele in [snp.get('allele1', ''), snp.get('allele2', '')]:
-                    if allele in allele_stats:
-                        allele_stats[allele] += 1
-                    else:
-                        allele_stats['other'] += 1
-                
-                # Check rsID pattern (should start with 'rs')
-                rsid = snp.get('rsid', '')
-                if rsid.startswith('rs'):
-                    rsid_patterns['rs'] = rsid_patterns.get('rs', 0) + 1
-                else:
-                    rsid_patterns['other'] = rsid_patterns.get('other', 0) + 1
-            
-            # Check for potential errors
-            if len(snps) < 10000:
-                errors.append("Low SNP count - file may be incomplete")
-            
-            if rsid_patterns.get('other', 0) > rsid_patterns.get('rs', 0) * 0.1:
-                errors.append("Unusual number of non-standard rsIDs")
+            # Hash, detect and parse in one read; the result also warms the cache
+            result = DNAService.ingest_file(filepath)
+            if result.valid:
+                DNAService.save_to_cache(result.data, result.file_hash, format_type='genome')
+            return DNAService.summarize_ingest(result)
             
-            # Compile the validation results
+        except Exception as e:
             return {
-                "valid": True,
-                "format": format_name,
-                "snp_count": len(snps),
-                "chromosomes": chromosome_counts,
-                "statistics": {
-                    "alleles": allele_stats,
-                    "rsid_patterns": rsid_patterns
-                },
-                "errors": errors
+                "valid": False,
+                "format": "unknown",
+                "snp_count": 0,
+                "chromosomes": {},
+                "statistics": {},
+                "errors": [str(e)]
             }
+    
+    @staticmethod
+    def summarize_ingest(result: GenomeIngestResult) -> Dict[str, Any]:
+        """
+        Build the validation report for an ingested DNA file.
+        
+        Args:
+            result: Result of a single-pass ingest
             
-        except Exception as e:
+        Returns:
+            Dictionary with validation results and statistics
+        """
+        if not result.valid:
             return {
                 "valid": False,
                 "format": "unknown",
                 "snp_count": 0,
                 "chromosomes": {},
                 "statistics": {},
-                "errors": [str(e)]
+                "errors": ["Unrecognized file format"]
             }
+        
+        snps = result.data
+        
+        # Collect statistics straight from the genotype arrays
+        chromosome_counts = snps.chromosome_counts()
+        allele_stats = snps.allele_counts()
+        rsid_patterns = snps.rsid_pattern_counts()
+        errors = []
+        
+        # Check for potential errors
+        if len(snps) < 10000:
+            errors.append("Low SNP count - file may be incomplete")
+        
+        if rsid_patterns.get('other', 0) > rsid_patterns.get('rs', 0) * 0.1:
+            errors.append("Unusual number of non-standard rsIDs")
+        
+        # Compile the validation results
+        return {
+            "valid": True,
+            "format": result.format_name,
+            "snp_count": len(snps),
+            "chromosomes": chromosome_counts,
+            "statistics": {
+                "alleles": allele_stats,
+                "rsid_patterns": rsid_patterns
+            },
+            "errors": errors
+        }
     
     @staticmethod
-    async def record_file_upload(db: AsyncSession, filename: str, file_hash: str, snp_count: int) -> DNAFile:
+    async def record_file_upload(db: AsyncSession, filename: str, file_hash: str, snp_count: Optional[int] = None,
+                                 file_path: Optional[str] = None, file_format: Optional[str] = None,
+                                 status: str = "processed") -> Optional[int]:
         """
-        Record a DNA file upload in the database.
+        Record a DNA file upload in the dna_files index.
+        
+        Re-uploads of the same content update the existing row, so each hash
+        maps to exactly one stored path.
         
         Args:
             db: Database session
             filename: Original filename
             file_hash: Hash of the file content
             snp_count: Number of SNPs in the file
+            file_path: Where the file is stored
+            file_format: Detected format (23andMe, AncestryDNA)
+            status: Processing status (uploaded, processed, error)
+            
+        Returns:
+            ID of the dna_files row
+        """
+        result = await db.execute(
+            text("""
+            INSERT INTO dna_files (file_hash, filename, file_path, file_format, snp_count, status)
+            VALUES (:file_hash, :filename, :file_path, :file_format, :snp_count, :status)
+            ON CONFLICT (file_hash) DO UPDATE SET
+                filename = EXCLUDED.filename,
+                file_path = COALESCE(EXCLUDED.file_path, dna_files.file_path),
+                file_format = COALESCE(EXCLUDED.file_format, dna_files.file_format),
+                snp_count = COALESCE(EXCLUDED.snp_count, dna_files.snp_count),
+                status = EXCLUDED.status
+            RETURNING id
+            """),
+            {
+                "file_hash": file_hash,
+                "filename": filename,
+                "file_path": file_path,
+                "file_format": file_format,
+                "snp_count": snp_count,
+                "status": status
+            }
+        )
+        row = result.first()
+        await db.commit()
+        
+        DNAService.forget_missing(file_hash)
+        return row.id if row else None
+    
+    @staticmethod
+    async def list_file_records(db: AsyncSession, limit: int = 50, cursor: Optional[str] = None,
+                                offset: int = 0) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List indexed uploads, newest first.
+        
+        Pages are fetched by keyset on (created_at, id), which the
+        ix_dna_files_created_at_id index serves directly, so a page costs the
+        same however many files are stored. `offset` is still honoured for
+        older clients but has to skip rows; prefer `cursor`.
+        
+        Args:
+            db: Database session
+            limit: Maximum number of records to return
+            cursor: next_cursor from the previous page
+            offset: Number of records to skip (ignored when a cursor is given)
             
         Returns:
-            The created DNAFile record
-        """
-        # Create a new DNA file record
-        dna_file = DNAFile(
-            file_hash=file_hash,
-            filename=filename,
-            snp_count=snp_count,
-            status="processed"
+            Tuple of (records, cursor for the next page or None on the last page)
+        """
+        params: Dict[str, Any] = {"limit": limit + 1}
+        where = "WHERE created_at IS NOT NULL"
+        if cursor:
+            params["cursor_created_at"], params["cursor_id"] = DNAService._decode_cursor(cursor)
+            where += " AND (created_at, id) < (:cursor_created_at, :cursor_id)"
+            page = ""
+        else:
+            params["offset"] = offset
+            page = " OFFSET :offset"
+        
+        result = await db.execute(
+            text(f"""
+            SELECT id, file_hash, filename, file_path, file_format, snp_count, status, created_at
+            FROM dna_files
+            {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT :limit{page}
+            """),
+            params
         )
+        rows = result.fetchall()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = DNAService._encode_cursor(rows[-1].created_at, rows[-1].id)
+        
+        records = [
+            {
+                "id": row.id,
+                "file_hash": row.file_hash,
+                "filename": row.filename,
+                "file_path": row.file_path,
+                "file_format": row.file_format,
+                "snp_count": row.snp_count,
+                "status": row.status,
+                "created_at": row.created_at
+            }
+            for row in rows
+        ]
+        return records, next_cursor
+    
+    @staticmethod
+    def _encode_cursor(created_at: datetime, row_id: int) -> str:
+        """Encode a keyset position as an opaque, URL-safe cursor."""
+        raw = f"{created_at.isoformat()}|{row_id}".encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        """Decode a cursor from _encode_cursor, raising ValueError if it is malformed."""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+            created_at, row_id = raw.rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(row_id)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+    
+    @staticmethod
+    async def index_stored_uploads(db: AsyncSession) -> int:
+        """
+        Add every stored upload to dna_files, keeping existing rows.
+        
+        Uploads are indexed as they arrive; this backfills files stored while
+        the database was unreachable or before the index was used for
+        listing. That includes legacy {hash[:8]}_{filename} files in
+        UPLOADS_DIR and UPLOADS_CACHE_DIR, which are hashed to get their
+        content hash; /dna/uploads only lists them once they are indexed.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Number of rows added
+        """
+        uploads = [
+            (upload['file_hash'],
+             upload['filenames'][-1] if upload['filenames'] else Path(upload['path']).name,
+             upload['path'],
+             datetime.fromisoformat(upload['first_uploaded_at']))
+            for upload in UploadStore.iter_uploads()
+        ]
         
-        # Add and commit to database
-        db.add(dna_file)
+        # Store entries first, then UPLOADS_DIR, so they win for duplicated content
+        for path in DNAService._iter_legacy_uploads():
+            try:
+                file_hash = await run_in_threadpool(DNAService.compute_file_hash_from_path, str(path))
+                created_at = datetime.fromtimestamp(path.stat().st_mtime)
+            except OSError as e:
+                logger.error(f"Could not index legacy upload {path}: {e}")
+                continue
+            filename = DNAService._LEGACY_UPLOAD_PATTERN.fullmatch(path.name).group(1)
+            uploads.append((file_hash, filename, str(path), created_at))
+        
+        added = 0
+        for file_hash, filename, file_path, created_at in uploads:
+            genome_cache = DNAService.get_cache_metadata(file_hash, 'genome')
+            result = await db.execute(
+                text("""
+                INSERT INTO dna_files (file_hash, filename, file_path, snp_count, status, created_at)
+                VALUES (:file_hash, :filename, :file_path, :snp_count, :status, :created_at)
+                ON CONFLICT (file_hash) DO NOTHING
+                RETURNING id
+                """),
+                {
+                    "file_hash": file_hash,
+                    "filename": filename,
+                    "file_path": file_path,
+                    "snp_count": genome_cache['snp_count'] if genome_cache else None,
+                    "status": "processed" if genome_cache else "uploaded",
+                    "created_at": created_at
+                }
+            )
+            if result.first() is not None:
+                added += 1
         await db.commit()
-        await db.refresh(dna_file)
+        return added
+    
+    @staticmethod
+    def _iter_legacy_uploads() -> Iterator[Path]:
+        """Iterate over files stored as {hash[:8]}_{filename} by an older upload path."""
+        for directory in (Path(settings.UPLOADS_DIR), Path(settings.UPLOADS_CACHE_DIR)):
+            if not directory.is_dir():
+                continue
+            for path in sorted(directory.iterdir()):
+                if DNAService._LEGACY_UPLOAD_PATTERN.fullmatch(path.name) and path.is_file():
+                    yield path
+    
+    @staticmethod
+    def load_cached_snp_data(file_hash: str, panel_rsids: Optional[AbstractSet[str]] = None) -> Optional[GenotypeData]:
+        """
+        Retrieve SNP data for a hash from the genome cache only.
+        
+        A panel-filtered entry is preferred; failing that, the full genome is
+        filtered down and the result cached under the panel key.
+        
+        Args:
+            file_hash: Hash of the file content
+            panel_rsids: If given, only SNPs with these rsids are returned
+            
+        Returns:
+            GenotypeData if cached, None otherwise
+        """
+        if panel_rsids is not None:
+            cached_data = DNAService.load_genome_from_cache(DNAService.get_panel_cache_key(file_hash, panel_rsids))
+            if cached_data is not None:
+                logger.info(f"Found panel SNP data in cache for hash: {file_hash}")
+                return cached_data
+            
+            # Persisted with the upload, so it outlives cache expiry and reference updates
+            cached_data = PanelGenotypes.load(file_hash, panel_rsids)
+            if cached_data is not None:
+                logger.info(f"Found SNP data in stored panel genotypes for hash: {file_hash}")
+                return cached_data
         
-        return dna_file
+        cached_data = DNAService.load_genome_from_cache(file_hash)
+        if cached_data is not None:
+            logger.info(f"Found SNP data in main cache for hash: {file_hash}")
+            if panel_rsids is not None:
+                PanelGenotypes.save(file_hash, cached_data, PanelGenotypes.superset(panel_rsids, file_hash))
+                cached_data = cached_data.select(panel_rsids)
+                DNAService.save_to_cache(cached_data, DNAService.get_panel_cache_key(file_hash, panel_rsids), format_type='genome')
+        return cached_data
     
     @staticmethod
-    async def get_snp_data_by_hash(file_hash: str, db: AsyncSession) -> Optional[List[Dict[str, Any]]]:
+    async def get_snp_data_by_hash(file_hash: str, db: AsyncSession,
+                                   panel_rsids: Optional[AbstractSet[str]] = None) -> Optional[GenotypeData]:
         """
         Retrieve SNP data by file hash, either from cache or database.
         
         Args:
             file_hash: Hash of the file content
             db: Database session
+            panel_rsids: If given, only SNPs with these rsids are returned
             
         Returns:
-            List of SNP dictionaries if found, None otherwise
+            GenotypeData if found, None otherwise
         """
         # First check cache
-        cached_data = DNAService.load_from_cache(file_hash)
+        cached_data = DNAService.load_cached_snp_data(file_hash, panel_rsids)
         if cached_data is not None:
-            logger.info(f"Found SNP data in main cache for hash: {file_hash}")
             return cached_data
         
-        # Check in uploads directory
-        uploads_dir = Path(settings.UPLOADS_DIR)
-        uploads_cache_dir = Path(settings.UPLOADS_CACHE_DIR)
+        # Resolve the hash to a stored file through the index
+        file_path = await DNAService.resolve_file_path(file_hash, db)
+        if file_path is None:
+            logger.warning(f"No SNP data found for hash: {file_hash}")
+            return None
         
-        # Check for files with hash prefix (using the way we store files in upload_dna_file)
-        potential_files = list(uploads_dir.glob(f"{file_hash[:8]}_*.txt"))
-        potential_cache_files = list(uploads_cache_dir.glob(f"{file_hash[:8]}_*.txt"))
+        return DNAService.read_dna_file(file_path, use_cache=True, panel_rsids=panel_rsids, file_hash=file_hash)
+    
+    @staticmethod
+    async def resolve_file_path(file_hash: str, db: Optional[AsyncSession]) -> Optional[str]:
+        """
+        Resolve a file hash to the path of the stored DNA file.
         
-        # Combine all potential files to check
-        all_potential_files = potential_files + potential_cache_files
+        Lookups go, in order, to the content-addressed upload store (one
+        stat), the dna_files index (one indexed query) and, for files from
+        before the index existed, the legacy hash-prefix glob. Legacy hits are
+        written back to dna_files; misses are remembered for
+        FILE_INDEX_NEGATIVE_TTL seconds so repeated requests for unknown
+        hashes skip the database and the glob.
         
-        if all_potential_files:
-            logger.info(f"Found {len(all_potential_files)} potential DNA files for hash prefix {file_hash[:8]}")
+        Args:
+            file_hash: Hash of the file content
+            db: Database session (optional)
             
-            # Check each file to find an exact hash match
-            for file_path in all_potential_files:
+        Returns:
+            Path to the DNA file if found, None otherwise
+        """
+        if not DNAService._HASH_PATTERN.fullmatch(file_hash):
+            return None
+        
+        stored_path = UploadStore.find(file_hash)
+        if stored_path is not None:
+            return str(stored_path)
+        
+        if DNAService._is_known_missing(file_hash):
+            logger.info(f"Hash {file_hash} recently resolved to nothing; skipping lookup")
+            return None
+        
+        if db is not None:
+            try:
+                result = await db.execute(
+                    text("SELECT file_path FROM dna_files WHERE file_hash = :file_hash"),
+                    {"file_hash": file_hash}
+                )
+                dna_file = result.first()
+                if dna_file and dna_file.file_path and os.path.exists(dna_file.file_path):
+                    logger.info(f"Found DNA file in database: {dna_file.file_path}")
+                    return dna_file.file_path
+            except Exception as e:
+                logger.error(f"Error querying database for DNA file: {str(e)}")
+        
+        legacy_path = DNAService._find_legacy_upload(file_hash)
+        if legacy_path is not None:
+            if db is not None:
+                # Index it so the next lookup is a single query
                 try:
-                    # Compute hash of this file
-                    file_actual_hash = DNAService.compute_file_hash_from_path(str(file_path))
-                    logger.info(f"Checking file {file_path.name}: computed hash = {file_actual_hash}")
-                    
-                    # If hash matches what we're looking for
-                    if file_actual_hash == file_hash:
-                        logger.info(f"Found exact hash match in file: {file_path}")
-                        # Parse and cache the file
-                        snp_data = DNAService.read_dna_file(str(file_path), use_cache=True)
-                        logger.info(f"Successfully parsed file with {len(snp_data)} SNP records")
-                        return snp_data
+                    await DNAService.record_file_upload(
+                        db, filename=Path(legacy_path).name, file_hash=file_hash, file_path=legacy_path
+                    )
                 except Exception as e:
-                    logger.error(f"Error processing potential file {file_path}: {str(e)}")
-                    continue
+                    logger.warning(f"Could not index legacy upload {legacy_path}: {e}")
+            return legacy_path
         
-        # If not found in uploads, check database
-        try:
-            result = await db.execute(
-                text("SELECT * FROM dna_files WHERE file_hash = :file_hash"),
-                {"file_hash": file_hash}
-            )
-            dna_file = result.first()
+        DNAService._remember_missing(file_hash)
+        return None
+    
+    @staticmethod
+    def _find_legacy_upload(file_hash: str) -> Optional[str]:
+        """
+        Find a file stored as {hash[:8]}_{filename} by an older upload path.
+        
+        Args:
+            file_hash: Hash of the file content
             
-            if dna_file and hasattr(dna_file, 'file_path') and dna_file.file_path:
-                if os.path.exists(dna_file.file_path):
-                    logger.info(f"Found DNA file in database: {dna_file.file_path}")
-                    # For synchronous operations in async functions, we don't need to await them
-                    return DNAService.read_dna_file(dna_file.file_path, use_cache=True)
-        except Exception as e:
-            logger.error(f"Error querying database for DNA file: {str(e)}")
+        Returns:
+            Path to the matching file if found, None otherwise
+        """
+        uploads_dir = Path(settings.UPLOADS_DIR)
+        uploads_cache_dir = Path(settings.UPLOADS_CACHE_DIR)
+        
+        # Check for files with hash prefix (using the way we used to store files in upload_dna_file)
+        potential_files = list(uploads_dir.glob(f"{file_hash[:8]}_*.txt"))
+        potential_cache_files = list(uploads_cache_dir.glob(f"{file_hash[:8]}_*.txt"))
+        
+        # Check each file to find an exact hash match
+        for file_path in potential_files + potential_cache_files:
+            try:
+                if DNAService.compute_file_hash_from_path(str(file_path)) == file_hash:
+                    logger.info(f"Found exact hash match in legacy file: {file_path}")
+                    return str(file_path)
+            except Exception as e:
+                logger.error(f"Error processing potential file {file_path}: {str(e)}")
+        
+        return None
+    
+    @staticmethod
+    def _is_known_missing(file_hash: str) -> bool:
+        """Check the negative lookup cache, dropping the entry once it has expired."""
+        expires_at = DNAService._missing_hashes.get(file_hash)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            DNAService._missing_hashes.pop(file_hash, None)
+            return False
+        return True
+    
+    @staticmethod
+    def _remember_missing(file_hash: str) -> None:
+        """Add a hash to the negative lookup cache, evicting the oldest entries past the size limit."""
+        missing = DNAService._missing_hashes
+        missing.pop(file_hash, None)
+        missing[file_hash] = time.monotonic() + settings.FILE_INDEX_NEGATIVE_TTL
+        while len(missing) > DNAService._MISSING_HASHES_MAX:
+            missing.popitem(last=False)
+    
+    @staticmethod
+    def forget_missing(file_hash: str) -> None:
+        """
+        Drop a hash from the negative lookup cache, e.g. once it has been uploaded.
         
-        logger.warning(f"No SNP data found for hash: {file_hash}")
-        return None
\ No newline at end of file
+        Args:
+            file_hash: Hash of the file content
+        """
+        DNAService._missing_hashes.pop(file_hash, None)
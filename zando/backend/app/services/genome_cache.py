@@ -0,0 +1,182 @@
+import os
+import json
+import mmap
+import struct
+import logging
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from app.services.genotype_data import GenotypeData
+
+logger = logging.getLogger(__name__)
+
+# On-disk layout of a parsed genome cache entry (format_type 'genome'):
+#
+#   header   fixed-size struct, see _HEADER
+#   toc      JSON table of contents: column dtypes/offsets, non-numeric ids
+#            and optional caller metadata
+#   columns  raw little-endian arrays, each aligned to _ALIGNMENT bytes
+#
+# The columns are memory-mapped on load, so a cache hit costs a header read
+# and a few page faults instead of unpickling the whole genome.
+GENOME_CACHE_MAGIC = b'ZGENOME\x00'
+GENOME_CACHE_VERSION = 1
+
+# magic, version, reserved, row count, unix timestamp, toc offset, toc length, cache key
+_HEADER = struct.Struct('<8sHHQdQQ128s')
+_ALIGNMENT = 64
+_COLUMNS = ('rsid_codes', 'chromosomes', 'positions', 'alleles1', 'alleles2')
+
+
+class GenomeCacheError(ValueError):
+    """Raised when a genome cache file is truncated, corrupt or of an unknown version."""
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def write_genome_cache(path: Path, data: GenotypeData, cache_key: str,
+                       metadata: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Write a GenotypeData to `path` in the binary genome cache format.
+
+    The file is written next to its destination and renamed into place, so
+    readers that already mapped the previous version are unaffected.
+
+    Args:
+        path: Destination file
+        data: Genome to store
+        cache_key: Hash or cache key recorded in the header
+        metadata: JSON-serializable details stored in the table of contents
+    """
+    key = cache_key.encode('ascii')
+    if len(key) > 128:
+        raise ValueError(f"Cache key too long for genome cache header: {cache_key}")
+
+    columns = []
+    toc = {'columns': columns, 'other_ids': list(data.other_ids)}
+    if metadata:
+        toc['metadata'] = metadata
+    arrays = []
+    for name in _COLUMNS:
+        array = np.ascontiguousarray(getattr(data, name))
+        arrays.append(array.astype(array.dtype.newbyteorder('<'), copy=False))
+
+    # The TOC size depends on the offsets it records, so settle it first
+    toc_bytes = b''
+    for _ in range(3):
+        data_offset = _align(_HEADER.size + len(toc_bytes))
+        columns.clear()
+        for name, array in zip(_COLUMNS, arrays):
+            columns.append({'name': name, 'dtype': array.dtype.str, 'offset': data_offset, 'length': array.nbytes})
+            data_offset = _align(data_offset + array.nbytes)
+        settled = len(toc_bytes)
+        toc_bytes = json.dumps(toc, separators=(',', ':')).encode('utf-8')
+        if _align(_HEADER.size + len(toc_bytes)) == _align(_HEADER.size + settled):
+            break
+    else:
+        raise ValueError("Genome cache table of contents did not settle")
+
+    header = _HEADER.pack(
+        GENOME_CACHE_MAGIC, GENOME_CACHE_VERSION, 0, len(data),
+        datetime.now().timestamp(), _HEADER.size, len(toc_bytes), key,
+    )
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(toc_bytes)
+            for column, array in zip(columns, arrays):
+                f.seek(column['offset'])
+                f.write(array.tobytes())
+            # Empty trailing columns still need their offsets inside the file
+            f.truncate(columns[-1]['offset'] + columns[-1]['length'])
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def _unpack_header(buffer: bytes, size: int) -> Dict[str, Any]:
+    if size < _HEADER.size or len(buffer) < _HEADER.size:
+        raise GenomeCacheError("Genome cache file is truncated")
+
+    magic, version, _, row_count, timestamp, toc_offset, toc_length, key = _HEADER.unpack_from(buffer)
+    if magic != GENOME_CACHE_MAGIC:
+        raise GenomeCacheError("Not a genome cache file")
+    if version != GENOME_CACHE_VERSION:
+        raise GenomeCacheError(f"Unsupported genome cache version {version}")
+    if toc_offset + toc_length > size:
+        raise GenomeCacheError("Genome cache table of contents is truncated")
+
+    return {
+        'version': version,
+        'row_count': row_count,
+        'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+        'hash': key.rstrip(b'\x00').decode('ascii'),
+        'toc_offset': toc_offset,
+        'toc_length': toc_length,
+    }
+
+
+def read_genome_cache_header(path: Path) -> Dict[str, Any]:
+    """
+    Read only the fixed header of a genome cache file.
+
+    Args:
+        path: Cache file
+
+    Returns:
+        Dictionary with version, row_count, timestamp and hash
+    """
+    with open(path, 'rb') as f:
+        buffer = f.read(_HEADER.size)
+        size = os.fstat(f.fileno()).st_size
+    header = _unpack_header(buffer, size)
+    del header['toc_offset'], header['toc_length']
+    return header
+
+
+def read_genome_cache(path: Path) -> Tuple[GenotypeData, Dict[str, Any]]:
+    """
+    Memory-map a genome cache file.
+
+    The returned arrays are read-only views into the mapping; pages are
+    loaded on first access and shared between processes reading the same file.
+
+    Args:
+        path: Cache file
+
+    Returns:
+        Tuple of (GenotypeData, header dictionary including the stored metadata)
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _HEADER.size:
+            raise GenomeCacheError("Genome cache file is truncated")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    header = _unpack_header(mapped, size)
+    toc_start = header.pop('toc_offset')
+    toc = json.loads(mapped[toc_start:toc_start + header.pop('toc_length')])
+
+    arrays = {}
+    for column in toc['columns']:
+        dtype = np.dtype(column['dtype'])
+        if column['offset'] + column['length'] > size:
+            raise GenomeCacheError(f"Genome cache column {column['name']} is truncated")
+        arrays[column['name']] = np.frombuffer(
+            mapped, dtype=dtype, count=column['length'] // dtype.itemsize, offset=column['offset'],
+        )
+
+    missing = [name for name in _COLUMNS if name not in arrays]
+    if missing or any(len(arrays[name]) != header['row_count'] for name in _COLUMNS):
+        raise GenomeCacheError("Genome cache columns do not match the header row count")
+
+    data = GenotypeData(*(arrays[name] for name in _COLUMNS), other_ids=toc['other_ids'])
+    header['metadata'] = toc.get('metadata', {})
+    return data, header
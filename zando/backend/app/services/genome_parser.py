@@ -0,0 +1,318 @@
+import io
+import hashlib
+import logging
+from typing import AbstractSet, BinaryIO, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from app.services.genotype_data import GenotypeData
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per block; about 40k rows of a 23andMe file
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+# Column layouts we accept, checked in order against the header lines
+VALID_COLUMN_SETS = (
+    ['rsid', 'chromosome', 'position', 'allele1', 'allele2'],
+    ['rsid', 'chromosome', 'position', 'genotype'],
+)
+
+# Number of leading lines searched for a column header
+HEADER_SEARCH_LINES = 100
+
+
+def detect_columns(lines: Iterable[str]) -> List[str]:
+    """
+    Identify the column layout from the first lines of a DNA file.
+
+    Args:
+        lines: Lines from the start of the file
+
+    Returns:
+        List of column names if a known layout is found, empty list otherwise
+    """
+    for i, line in enumerate(lines):
+        if i >= HEADER_SEARCH_LINES:
+            break
+        for columns in VALID_COLUMN_SETS:
+            if all(column in line for column in columns):
+                return list(columns)
+    return []
+
+class GenomeParser:
+    """
+    Streaming parser for 23andMe and AncestryDNA raw data files.
+
+    The file is read in fixed-size blocks that are cut on line boundaries.
+    Each block is parsed on its own and its genotypes are split with a
+    vectorized byte view, so working memory is bounded by the block size
+    rather than the file size. Consumers can either iterate the batches or
+    collect them into a single GenotypeData.
+
+    When given a set of rsids (normally the reference panel), raw lines are
+    filtered on their first field before any column splitting, so only the
+    few hundred relevant rows ever reach pandas.
+    """
+
+    def __init__(self, columns: List[str], block_size: int = DEFAULT_BLOCK_SIZE,
+                 rsids: Optional[AbstractSet[str]] = None):
+        """
+        Args:
+            columns: Column layout as returned by DNAService.verify_dna_file_format
+            block_size: Number of bytes to read per block
+            rsids: Optional set of rsids to keep; all rows are kept when None
+        """
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+        self.columns = columns
+        self.block_size = block_size
+        self._rsid_filter = None if rsids is None else frozenset(rsid.encode() for rsid in rsids)
+
+    def iter_blocks(self, stream: BinaryIO) -> Iterator[bytes]:
+        """
+        Read a binary stream in blocks that end on a newline.
+
+        Args:
+            stream: File object opened in binary mode
+
+        Yields:
+            Byte blocks containing only complete lines
+        """
+        remainder = b''
+        while True:
+            chunk = stream.read(self.block_size)
+            if not chunk:
+                break
+
+            block = remainder + chunk
+            cut = block.rfind(b'\n')
+            if cut < 0:
+                # No complete line yet; keep reading
+                remainder = block
+                continue
+
+            remainder = block[cut + 1:]
+            yield block[:cut + 1]
+
+        if remainder.strip():
+            yield remainder
+
+    def parse_block(self, block: bytes) -> GenotypeData:
+        """
+        Parse one block of complete lines.
+
+        Args:
+            block: Raw bytes from iter_blocks
+
+        Returns:
+            GenotypeData for the rows in the block
+        """
+        if self._rsid_filter is not None:
+            block = self._filter_lines(block)
+            if not block:
+                return GenotypeData.empty()
+
+        df = pd.read_csv(
+            io.BytesIO(block),
+            sep='\t',
+            comment='#',
+            names=self.columns,
+            header=None,
+            dtype=str,
+            skip_blank_lines=True,
+        )
+        if df.empty:
+            return GenotypeData.empty()
+
+        # AncestryDNA writes its column header as an uncommented line
+        header_rows = df['rsid'] == 'rsid'
+        if header_rows.any():
+            df = df[~header_rows]
+
+        return GenotypeData.from_frame(df)
+
+    def _filter_lines(self, block: bytes) -> bytes:
+        """Keep only the lines whose rsid field is in the filter set."""
+        keep = self._rsid_filter
+        return b'\n'.join([
+            line for line in block.split(b'\n')
+            if line.partition(b'\t')[0] in keep
+        ])
+
+    def iter_batches(self, stream: BinaryIO) -> Iterator[GenotypeData]:
+        """
+        Parse a stream into GenotypeData batches, one per block.
+
+        Args:
+            stream: File object opened in binary mode
+
+        Yields:
+            Non-empty GenotypeData batches in file order
+        """
+        for block in self.iter_blocks(stream):
+            batch = self.parse_block(block)
+            if len(batch):
+                yield batch
+
+    def parse(self, stream: BinaryIO) -> GenotypeData:
+        """
+        Parse a whole stream into a single GenotypeData.
+
+        Args:
+            stream: File object opened in binary mode
+
+        Returns:
+            GenotypeData with every SNP call in the stream
+        """
+        return GenotypeData.concat(list(self.iter_batches(stream)))
+
+    @classmethod
+    def parse_file(cls, filepath: str, columns: List[str], block_size: Optional[int] = None,
+                   rsids: Optional[AbstractSet[str]] = None) -> GenotypeData:
+        """
+        Parse a DNA file from disk.
+
+        Args:
+            filepath: Path to the DNA file
+            columns: Column layout of the file
+            block_size: Optional override for the block size
+            rsids: Optional set of rsids to keep
+
+        Returns:
+            GenotypeData with the SNP calls in the file (only `rsids` when given)
+        """
+        parser = cls(columns, block_size or DEFAULT_BLOCK_SIZE, rsids)
+        with open(filepath, 'rb') as stream:
+            return parser.parse(stream)
+
+
+class GenomeIngestResult:
+    """
+    Everything learned about an upload from a single pass over its bytes.
+    """
+
+    __slots__ = ('file_hash', 'size', 'columns', 'data')
+
+    def __init__(self, file_hash: str, size: int, columns: List[str], data: Optional[GenotypeData]):
+        self.file_hash = file_hash
+        self.size = size
+        self.columns = columns
+        self.data = data
+
+    @property
+    def valid(self) -> bool:
+        """True when a known column layout was found."""
+        return bool(self.columns)
+
+    @property
+    def format_name(self) -> str:
+        """Vendor name for the detected layout."""
+        if not self.columns:
+            return "unknown"
+        return "AncestryDNA" if 'allele1' in self.columns else "23andMe"
+
+
+class GenomeIngestor:
+    """
+    Incremental, single-pass ingest of a DNA file.
+
+    Bytes are fed in whatever chunks they arrive in (an upload stream or a
+    file read loop). Each chunk updates the sha256, the column layout is
+    detected from the first lines, and complete blocks are handed to a
+    GenomeParser as soon as they fill up. `finish` returns the hash, format
+    and parsed GenotypeData without the content ever being read twice.
+    """
+
+    def __init__(self, block_size: int = DEFAULT_BLOCK_SIZE, rsids: Optional[AbstractSet[str]] = None):
+        """
+        Args:
+            block_size: Number of buffered bytes that triggers a parse
+            rsids: Optional set of rsids to keep; all rows are kept when None
+        """
+        self.block_size = block_size
+        self.size = 0
+        self._rsids = rsids
+        self._hash = hashlib.sha256()
+        self._parser = None
+        self._detection_failed = False
+        self._pending = []
+        self._pending_size = 0
+        self._batches = []
+
+    @property
+    def columns(self) -> List[str]:
+        """Detected column layout, empty until the header has been seen."""
+        return self._parser.columns if self._parser is not None else []
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Consume the next chunk of the file.
+
+        Args:
+            chunk: Raw bytes, in file order
+        """
+        if not chunk:
+            return
+
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        if self._detection_failed:
+            # Unknown format; keep hashing but don't buffer the content
+            return
+
+        self._pending.append(bytes(chunk))
+        self._pending_size += len(chunk)
+
+        if self._parser is None:
+            self._detect(final=False)
+        if self._parser is not None and self._pending_size >= self.block_size:
+            self._flush(final=False)
+
+    def finish(self) -> GenomeIngestResult:
+        """
+        Parse whatever is still buffered and return the ingest result.
+
+        Returns:
+            GenomeIngestResult; `data` is None when the format was not recognized
+        """
+        if self._parser is None and not self._detection_failed:
+            self._detect(final=True)
+        if self._parser is not None:
+            self._flush(final=True)
+
+        data = GenotypeData.concat(self._batches) if self._parser is not None else None
+        self._batches = []
+        return GenomeIngestResult(self._hash.hexdigest(), self.size, self.columns, data)
+
+    def _detect(self, final: bool) -> None:
+        lines = b''.join(self._pending).split(b'\n')
+        if not final:
+            # The last line may still be incomplete
+            lines = lines[:-1]
+
+        columns = detect_columns(line.decode('utf-8', 'replace') for line in lines)
+        if columns:
+            self._parser = GenomeParser(columns, self.block_size, self._rsids)
+        elif final or len(lines) >= HEADER_SEARCH_LINES:
+            self._detection_failed = True
+            self._pending = []
+            self._pending_size = 0
+
+    def _flush(self, final: bool) -> None:
+        buffered = b''.join(self._pending)
+        if final:
+            block, remainder = buffered, b''
+        else:
+            cut = buffered.rfind(b'\n')
+            if cut < 0:
+                return
+            block, remainder = buffered[:cut + 1], buffered[cut + 1:]
+
+        self._pending = [remainder] if remainder else []
+        self._pending_size = len(remainder)
+
+        if block.strip():
+            batch = self._parser.parse_block(block)
+            if len(batch):
+                self._batches.append(batch)
@@ -0,0 +1,431 @@
+import re
+import logging
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Chromosome labels seen in 23andMe and AncestryDNA files; the index is the uint8 code
+CHROMOSOME_LABELS = ('unknown',) + tuple(str(i) for i in range(1, 27)) + ('X', 'Y', 'XY', 'MT', 'M', '0')
+CHROMOSOME_CODES = {label: code for code, label in enumerate(CHROMOSOME_LABELS)}
+
+# Allele codes are the ASCII byte of the base call; 0 means no call was present
+ALLELE_LABELS = tuple(chr(code) if code else '' for code in range(256))
+
+# rsid encoding: 'rs<n>' -> n, 'i<n>' -> -(n + 1), anything else -> -(OTHER_RSID_BASE + k)
+# where k indexes the container's table of non-numeric identifiers
+OTHER_RSID_BASE = 1 << 52
+_NUMERIC_RSID = re.compile(r'(rs|i)(0|[1-9]\d{0,14})')
+_RSID_WIDTH = 18
+
+
+def encode_rsid(rsid: str, other_ids: Optional[Dict[str, int]] = None) -> Optional[int]:
+    """
+    Encode a single rsid to its integer code.
+
+    Args:
+        rsid: Identifier such as 'rs4477212' or 'i7001234'
+        other_ids: Table of non-numeric identifiers to resolve against
+
+    Returns:
+        The integer code, or None for an unknown non-numeric identifier
+    """
+    match = _NUMERIC_RSID.fullmatch(rsid)
+    if match:
+        number = int(match.group(2))
+        return number if match.group(1) == 'rs' else -number - 1
+    if other_ids and rsid in other_ids:
+        return -OTHER_RSID_BASE - other_ids[rsid]
+    return None
+
+
+def encode_rsids(values: pd.Series, other_ids: Dict[str, int]) -> np.ndarray:
+    """
+    Vectorized rsid encoding for a column of identifiers.
+
+    Args:
+        values: Series of rsid strings
+        other_ids: Table of non-numeric identifiers, extended in place
+
+    Returns:
+        int64 array of rsid codes
+    """
+    text = values.fillna('').astype(str).to_numpy(dtype=object)
+    codes = np.zeros(len(text), dtype=np.int64)
+    numeric = np.zeros(len(text), dtype=bool)
+
+    try:
+        raw = text.astype(f'S{_RSID_WIDTH}')
+    except UnicodeEncodeError:
+        raw = None
+
+    if raw is not None and len(raw):
+        # Parse the digits straight out of the byte matrix, one column at a time
+        matrix = raw.view(np.uint8).reshape(len(raw), _RSID_WIDTH)
+        is_rs = (matrix[:, 0] == ord('r')) & (matrix[:, 1] == ord('s'))
+        is_i = matrix[:, 0] == ord('i')
+        start = np.where(is_rs, 2, 1)
+        body = np.where(np.arange(_RSID_WIDTH) >= start[:, None], matrix, 0)
+
+        is_digit = (body >= ord('0')) & (body <= ord('9'))
+        digits = is_digit.sum(axis=1)
+        first_digit = matrix[np.arange(len(raw)), start]
+        numeric = (
+            (is_rs | is_i)
+            & (digits >= 1) & (digits <= 15)
+            & (digits == (body != 0).sum(axis=1))
+            & ((first_digit != ord('0')) | (digits == 1))
+            & (np.char.str_len(text.astype(str)) < _RSID_WIDTH)
+        )
+
+        value = np.zeros(len(raw), dtype=np.int64)
+        for column in range(1, _RSID_WIDTH):
+            present = is_digit[:, column]
+            value = np.where(present, value * 10 + (body[:, column].astype(np.int64) - ord('0')), value)
+        codes = np.where(is_rs, value, -value - 1)
+
+    # Anything else (long, non-ASCII or non-numeric identifiers) goes through the scalar path
+    for position in np.flatnonzero(~numeric):
+        rsid = text[position]
+        code = encode_rsid(rsid)
+        if code is None:
+            code = -OTHER_RSID_BASE - other_ids.setdefault(rsid, len(other_ids))
+        codes[position] = code
+
+    return codes
+
+
+def decode_rsid(code: int, other_ids: Sequence[str]) -> str:
+    """
+    Decode an integer rsid code back to its identifier.
+
+    Args:
+        code: Encoded rsid
+        other_ids: Table of non-numeric identifiers
+
+    Returns:
+        The original rsid string
+    """
+    if code >= 0:
+        return f"rs{code}"
+    if code > -OTHER_RSID_BASE:
+        return f"i{-code - 1}"
+    return other_ids[-code - OTHER_RSID_BASE]
+
+
+class GenotypeData:
+    """
+    Columnar, array-backed genotype calls for one genome.
+
+    Each SNP costs 15 bytes (int64 rsid code, uint8 chromosome code, uint32
+    position and two uint8 allele codes) instead of a dict of five strings.
+    Iterating yields the same dictionaries `read_dna_file` used to return,
+    so existing callers keep working, while matching and statistics can use
+    the arrays directly.
+    """
+
+    __slots__ = ('rsid_codes', 'chromosomes', 'positions', 'alleles1', 'alleles2',
+                 'other_ids', '_other_index', '_sort_order', '_sorted_codes')
+
+    def __init__(self, rsid_codes: np.ndarray, chromosomes: np.ndarray, positions: np.ndarray,
+                 alleles1: np.ndarray, alleles2: np.ndarray, other_ids: Sequence[str] = ()):
+        """
+        Wrap pre-encoded column arrays.
+
+        Args:
+            rsid_codes: int64 rsid codes (see `encode_rsid`)
+            chromosomes: uint8 indices into CHROMOSOME_LABELS
+            positions: uint32 base-pair positions
+            alleles1: uint8 ASCII codes of the first allele
+            alleles2: uint8 ASCII codes of the second allele
+            other_ids: Non-numeric identifiers referenced by negative rsid codes
+        """
+        self.rsid_codes = np.asarray(rsid_codes, dtype=np.int64)
+        self.chromosomes = np.asarray(chromosomes, dtype=np.uint8)
+        self.positions = np.asarray(positions, dtype=np.uint32)
+        self.alleles1 = np.asarray(alleles1, dtype=np.uint8)
+        self.alleles2 = np.asarray(alleles2, dtype=np.uint8)
+        self.other_ids = tuple(other_ids)
+        self._other_index = None
+        self._sort_order = None
+        self._sorted_codes = None
+
+    @classmethod
+    def empty(cls) -> 'GenotypeData':
+        """Create a container with no SNPs."""
+        return cls(np.empty(0, np.int64), np.empty(0, np.uint8), np.empty(0, np.uint32),
+                   np.empty(0, np.uint8), np.empty(0, np.uint8))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'GenotypeData':
+        """
+        Build from a DataFrame with rsid, chromosome and position columns plus
+        either allele1/allele2 or a two-character genotype column.
+
+        Args:
+            df: Parsed DNA file with string columns
+
+        Returns:
+            GenotypeData holding the same calls
+        """
+        other_ids: Dict[str, int] = {}
+        rsid_codes = encode_rsids(df['rsid'], other_ids)
+
+        chromosomes = (
+            df['chromosome'].map(CHROMOSOME_CODES).fillna(0).to_numpy(dtype=np.uint8)
+        )
+        positions = cls._encode_positions(df['position'])
+
+        if 'genotype' in df.columns:
+            alleles1, alleles2 = cls._split_genotypes(df['genotype'])
+        else:
+            alleles1 = cls._encode_alleles(df['allele1'])
+            alleles2 = cls._encode_alleles(df['allele2'])
+
+        return cls(
+            rsid_codes,
+            chromosomes,
+            positions,
+            alleles1,
+            alleles2,
+            other_ids=list(other_ids),
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> 'GenotypeData':
+        """
+        Build from SNP dictionaries (the legacy list-of-dicts representation).
+
+        Args:
+            records: SNP dictionaries with rsid, chromosome, position, allele1 and allele2
+
+        Returns:
+            GenotypeData holding the same calls
+        """
+        df = pd.DataFrame.from_records(
+            list(records), columns=['rsid', 'chromosome', 'position', 'allele1', 'allele2']
+        )
+        return cls.from_frame(df.astype(object))
+
+    @classmethod
+    def concat(cls, parts: Sequence['GenotypeData']) -> 'GenotypeData':
+        """
+        Concatenate several containers, merging their non-numeric identifier tables.
+
+        Args:
+            parts: Containers in genome order
+
+        Returns:
+            A single GenotypeData
+        """
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+
+        other_ids: Dict[str, int] = {}
+        rsid_codes = []
+        for part in parts:
+            codes = part.rsid_codes
+            if part.other_ids:
+                # Re-number this part's identifiers into the merged table
+                remap = np.array(
+                    [other_ids.setdefault(rsid, len(other_ids)) for rsid in part.other_ids],
+                    dtype=np.int64,
+                )
+                codes = codes.copy()
+                is_other = codes <= -OTHER_RSID_BASE
+                codes[is_other] = -OTHER_RSID_BASE - remap[-codes[is_other] - OTHER_RSID_BASE]
+            rsid_codes.append(codes)
+
+        return cls(
+            np.concatenate(rsid_codes),
+            np.concatenate([part.chromosomes for part in parts]),
+            np.concatenate([part.positions for part in parts]),
+            np.concatenate([part.alleles1 for part in parts]),
+            np.concatenate([part.alleles2 for part in parts]),
+            other_ids=list(other_ids),
+        )
+
+    @staticmethod
+    def _encode_positions(values: pd.Series) -> np.ndarray:
+        """Encode a column of base-pair positions as uint32."""
+        try:
+            return values.to_numpy(dtype='S10').astype(np.uint32)
+        except (ValueError, UnicodeEncodeError):
+            # Blank or malformed positions; fall back to the tolerant parser
+            return pd.to_numeric(values, errors='coerce').fillna(0).to_numpy(dtype=np.uint32)
+    
+    @staticmethod
+    def _encode_alleles(values: pd.Series) -> np.ndarray:
+        """Encode a column of single-character allele calls as ASCII codes."""
+        values = values.fillna('').astype(str).str.slice(0, 1)
+        try:
+            encoded = values.to_numpy(dtype='S1')
+        except UnicodeEncodeError:
+            encoded = values.str.encode('ascii', 'replace').to_numpy(dtype='S1')
+        return encoded.view(np.uint8)
+
+    @staticmethod
+    def _split_genotypes(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """Split a column of genotype strings like 'AG' into two allele code arrays."""
+        values = values.fillna('')
+        try:
+            pairs = values.to_numpy(dtype='S2')
+        except UnicodeEncodeError:
+            pairs = values.astype(str).str.encode('ascii', 'replace').to_numpy(dtype='S2')
+        # Each 2-byte cell is one row of two uint8 codes; short calls are zero-padded
+        pairs = pairs.view(np.uint8).reshape(-1, 2)
+        return pairs[:, 0].copy(), pairs[:, 1].copy()
+
+    def __len__(self) -> int:
+        return len(self.rsid_codes)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        """Get one SNP as the dictionary shape used by `read_dna_file` callers."""
+        return {
+            'rsid': decode_rsid(int(self.rsid_codes[row]), self.other_ids),
+            'chromosome': CHROMOSOME_LABELS[self.chromosomes[row]],
+            'position': str(self.positions[row]),
+            'allele1': ALLELE_LABELS[self.alleles1[row]],
+            'allele2': ALLELE_LABELS[self.alleles2[row]],
+        }
+
+    def __getstate__(self):
+        # The lookup index is rebuilt lazily, so it's never pickled
+        return (self.rsid_codes, self.chromosomes, self.positions,
+                self.alleles1, self.alleles2, self.other_ids)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the column arrays."""
+        return sum(column.nbytes for column in
+                   (self.rsid_codes, self.chromosomes, self.positions, self.alleles1, self.alleles2))
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Materialize the legacy list-of-dicts representation."""
+        return list(self)
+
+    def take(self, rows: np.ndarray) -> 'GenotypeData':
+        """
+        Select a subset of SNPs.
+
+        Args:
+            rows: Row indices or boolean mask
+
+        Returns:
+            A new GenotypeData with the selected rows
+        """
+        return GenotypeData(
+            self.rsid_codes[rows], self.chromosomes[rows], self.positions[rows],
+            self.alleles1[rows], self.alleles2[rows], other_ids=self.other_ids,
+        )
+
+    def encode(self, rsids: Iterable[str]) -> np.ndarray:
+        """
+        Encode rsids against this container; unknown identifiers are dropped.
+
+        Args:
+            rsids: rsid strings
+
+        Returns:
+            int64 array of rsid codes
+        """
+        if self._other_index is None:
+            self._other_index = {rsid: k for k, rsid in enumerate(self.other_ids)}
+        codes = (encode_rsid(rsid, self._other_index) for rsid in rsids)
+        return np.fromiter((code for code in codes if code is not None), dtype=np.int64)
+
+    def find(self, rsids: Iterable[str]) -> np.ndarray:
+        """
+        Vectorized lookup of the rows holding any of the given rsids.
+
+        Args:
+            rsids: rsid strings to look up
+
+        Returns:
+            Sorted row indices of every matching SNP (genome order)
+        """
+        return self.find_codes(self.encode(rsids))
+
+    def select(self, rsids: Iterable[str]) -> 'GenotypeData':
+        """
+        Keep only the SNPs whose rsid is in `rsids`, in genome order.
+
+        Args:
+            rsids: rsid strings to keep
+
+        Returns:
+            A new GenotypeData with the matching rows
+        """
+        return self.take(self.find(rsids))
+
+    def find_codes(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Vectorized lookup of the rows holding any of the given rsid codes.
+
+        Args:
+            codes: int64 rsid codes
+
+        Returns:
+            Sorted row indices of every matching SNP (genome order)
+        """
+        if self._sort_order is None:
+            self._sort_order = np.argsort(self.rsid_codes, kind='stable')
+            self._sorted_codes = self.rsid_codes[self._sort_order]
+
+        codes = np.unique(np.asarray(codes, dtype=np.int64))
+        lower = np.searchsorted(self._sorted_codes, codes, side='left')
+        upper = np.searchsorted(self._sorted_codes, codes, side='right')
+        counts = upper - lower
+        total = int(counts.sum())
+        if not total:
+            return np.empty(0, dtype=np.intp)
+
+        # Expand each [lower, upper) range without a Python loop
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.sort(self._sort_order[np.repeat(lower, counts) + offsets])
+
+    def get(self, rsid: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a single SNP by rsid.
+
+        Args:
+            rsid: rsid string
+
+        Returns:
+            SNP dictionary for the first occurrence, or None if absent
+        """
+        rows = self.find([rsid])
+        return self[int(rows[0])] if len(rows) else None
+
+    def chromosome_counts(self) -> Dict[str, int]:
+        """Number of SNPs per chromosome label."""
+        counts = np.bincount(self.chromosomes, minlength=len(CHROMOSOME_LABELS))
+        return {CHROMOSOME_LABELS[code]: int(count) for code, count in enumerate(counts) if count}
+
+    def allele_counts(self) -> Dict[str, int]:
+        """Number of A/T/G/C calls across both alleles, with everything else under 'other'."""
+        counts = np.bincount(self.alleles1, minlength=256) + np.bincount(self.alleles2, minlength=256)
+        stats = {base: int(counts[ord(base)]) for base in 'ATGC'}
+        stats['other'] = int(2 * len(self) - sum(stats.values()))
+        return stats
+
+    def rsid_pattern_counts(self) -> Dict[str, int]:
+        """Number of standard 'rs' identifiers versus anything else."""
+        standard = int(np.count_nonzero(self.rsid_codes >= 0))
+        patterns = {}
+        if standard:
+            patterns['rs'] = standard
+        if len(self) - standard:
+            patterns['other'] = len(self) - standard
+        return patterns
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import uuid
+import select
+import socket
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Any, Optional
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    """
+    Channel announcing reference data changes to every app instance.
+
+    A message carries the new reference data version (None when the
+    database has no version counter). Each instance starts the bus with a
+    callback, which is called on its event loop for every message published
+    by another instance; messages this process published itself are dropped.
+
+    Implementations (REFERENCE_INVALIDATION_BUS):
+        postgres  LISTEN/NOTIFY on the reference_data_version channel; the
+                  reference table triggers notify it too, so data loads
+                  reach every instance without going through the app
+        file      a file every instance can see, polled for changes
+        memory    this process only, for tests and single-instance setups
+    """
+    CHANNEL = "reference_data_version"
+
+    # Identifies messages published by this process
+    SENDER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    _instance: Optional["InvalidationBus"] = None
+
+    def __init__(self):
+        self._callback: Optional[Callable[[Optional[int]], None]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._status: Dict[str, Any] = {
+            "messages_received": 0,
+            "last_message_at": None,
+            "last_error": None,
+        }
+
+    @staticmethod
+    def get() -> Optional["InvalidationBus"]:
+        """
+        Get the bus configured by REFERENCE_INVALIDATION_BUS.
+
+        Returns:
+            The process-wide bus, or None if disabled
+        """
+        if InvalidationBus._instance is None:
+            kind = settings.REFERENCE_INVALIDATION_BUS.lower()
+            if kind == "none":
+                return None
+            if kind == "postgres":
+                InvalidationBus._instance = PostgresBus()
+            elif kind == "file":
+                InvalidationBus._instance = FileBus(Path(settings.REFERENCE_INVALIDATION_FILE))
+            elif kind == "memory":
+                InvalidationBus._instance = InProcessBus()
+            else:
+                raise ValueError(f"Unknown REFERENCE_INVALIDATION_BUS: {settings.REFERENCE_INVALIDATION_BUS}")
+        return InvalidationBus._instance
+
+    @property
+    def kind(self) -> str:
+        return type(self).__name__
+
+    def start(self, callback: Callable[[Optional[int]], None]) -> None:
+        """
+        Start delivering messages to `callback` on the running event loop.
+
+        Args:
+            callback: Called with the announced version
+        """
+        self._loop = asyncio.get_running_loop()
+        self._callback = callback
+        self._stop.clear()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, name=f"{self.kind}-listener", daemon=True)
+            self._thread.start()
+        logger.info(f"Listening for reference data changes on {self.kind}")
+
+    async def stop(self) -> None:
+        """Stop listening."""
+        self._stop.set()
+        self._callback = None
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            await run_in_threadpool(thread.join, settings.REFERENCE_INVALIDATION_POLL_SECONDS * 4)
+
+    async def publish(self, version: Optional[int]) -> None:
+        """
+        Announce a reference data change to the other instances.
+
+        Args:
+            version: The new reference data version, or None if unversioned
+        """
+        payload = json.dumps({"version": version, "sender": InvalidationBus.SENDER})
+        await run_in_threadpool(self._send, payload)
+        logger.info(f"Announced reference data version {version} on {self.kind}")
+
+    def status(self) -> Dict[str, Any]:
+        """Bus health, for /admin/cache/status."""
+        last_message_at = self._status["last_message_at"]
+        return {
+            "kind": self.kind,
+            "listening": self._thread is not None and self._thread.is_alive(),
+            "messages_received": self._status["messages_received"],
+            "last_message_at": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_message_at))
+            if last_message_at else None,
+            "last_error": self._status["last_error"],
+        }
+
+    def _send(self, payload: str) -> None:
+        raise NotImplementedError
+
+    def _listen(self) -> None:
+        """Listener thread body; returns once self._stop is set."""
+
+    def _receive(self, payload: str) -> None:
+        # Called from the listener thread
+        try:
+            message = json.loads(payload)
+            version = message.get("version")
+            version = int(version) if version is not None else None
+        except (ValueError, TypeError, AttributeError):
+            logger.warning(f"Ignoring malformed reference invalidation message: {payload!r}")
+            return
+        if message.get("sender") == InvalidationBus.SENDER:
+            return
+
+        self._status["messages_received"] += 1
+        self._status["last_message_at"] = time.time()
+        loop, callback = self._loop, self._callback
+        if loop is None or callback is None:
+            return
+        try:
+            loop.call_soon_threadsafe(callback, version)
+        except RuntimeError:
+            # Event loop already closed during shutdown
+            pass
+
+
+class InProcessBus(InvalidationBus):
+    """Delivers messages within this process only."""
+
+    def _listen(self) -> None:
+        # Messages are delivered by _send; the thread only marks the bus as listening
+        self._stop.wait()
+
+    def _send(self, payload: str) -> None:
+        # Sender filtering would drop everything in a single process
+        message = json.loads(payload)
+        message["sender"] = None
+        self._receive(json.dumps(message))
+
+
+class FileBus(InvalidationBus):
+    """
+    Shares messages through a file, for instances on one host or a shared
+    volume. The latest message is written over the file; listeners poll it
+    every REFERENCE_INVALIDATION_POLL_SECONDS.
+    """
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self.path = path
+
+    def _stat(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _send(self, payload: str) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(payload)
+        # A new inode each time, so identical payloads are still seen as changes
+        os.replace(tmp_path, self.path)
+
+    def _listen(self) -> None:
+        seen = self._stat()
+        while not self._stop.wait(settings.REFERENCE_INVALIDATION_POLL_SECONDS):
+            current = self._stat()
+            if current is None or current == seen:
+                continue
+            seen = current
+            try:
+                payload = self.path.read_text()
+            except OSError as e:
+                self._status["last_error"] = str(e)
+                continue
+            self._receive(payload)
+
+
+class PostgresBus(InvalidationBus):
+    """
+    LISTEN/NOTIFY on the reference_data_version channel.
+
+    The listener holds one dedicated connection outside the pool and
+    reconnects with back-off if it drops. Works with both drivers the app
+    uses: psycopg2 connections are waited on with select(), pg8000 ones
+    are pinged every REFERENCE_INVALIDATION_POLL_SECONDS to collect
+    notifications.
+    """
+    _MAX_BACKOFF_SECONDS = 60
+
+    def _send(self, payload: str) -> None:
+        from app.db.session import engine
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         {"channel": InvalidationBus.CHANNEL, "payload": payload})
+
+    def _listen(self) -> None:
+        from app.db.session import engine
+        failures = 0
+        while not self._stop.is_set():
+            fairy = None
+            try:
+                fairy = engine.raw_connection()
+                conn = fairy.dbapi_connection
+                conn.autocommit = True
+                cursor = conn.cursor()
+                cursor.execute(f"LISTEN {InvalidationBus.CHANNEL}")
+                failures = 0
+                logger.info(f"Listening on Postgres channel {InvalidationBus.CHANNEL}")
+                if hasattr(conn, "notifies"):
+                    self._drain_psycopg2(conn)
+                else:
+                    self._drain_pg8000(conn, cursor)
+            except Exception as e:
+                failures += 1
+                self._status["last_error"] = str(e) or type(e).__name__
+                delay = min(settings.REFERENCE_INVALIDATION_POLL_SECONDS * 2 ** failures,
+                            PostgresBus._MAX_BACKOFF_SECONDS)
+                logger.error(f"Reference invalidation listener failed ({failures} in a row), "
+                             f"reconnecting in {delay:.0f}s: {e}")
+                self._stop.wait(delay)
+            finally:
+                if fairy is not None:
+                    # Never hand a LISTENing connection back to the pool
+                    fairy.invalidate()
+
+    def _drain_psycopg2(self, conn) -> None:
+        while not self._stop.is_set():
+            readable, _, _ = select.select([conn], [], [], settings.REFERENCE_INVALIDATION_POLL_SECONDS)
+            if not readable:
+                continue
+            conn.poll()
+            while conn.notifies:
+                self._receive(conn.notifies.pop(0).payload)
+
+    def _drain_pg8000(self, conn, cursor) -> None:
+        while not self._stop.wait(settings.REFERENCE_INVALIDATION_POLL_SECONDS):
+            # pg8000 only reads notifications while processing a query
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            while conn.notifications:
+                _, _, payload = conn.notifications.popleft()
+                self._receive(payload)
@@ -0,0 +1,176 @@
+import os
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import AbstractSet, Dict, Optional
+
+from app.core.config import settings
+from app.services.genotype_data import GenotypeData
+from app.services.genome_cache import write_genome_cache, read_genome_cache, GenomeCacheError
+from app.services.upload_store import UploadStore
+
+logger = logging.getLogger(__name__)
+
+
+class PanelGenotypes:
+    """
+    Persisted genotypes of each upload at a superset of the reference panel.
+
+    Next to every stored upload, UploadStore.genotypes_path holds the
+    genotypes at every rsid of a "superset panel": the reference panel at
+    the time of storing plus the rsids listed in PANEL_SUPERSET_FILE. The
+    record is in the binary genome cache format (memory-mapped on load) and
+    names its superset by digest; each superset's rsid list is written once
+    to UPLOADS_DIR/.panels/<digest>.txt.
+
+    Unlike the genome cache, records do not expire, so re-analysis after a
+    cache expiry, a force_refresh or a reference update reads a few KB
+    instead of re-parsing the upload. The raw file is only parsed again when
+    the panel grows beyond the stored superset.
+    """
+    _extra_rsids: Optional[frozenset] = None
+    _supersets: Dict[str, frozenset] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def panels_dir() -> Path:
+        return Path(settings.UPLOADS_DIR) / ".panels"
+
+    @staticmethod
+    def extra_rsids() -> frozenset:
+        """rsids from PANEL_SUPERSET_FILE, read once per process."""
+        if PanelGenotypes._extra_rsids is None:
+            rsids = set()
+            if settings.PANEL_SUPERSET_FILE:
+                try:
+                    with open(settings.PANEL_SUPERSET_FILE, 'r') as f:
+                        for line in f:
+                            line = line.split('#', 1)[0].strip()
+                            if line:
+                                rsids.add(line)
+                    logger.info(f"Loaded {len(rsids)} superset panel rsids from {settings.PANEL_SUPERSET_FILE}")
+                except OSError as e:
+                    logger.warning(f"Could not read PANEL_SUPERSET_FILE: {e}")
+            PanelGenotypes._extra_rsids = frozenset(rsids)
+        return PanelGenotypes._extra_rsids
+
+    @staticmethod
+    def superset(panel_rsids: AbstractSet[str], file_hash: Optional[str] = None) -> frozenset:
+        """
+        Get the rsids to store for an upload analysed against a panel.
+
+        Args:
+            panel_rsids: rsids of the current reference panel
+            file_hash: If given, the upload's existing superset is kept, so
+                a record only ever grows
+
+        Returns:
+            The panel plus the configured superset rsids
+        """
+        superset = frozenset(panel_rsids) | PanelGenotypes.extra_rsids()
+        if file_hash is not None:
+            try:
+                _, header = read_genome_cache(UploadStore.genotypes_path(file_hash))
+                digest = header['metadata'].get('superset')
+                stored = PanelGenotypes._load_superset(digest) if digest else None
+                if stored is not None:
+                    superset |= stored
+            except (GenomeCacheError, OSError, ValueError):
+                pass
+        return superset
+
+    @staticmethod
+    def digest(rsids: AbstractSet[str]) -> str:
+        return hashlib.sha256('\n'.join(sorted(rsids)).encode()).hexdigest()[:32]
+
+    @staticmethod
+    def _load_superset(digest: str) -> Optional[frozenset]:
+        superset = PanelGenotypes._supersets.get(digest)
+        if superset is not None:
+            return superset
+        try:
+            with open(PanelGenotypes.panels_dir() / f"{digest}.txt", 'r') as f:
+                superset = frozenset(line.strip() for line in f if line.strip())
+        except OSError as e:
+            logger.warning(f"Superset panel {digest} is unreadable: {e}")
+            return None
+        with PanelGenotypes._lock:
+            PanelGenotypes._supersets[digest] = superset
+        return superset
+
+    @staticmethod
+    def _store_superset(superset: frozenset) -> str:
+        digest = PanelGenotypes.digest(superset)
+        if digest in PanelGenotypes._supersets:
+            return digest
+
+        path = PanelGenotypes.panels_dir() / f"{digest}.txt"
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(temp_path, 'w') as f:
+                f.write('\n'.join(sorted(superset)))
+            os.replace(temp_path, path)
+        with PanelGenotypes._lock:
+            PanelGenotypes._supersets[digest] = superset
+        return digest
+
+    @staticmethod
+    def save(file_hash: str, genome: GenotypeData, superset: frozenset) -> bool:
+        """
+        Store an upload's genotypes at a superset panel.
+
+        Args:
+            file_hash: Hash of the upload
+            genome: Parsed genome; either complete or already filtered to `superset`
+            superset: rsids the record covers, as from superset()
+
+        Returns:
+            True if the record was written
+        """
+        if UploadStore.find(file_hash) is None:
+            # Records live next to the upload; raw datasets have none
+            return False
+        try:
+            digest = PanelGenotypes._store_superset(superset)
+            write_genome_cache(UploadStore.genotypes_path(file_hash), genome.select(superset), file_hash,
+                               metadata={'superset': digest})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not store panel genotypes for {file_hash}: {e}")
+            return False
+        logger.info(f"Stored panel genotypes for {file_hash} ({len(superset)} superset rsids)")
+        return True
+
+    @staticmethod
+    def load(file_hash: str, panel_rsids: AbstractSet[str]) -> Optional[GenotypeData]:
+        """
+        Get an upload's genotypes at a panel from its stored record.
+
+        Args:
+            file_hash: Hash of the upload
+            panel_rsids: rsids of the panel to analyse
+
+        Returns:
+            GenotypeData filtered to the panel, or None if there is no record
+            or the panel has rsids the record doesn't cover
+        """
+        path = UploadStore.genotypes_path(file_hash)
+        try:
+            genotypes, header = read_genome_cache(path)
+        except FileNotFoundError:
+            return None
+        except (GenomeCacheError, OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable panel genotypes for {file_hash}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+        digest = header['metadata'].get('superset')
+        superset = PanelGenotypes._load_superset(digest) if digest else None
+        if superset is None or not panel_rsids <= superset:
+            logger.info(f"Panel genotypes for {file_hash} don't cover the current panel")
+            return None
+        if len(panel_rsids) == len(superset):
+            # The record is exactly the panel
+            return genotypes
+        return genotypes.select(panel_rsids)
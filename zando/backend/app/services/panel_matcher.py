@@ -0,0 +1,241 @@
+import logging
+import numpy as np
+from typing import List, Dict, Any, Iterable, Sequence, Tuple, Union
+
+from app.services.genotype_data import GenotypeData, encode_rsid
+
+logger = logging.getLogger(__name__)
+
+# Maps an ASCII allele code to its upper-case code
+_UPPER = np.arange(256, dtype=np.uint8)
+_UPPER[ord('a'):ord('z') + 1] -= ord('a') - ord('A')
+
+# Risk allele code for panel entries that can never match a single-byte allele
+_NO_ALLELE = 255
+
+class PanelMatcher:
+    """
+    Hash index over the reference SNP panel, used to match parsed genomes.
+
+    The panel (the rows of the `snp` table) is small compared to an upload,
+    so it is indexed once by rsid and every lookup is a single dict probe.
+    Matching cost therefore scales with the panel and a single pass over the
+    genome instead of genome size times panel size.
+    """
+
+    __slots__ = ('_index', '_rsids')
+
+    def __init__(self, snp_details: Dict[str, Dict[str, Any]]):
+        """
+        Build the index from the cached SNP table.
+
+        Args:
+            snp_details: Dictionary mapping rsids to their SNP details
+        """
+        # Pre-compute the upper-cased risk allele so matching doesn't redo it per SNP
+        self._index = {
+            rsid: (details, (details.get('risk_allele') or '').upper())
+            for rsid, details in snp_details.items()
+        }
+        self._rsids = frozenset(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, rsid: str) -> bool:
+        return rsid in self._index
+
+    @property
+    def rsids(self) -> frozenset:
+        """Set of all rsids in the reference panel."""
+        return self._rsids
+
+    def details_for(self, rsids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the SNP details for the panel rsids present in `rsids`.
+
+        Args:
+            rsids: Collection of rsid values (list, set or dict keys)
+
+        Returns:
+            Dictionary mapping matching rsids to their details
+        """
+        if not isinstance(rsids, (set, frozenset, dict)):
+            rsids = set(rsids)
+
+        # Walk whichever side is smaller; usually that's the panel
+        if len(self._index) <= len(rsids):
+            return {rsid: entry[0] for rsid, entry in self._index.items() if rsid in rsids}
+        return {rsid: self._index[rsid][0] for rsid in rsids if rsid in self._index}
+
+    def match(self, parsed_snps: Union[GenotypeData, Iterable[Dict[str, Any]]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Find parsed SNPs that are in the panel and carry the panel's risk allele.
+
+        Args:
+            parsed_snps: GenotypeData, or SNP dictionaries with 'rsid', 'allele1' and 'allele2'
+
+        Returns:
+            List of (parsed_snp, snp_detail) tuples in genome order
+        """
+        index = self._index
+        matches = []
+
+        if isinstance(parsed_snps, GenotypeData):
+            # Columnar genomes are indexed too, so only the panel rsids get materialized
+            genome = parsed_snps
+            parsed_snps = (genome[int(row)] for row in genome.find(index))
+
+        for snp in parsed_snps:
+            entry = index.get(snp['rsid'])
+            if entry is None:
+                continue
+
+            snp_detail, risk_allele = entry
+            if risk_allele == snp['allele1'].upper() or risk_allele == snp['allele2'].upper():
+                matches.append((snp, snp_detail))
+
+        return matches
+
+
+class PanelMatch:
+    """
+    Result of matching a columnar genome against the panel, as parallel arrays.
+    """
+
+    __slots__ = ('rows', 'panel_index', 'risk_copies')
+
+    def __init__(self, rows: np.ndarray, panel_index: np.ndarray, risk_copies: np.ndarray):
+        """
+        Args:
+            rows: Genome rows that carry the risk allele, in genome order
+            panel_index: Position of each row's SNP in VectorPanelMatcher.rsids
+            risk_copies: Number of risk alleles per row (1 heterozygous, 2 homozygous)
+        """
+        self.rows = rows
+        self.panel_index = panel_index
+        self.risk_copies = risk_copies
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def homozygous(self) -> np.ndarray:
+        """Boolean mask of rows carrying two copies of the risk allele."""
+        return self.risk_copies == 2
+
+
+class VectorPanelMatcher:
+    """
+    Risk-allele matching on the columns of a GenotypeData.
+
+    The panel is encoded once into sorted int64 rsid codes and uint8 risk
+    allele codes. Matching joins the genome's rsid codes against them with
+    a sorted merge, then upper-cases and compares the allele columns as
+    whole arrays, so no Python work is done per SNP and the cost grows with
+    log(panel size) rather than panel size. Results are identical to
+    PanelMatcher.match.
+    """
+
+    __slots__ = ('rsids', '_codes', '_positions', '_risk', '_other')
+
+    def __init__(self, snp_details: Dict[str, Dict[str, Any]]):
+        """
+        Args:
+            snp_details: Dictionary mapping rsids to their SNP details
+        """
+        self.rsids = tuple(snp_details)
+        self._risk = np.fromiter(
+            (self._encode_risk(details.get('risk_allele')) for details in snp_details.values()),
+            dtype=np.uint8, count=len(self.rsids),
+        )
+
+        codes = []
+        positions = []
+        # Non-numeric ids are encoded per genome, against its own id table
+        self._other = {}
+        for position, rsid in enumerate(self.rsids):
+            code = encode_rsid(rsid)
+            if code is None:
+                self._other[rsid] = position
+            else:
+                codes.append(code)
+                positions.append(position)
+
+        codes = np.array(codes, dtype=np.int64)
+        order = np.argsort(codes, kind='stable')
+        self._codes = codes[order]
+        self._positions = np.array(positions, dtype=np.intp)[order]
+
+    def to_arrays(self) -> Dict[str, Any]:
+        """Encoded panel for from_arrays, e.g. to store in a shared snapshot file."""
+        return {'codes': self._codes, 'positions': self._positions, 'risk': self._risk, 'other': dict(self._other)}
+
+    @classmethod
+    def from_arrays(cls, rsids: Sequence[str], codes: np.ndarray, positions: np.ndarray, risk: np.ndarray,
+                    other: Dict[str, int]) -> 'VectorPanelMatcher':
+        """
+        Rebuild a matcher from to_arrays() output without re-encoding the panel.
+
+        Args:
+            rsids: Panel rsids, indexed by position (any sequence)
+            codes: Sorted rsid codes
+            positions: Panel position of each code
+            risk: Risk allele code per panel position
+            other: Non-numeric rsids and their panel positions
+
+        Returns:
+            VectorPanelMatcher over the given arrays, which may be read-only views
+        """
+        matcher = cls.__new__(cls)
+        matcher.rsids = rsids
+        matcher._codes = codes
+        matcher._positions = positions.astype(np.intp, copy=False)
+        matcher._risk = risk
+        matcher._other = other
+        return matcher
+
+    @staticmethod
+    def _encode_risk(risk_allele: Any) -> int:
+        risk_allele = (risk_allele or '').upper()
+        if not risk_allele:
+            # Matches the empty allele of a no-call, as the string comparison does
+            return 0
+        if len(risk_allele) == 1 and ord(risk_allele) < 128:
+            return ord(risk_allele)
+        return _NO_ALLELE
+
+    def __len__(self) -> int:
+        return len(self.rsids)
+
+    def match(self, genome: GenotypeData) -> PanelMatch:
+        """
+        Find the genome rows that are in the panel and carry its risk allele.
+
+        Args:
+            genome: Columnar genome
+
+        Returns:
+            PanelMatch with the matching rows in genome order
+        """
+        codes, positions = self._codes, self._positions
+        if self._other:
+            # Same panel positions, looked up by code in this genome's id table
+            other = [(code, position) for rsid, position in self._other.items()
+                     for code in genome.encode((rsid,)).tolist()]
+            if other:
+                codes = np.concatenate([codes, np.array([code for code, _ in other], dtype=np.int64)])
+                positions = np.concatenate([positions, np.array([position for _, position in other], dtype=np.intp)])
+                order = np.argsort(codes, kind='stable')
+                codes, positions = codes[order], positions[order]
+
+        rows = genome.find_codes(codes)
+        panel_index = positions[np.searchsorted(codes, genome.rsid_codes[rows])]
+
+        risk = self._risk[panel_index]
+        risk_copies = (
+            (_UPPER[genome.alleles1[rows]] == risk).astype(np.uint8)
+            + (_UPPER[genome.alleles2[rows]] == risk)
+        )
+        carried = risk_copies > 0
+        return PanelMatch(rows[carried], panel_index[carried], risk_copies[carried])
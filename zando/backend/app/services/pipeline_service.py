@@ -0,0 +1,157 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.dna_service import DNAService
+from app.services.analysis_service import AnalysisService
+from app.services.report_service import ReportService
+from app.services.pdf_service import PDFService
+
+logger = logging.getLogger(__name__)
+
+class PipelineService:
+    """
+    Opt-in eager analysis that runs right after an upload.
+
+    When EAGER_ANALYSIS is enabled, each new upload schedules
+    parse -> panel analysis (with its summary) -> cached report in the
+    background, so the /analysis/process and /reports/generate calls that
+    the frontend makes next find warm caches. At most
+    EAGER_ANALYSIS_CONCURRENCY pipelines run at once, each in a worker
+    thread so the event loop keeps serving requests. A hash is only ever
+    in flight once; callers can join an in-flight run instead of
+    duplicating the work.
+    """
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _in_flight: Dict[str, asyncio.Task] = {}
+    _status: Dict[str, Dict[str, Any]] = {}
+    _STATUS_MAX = 1000
+
+    @staticmethod
+    def schedule(file_hash: str) -> bool:
+        """
+        Schedule the eager pipeline for an uploaded file.
+
+        Args:
+            file_hash: Hash of the uploaded file
+
+        Returns:
+            True if a pipeline was scheduled, False if disabled or already running
+        """
+        if not settings.EAGER_ANALYSIS:
+            return False
+        if file_hash in PipelineService._in_flight:
+            return False
+
+        if PipelineService._semaphore is None:
+            PipelineService._semaphore = asyncio.Semaphore(settings.EAGER_ANALYSIS_CONCURRENCY)
+
+        PipelineService._set_status(file_hash, "queued")
+        task = asyncio.get_running_loop().create_task(PipelineService._run(file_hash))
+        PipelineService._in_flight[file_hash] = task
+        task.add_done_callback(lambda _: PipelineService._in_flight.pop(file_hash, None))
+        logger.info(f"Scheduled eager analysis for {file_hash}")
+        return True
+
+    @staticmethod
+    async def join(file_hash: Optional[str], timeout: Optional[float] = None) -> None:
+        """
+        Wait for an in-flight pipeline for this hash, if there is one.
+
+        Failures and timeouts are swallowed: the caller simply falls back to
+        doing the work itself.
+
+        Args:
+            file_hash: Hash of the uploaded file
+            timeout: Maximum seconds to wait (defaults to EAGER_ANALYSIS_JOIN_TIMEOUT)
+        """
+        task = PipelineService._in_flight.get(file_hash) if file_hash else None
+        if task is None:
+            return
+
+        logger.info(f"Waiting for in-flight eager analysis of {file_hash}")
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout or settings.EAGER_ANALYSIS_JOIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.info(f"Eager analysis of {file_hash} still running; continuing without it")
+        except Exception:
+            pass
+
+    @staticmethod
+    def get_status(file_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the state of the most recent eager pipeline for a hash.
+
+        Args:
+            file_hash: Hash of the uploaded file
+
+        Returns:
+            Dictionary with state and timings, or None if never scheduled
+        """
+        return PipelineService._status.get(file_hash)
+
+    @staticmethod
+    def _set_status(file_hash: str, state: str, **details: Any) -> None:
+        status = PipelineService._status.pop(file_hash, {})
+        status.update(details, state=state, updated_at=time.time())
+        PipelineService._status[file_hash] = status
+        while len(PipelineService._status) > PipelineService._STATUS_MAX:
+            PipelineService._status.pop(next(iter(PipelineService._status)))
+
+    @staticmethod
+    async def _run(file_hash: str) -> None:
+        async with PipelineService._semaphore:
+            PipelineService._set_status(file_hash, "running")
+            start_time = time.time()
+            try:
+                # The pipeline is synchronous under its async signatures, so it
+                # gets its own event loop in a worker thread
+                await run_in_threadpool(asyncio.run, PipelineService._pipeline(file_hash))
+                elapsed_time = time.time() - start_time
+                PipelineService._set_status(file_hash, "completed", processing_time=elapsed_time)
+                logger.info(f"Eager analysis for {file_hash} completed in {elapsed_time:.2f}s")
+            except Exception as e:
+                PipelineService._set_status(file_hash, "failed", error=str(e))
+                logger.error(f"Eager analysis for {file_hash} failed: {str(e)}")
+
+    @staticmethod
+    async def _pipeline(file_hash: str) -> None:
+        db = SessionLocal()
+        try:
+            # Panel analysis, including the summary section
+            reference_version = await AnalysisService.get_reference_version(await db.connection())
+            report_data = AnalysisService.get_cached_analysis(file_hash, reference_version)
+            if report_data is None:
+                panel_rsids = await AnalysisService.get_panel_rsids(db)
+                snp_data = await DNAService.get_snp_data_by_hash(file_hash, db, panel_rsids=panel_rsids)
+                if snp_data is None:
+                    raise ValueError(f"No DNA data found for file hash: {file_hash}")
+                report_data = await AnalysisService.process_snp_data(snp_data, db)
+                AnalysisService.cache_analysis_results(file_hash, report_data)
+
+            # Rendered reports, cached by content for /reports/generate
+            for report_type in settings.EAGER_REPORT_TYPES.split(','):
+                report_type = report_type.strip()
+                if ReportService.get_cached_report(report_data, report_type=report_type) is not None:
+                    continue
+
+                report_path = os.path.join(settings.REPORTS_DIR, f"eager_{uuid.uuid4()}.pdf")
+                try:
+                    if report_type == "markdown":
+                        await PDFService.generate_markdown_report(report_data, report_path, db)
+                    else:
+                        await PDFService.generate_pdf_report(report_data, report_path, db)
+                    with open(report_path, 'rb') as f:
+                        ReportService.cache_report(report_data, f.read(), report_type=report_type)
+                finally:
+                    if os.path.exists(report_path):
+                        os.unlink(report_path)
+        finally:
+            await db.close()
@@ -0,0 +1,158 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.analysis_service import AnalysisService
+
+logger = logging.getLogger(__name__)
+
+
+def _format_time(timestamp: Optional[float]) -> Optional[str]:
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)) if timestamp else None
+
+
+class ReferenceRefresher:
+    """
+    Stale-while-revalidate refresh of the reference snapshot.
+
+    Started from the application lifespan. While it runs, requests are
+    served the current snapshot without touching the reference caches or
+    the database; this task polls the reference data version every
+    REFERENCE_VERSION_CHECK_SECONDS and rebuilds the snapshot when the
+    version changes or it is within REFERENCE_REFRESH_AHEAD_SECONDS of
+    expiring. The new snapshot is swapped in once complete.
+
+    Each check runs in a worker thread on its own session and event loop,
+    so a reload never blocks the event loop. A failed refresh keeps the old
+    snapshot, backs off, and is reported by status() for /admin/cache/status.
+    """
+    _task: Optional[asyncio.Task] = None
+    # Set to check the version now rather than at the next poll
+    _wake: Optional[asyncio.Event] = None
+    _status: Dict[str, Any] = {
+        "last_check": None,
+        "last_refresh": None,
+        "last_refresh_seconds": None,
+        "last_error": None,
+        "last_error_at": None,
+        "consecutive_failures": 0,
+    }
+
+    # Longest wait between attempts after repeated failures
+    _MAX_BACKOFF_SECONDS = 5 * 60
+
+    @staticmethod
+    def start() -> None:
+        """Start the refresh task on the running event loop."""
+        if ReferenceRefresher._task is not None:
+            return
+        ReferenceRefresher._wake = asyncio.Event()
+        ReferenceRefresher._task = asyncio.get_running_loop().create_task(ReferenceRefresher._run())
+        AnalysisService._background_refresh = True
+        logger.info("Started background reference data refresh")
+
+    @staticmethod
+    async def stop() -> None:
+        """Stop the refresh task; requests go back to refreshing inline."""
+        task = ReferenceRefresher._task
+        if task is None:
+            return
+        AnalysisService._background_refresh = False
+        ReferenceRefresher._task = None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    @staticmethod
+    def notify(version: Optional[int]) -> None:
+        """
+        Handle a reference data change announced by another instance.
+        
+        Called on the event loop by the invalidation bus. The version is
+        re-read on the next check, which runs right away while the refresh
+        task is running and on the next request otherwise.
+        
+        Args:
+            version: The announced version, or None if the database is unversioned
+        """
+        known = AnalysisService._reference_version
+        if version is not None and known is not None and version <= known:
+            return
+        logger.info(f"Reference data change announced (version {version}), refreshing")
+        if version is None:
+            AnalysisService.expire_reference_caches(float('inf'))
+        AnalysisService._reference_version_checked = 0.0
+        if ReferenceRefresher._wake is not None:
+            ReferenceRefresher._wake.set()
+
+    @staticmethod
+    def status() -> Dict[str, Any]:
+        """Health of the background refresh, for /admin/cache/status."""
+        status = ReferenceRefresher._status
+        return {
+            "running": ReferenceRefresher._task is not None and not ReferenceRefresher._task.done(),
+            "last_check": _format_time(status["last_check"]),
+            "last_refresh": _format_time(status["last_refresh"]),
+            "last_refresh_seconds": status["last_refresh_seconds"],
+            "last_error": status["last_error"],
+            "last_error_at": _format_time(status["last_error_at"]),
+            "consecutive_failures": status["consecutive_failures"],
+        }
+
+    @staticmethod
+    async def _run() -> None:
+        status = ReferenceRefresher._status
+        while True:
+            delay = settings.REFERENCE_VERSION_CHECK_SECONDS
+            try:
+                await run_in_threadpool(asyncio.run, ReferenceRefresher.refresh())
+                status["consecutive_failures"] = 0
+            except Exception as e:
+                status["last_error"] = str(e) or type(e).__name__
+                status["last_error_at"] = time.time()
+                status["consecutive_failures"] += 1
+                delay = min(delay * 2 ** status["consecutive_failures"], ReferenceRefresher._MAX_BACKOFF_SECONDS)
+                logger.error(f"Reference data refresh failed ({status['consecutive_failures']} in a row), "
+                             f"keeping the current snapshot: {e}")
+            try:
+                await asyncio.wait_for(ReferenceRefresher._wake.wait(), max(delay, 0.1))
+            except asyncio.TimeoutError:
+                pass
+            ReferenceRefresher._wake.clear()
+
+    @staticmethod
+    async def refresh() -> bool:
+        """
+        Check the reference data and rebuild the snapshot if it is due.
+
+        Returns:
+            True if a new snapshot was built
+        """
+        status = ReferenceRefresher._status
+        db = SessionLocal()
+        try:
+            conn = await db.connection()
+            status["last_check"] = time.time()
+            # Drops the caches if the version moved
+            await AnalysisService.check_reference_version(conn)
+            ahead = settings.REFERENCE_REFRESH_AHEAD_SECONDS
+            if not AnalysisService.reference_refresh_due(ahead):
+                return False
+
+            previous = AnalysisService._reference_snapshot
+            start_time = time.time()
+            snapshot = await AnalysisService.refresh_reference_snapshot(conn, within=ahead)
+            elapsed_time = time.time() - start_time
+            status["last_refresh"] = time.time()
+            status["last_refresh_seconds"] = round(elapsed_time, 2)
+            logger.info(f"Refreshed reference data in {elapsed_time:.2f}s, snapshot version {snapshot.version}")
+            return snapshot is not previous
+        finally:
+            await db.close()
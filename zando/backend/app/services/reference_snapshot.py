@@ -0,0 +1,219 @@
+import time
+import json
+import hashlib
+import logging
+from typing import List, Dict, Any, Iterable, Optional, Tuple, Union
+
+from app.services.genotype_data import GenotypeData, ALLELE_LABELS
+from app.services.panel_matcher import PanelMatcher, VectorPanelMatcher
+
+logger = logging.getLogger(__name__)
+
+# Alleles whose genotype combinations are compiled ahead of time; anything
+# else (lower case, no-calls) is decided per request
+GENOTYPE_ALPHABET = "ACGTDI"
+_COMPILED_ALLELES = frozenset(GENOTYPE_ALPHABET)
+
+
+class PanelDecision:
+    """
+    The precomputed outcome for one panel SNP and one genotype that carries
+    its risk allele: the finished mutation entry and the ingredients it adds.
+
+    Shared by every report that hits it, so it must be treated as read-only.
+    """
+
+    __slots__ = ('mutation', 'beneficials', 'cautions')
+
+    def __init__(self, mutation: Dict[str, Any], beneficials: Tuple[Dict[str, Any], ...],
+                 cautions: Tuple[Dict[str, Any], ...]):
+        self.mutation = mutation
+        self.beneficials = beneficials
+        self.cautions = cautions
+
+
+class ReferenceSnapshot:
+    """
+    Immutable, compiled view of the reference panel.
+
+    Built once from the SNP, characteristic and ingredient tables, it joins
+    them per panel SNP and precomputes, for every genotype over
+    GENOTYPE_ALPHABET, whether the risk allele is carried and if so the
+    complete mutation entry and ingredient lists. Analysing a genome is
+    then a lookup per panel SNP plus list concatenation.
+
+    Nothing in a snapshot changes after construction, so readers use it
+    without locks; a refresh builds a new snapshot and swaps the reference.
+    """
+
+    __slots__ = ('snps', 'characteristics', 'ingredients', '_matcher', 'vector_matcher', 'built_at', '_decisions',
+                 '_version')
+
+    def __init__(self, snps: Dict[str, Dict[str, Any]],
+                 characteristics: Dict[int, List[Dict[str, Any]]],
+                 ingredients: Dict[int, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]],
+                 version: Optional[str] = None):
+        """
+        Args:
+            snps: rsid -> SNP details, as from AnalysisService.get_all_snps_cached
+            characteristics: snp_id -> characteristics, as from get_all_characteristics_cached
+            ingredients: snp_id -> (beneficial, caution), as from get_all_ingredients_cached
+            version: Version of the reference data the tables were read at; if
+                omitted, a digest of their content is used
+        """
+        start_time = time.time()
+        self.snps = snps
+        self.characteristics = characteristics
+        self.ingredients = ingredients
+        self._matcher = PanelMatcher(snps)
+        self.vector_matcher = VectorPanelMatcher(snps)
+        self.built_at = time.time()
+        self._version = version
+
+        # rsid -> (upper-cased risk allele, {(allele1, allele2): PanelDecision})
+        self._decisions = {}
+        for rsid, detail in snps.items():
+            risk_allele = (detail.get('risk_allele') or '').upper()
+            table = {}
+            if risk_allele in _COMPILED_ALLELES:
+                template = self._compile(rsid, detail, '', '')
+                for allele1 in GENOTYPE_ALPHABET:
+                    for allele2 in GENOTYPE_ALPHABET:
+                        if risk_allele == allele1 or risk_allele == allele2:
+                            table[(allele1, allele2)] = PanelDecision(
+                                dict(template.mutation, allele1=allele1, allele2=allele2),
+                                template.beneficials, template.cautions,
+                            )
+            self._decisions[rsid] = (risk_allele, table)
+
+        logger.info(f"Reference snapshot compiled for {len(snps)} SNPs in {time.time() - start_time:.3f}s")
+
+    def __len__(self) -> int:
+        return len(self._decisions)
+
+    @property
+    def matcher(self) -> PanelMatcher:
+        """Hash index over the panel."""
+        if self._matcher is None:
+            self._matcher = PanelMatcher(self.snps)
+        return self._matcher
+
+    @property
+    def rsids(self) -> frozenset:
+        """Set of all rsids in the reference panel."""
+        return self.matcher.rsids
+
+    @property
+    def version(self) -> str:
+        """Version of the reference data, so results can be tied to the data they came from."""
+        if self._version is None:
+            content = json.dumps([self.snps, self.characteristics, self.ingredients], sort_keys=True, default=str)
+            self._version = hashlib.sha256(content.encode()).hexdigest()[:16]
+        return self._version
+
+    def fingerprint(self, report: Dict[str, Any]) -> str:
+        """
+        Canonical key for the genotype profile behind a report.
+
+        A report is fully determined by the reference data and the risk
+        carrying calls, in genome order, so genomes that agree on those
+        share a fingerprint and can share one computed result.
+
+        Args:
+            report: Report dictionary from analyze()
+
+        Returns:
+            Hex digest of the reference version and the carrier calls
+        """
+        hasher = hashlib.sha256(self.version.encode())
+        for mutation in report['mutations']:
+            hasher.update(f"\n{mutation['rsid']}\t{mutation['allele1']}\t{mutation['allele2']}".encode())
+        return hasher.hexdigest()
+
+    def _compile(self, rsid: str, detail: Dict[str, Any], allele1: str, allele2: str) -> PanelDecision:
+        snp_id = detail['snp_id']
+        beneficials, cautions = self.ingredients.get(snp_id, ((), ()))
+        mutation = {
+            'gene': detail['gene'],
+            'rsid': rsid,
+            'allele1': allele1,
+            'allele2': allele2,
+            'risk_allele': detail['risk_allele'],
+            'effect': detail['effect'],
+            'evidence_strength': detail['evidence_strength'],
+            'category': detail['category'],
+            'characteristics': self.characteristics.get(snp_id, [])
+        }
+        return PanelDecision(mutation, tuple(beneficials), tuple(cautions))
+
+    def decide(self, rsid: str, allele1: str, allele2: str) -> Optional[PanelDecision]:
+        """
+        Look up the outcome for one genotype call.
+
+        Args:
+            rsid: rsid of the call
+            allele1: First allele as parsed
+            allele2: Second allele as parsed
+
+        Returns:
+            PanelDecision if the rsid is in the panel and the risk allele is carried, None otherwise
+        """
+        entry = self._decisions.get(rsid)
+        if entry is None:
+            return None
+
+        risk_allele, table = entry
+        decision = table.get((allele1, allele2))
+        if decision is not None:
+            return decision
+        if allele1 in _COMPILED_ALLELES and allele2 in _COMPILED_ALLELES:
+            # Compiled combination without the risk allele
+            return None
+
+        # Uncompiled spelling (e.g. lower case): same rule, built on demand
+        if risk_allele == allele1.upper() or risk_allele == allele2.upper():
+            return self._compile(rsid, self.snps[rsid], allele1, allele2)
+        return None
+
+    def analyze(self, parsed_snps: Union[GenotypeData, Iterable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Build the mutations and ingredient recommendations for a genome.
+
+        Args:
+            parsed_snps: GenotypeData, or SNP dictionaries with 'rsid', 'allele1' and 'allele2'
+
+        Returns:
+            Report dictionary with 'mutations' and 'ingredient_recommendations', in genome order
+        """
+        mutations = []
+        prioritize = []
+        caution = []
+
+        if isinstance(parsed_snps, GenotypeData):
+            # Risk alleles are matched on the arrays; only carriers are decoded
+            genome = parsed_snps
+            match = self.vector_matcher.match(genome)
+            rsids = self.vector_matcher.rsids
+            calls = zip(
+                (rsids[position] for position in match.panel_index.tolist()),
+                (ALLELE_LABELS[code] for code in genome.alleles1[match.rows].tolist()),
+                (ALLELE_LABELS[code] for code in genome.alleles2[match.rows].tolist()),
+            )
+        else:
+            calls = ((snp['rsid'], snp['allele1'], snp['allele2']) for snp in parsed_snps)
+
+        for rsid, allele1, allele2 in calls:
+            decision = self.decide(rsid, allele1, allele2)
+            if decision is None:
+                continue
+            mutations.append(decision.mutation)
+            prioritize.extend(decision.beneficials)
+            caution.extend(decision.cautions)
+
+        return {
+            'mutations': mutations,
+            'ingredient_recommendations': {
+                'prioritize': prioritize,
+                'caution': caution
+            }
+        }
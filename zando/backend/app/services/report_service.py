@@ -1,5 +1,7 @@
 import os
+import json
 import uuid
+import hashlib
 import logging
 from typing import Dict, Any, Optional, List
 from datetime import datetime
@@ -19,27 +21,42 @@ class ReportService:
     """
     
     @staticmethod
-    def get_cached_report(report_data: Dict[str, Any], report_type: str = "markdown") -> Optional[bytes]:
+    def get_report_cache_key(report_data: Dict[str, Any], report_type: str = "markdown") -> str:
         """
-        Check if a report with the same data exists in cache.
+        Get the cache key for a rendered report.
+        
+        Reports with a genotype profile fingerprint are keyed by it, so every
+        user with the same profile shares one PDF; older reports without one
+        are keyed by a hash of their content.
         
         Args:
             report_data: The analysis data to create a report from
             report_type: Type of report ("markdown" or "standard")
             
         Returns:
-            Cached report binary data if exists, None otherwise
+            Cache key for DNAService.save_to_cache/load_from_cache
         """
-        # Create a hash of the report data and type for cache lookup
-        import hashlib
-        import json
+        if report_data.get('fingerprint'):
+            return f"{report_type}_{report_data['fingerprint']}"
         
         # Create a deterministic representation of the report data
         data_str = json.dumps(report_data, sort_keys=True)
-        hash_key = f"{report_type}_{hashlib.sha256(data_str.encode()).hexdigest()}"
+        return f"{report_type}_{hashlib.sha256(data_str.encode()).hexdigest()}"
+    
+    @staticmethod
+    def get_cached_report(report_data: Dict[str, Any], report_type: str = "markdown") -> Optional[bytes]:
+        """
+        Check if a report with the same data exists in cache.
         
+        Args:
+            report_data: The analysis data to create a report from
+            report_type: Type of report ("markdown" or "standard")
+            
+        Returns:
+            Cached report binary data if exists, None otherwise
+        """
         # Check cache for this report
-        return DNAService.load_from_cache(hash_key, format_type='pdf')
+        return DNAService.load_from_cache(ReportService.get_report_cache_key(report_data, report_type), format_type='pdf')
     
     @staticmethod
     def cache_report(report_data: Dict[str, Any], pdf_data: bytes, report_type: str = "markdown") -> None:
@@ -51,15 +68,8 @@ class ReportService:
             pdf_data: The binary PDF data
             report_type: Type of report ("markdown" or "standard")
         """
-        import hashlib
-        import json
-        
-        # Create a deterministic representation of the report data
-        data_str = json.dumps(report_data, sort_keys=True)
-        hash_key = f"{report_type}_{hashlib.sha256(data_str.encode()).hexdigest()}"
-        
         # Save to cache
-        DNAService.save_to_cache(pdf_data, hash_key, format_type='pdf')
+        DNAService.save_to_cache(pdf_data, ReportService.get_report_cache_key(report_data, report_type), format_type='pdf')
     
     @staticmethod
     async def record_report_generation(
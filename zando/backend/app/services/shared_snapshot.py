@@ -0,0 +1,110 @@
+import os
+import time
+import fcntl
+import logging
+import contextlib
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.snapshot_file import (
+    MappedReferenceSnapshot, SnapshotFileError, read_snapshot_file, write_snapshot_file,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SharedSnapshot:
+    """
+    Reference snapshots shared by every worker process on a host.
+
+    The snapshot for each reference data version is written once to
+    REFERENCE_SNAPSHOT_DIR/<version>.snapshot and memory-mapped by every
+    worker (see snapshot_file), so extra workers add almost no memory for
+    reference data and only one of them loads the tables from the database.
+
+    Hand-off is by version: a worker that sees a new version attaches to
+    the file for it if one exists, and otherwise takes the directory lock,
+    loads, and publishes it for the others. Files of older versions stay
+    in place for the workers still mapping them; only the newest _KEEP are
+    kept.
+    """
+    _KEEP = 3
+
+    @staticmethod
+    def directory() -> Path:
+        return Path(settings.REFERENCE_SNAPSHOT_DIR)
+
+    @staticmethod
+    def path_for(version: str) -> Path:
+        return SharedSnapshot.directory() / f"{version}.snapshot"
+
+    @staticmethod
+    def attach(version: str, max_age: float) -> Optional[MappedReferenceSnapshot]:
+        """
+        Map the published snapshot for a version.
+
+        Args:
+            version: Reference data version
+            max_age: Seconds after publishing that a snapshot is no longer used
+
+        Returns:
+            MappedReferenceSnapshot, or None if there is no current file for the version
+        """
+        path = SharedSnapshot.path_for(version)
+        try:
+            snapshot = read_snapshot_file(path)
+        except FileNotFoundError:
+            return None
+        except (SnapshotFileError, OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable shared snapshot {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        if snapshot.version != version or time.time() - snapshot.built_at > max_age:
+            return None
+        return snapshot
+
+    @staticmethod
+    @contextlib.contextmanager
+    def lock() -> Iterator[None]:
+        """Hold the directory lock, so only one worker per host loads and publishes."""
+        directory = SharedSnapshot.directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / ".lock", 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def publish(snps: Dict[str, Dict[str, Any]], characteristics: Dict[int, List[Dict[str, Any]]],
+                ingredients: Dict[int, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]],
+                version: str) -> Path:
+        """
+        Write the snapshot file for a version and prune old ones.
+
+        Args:
+            snps: rsid -> SNP details
+            characteristics: snp_id -> characteristics
+            ingredients: snp_id -> (beneficial, caution)
+            version: Reference data version
+
+        Returns:
+            Path of the published file
+        """
+        path = SharedSnapshot.path_for(version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_snapshot_file(path, snps, characteristics, ingredients, version)
+        logger.info(f"Published shared reference snapshot {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+
+        published = []
+        for candidate in path.parent.glob("*.snapshot"):
+            try:
+                published.append((candidate.stat().st_mtime, candidate))
+            except FileNotFoundError:
+                continue
+        for _, old in sorted(published, reverse=True)[SharedSnapshot._KEEP:]:
+            # Workers that mapped it keep their mapping
+            old.unlink(missing_ok=True)
+        return path
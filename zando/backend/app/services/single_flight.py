@@ -0,0 +1,53 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Collapses concurrent loads of the same key into one.
+
+    The first caller for a key runs the loader; everyone who asks for the
+    key while it is running awaits the same result (or exception) instead
+    of running it again. Flights are tracked with a thread lock and
+    concurrent.futures.Future, so waiters on other event loops, such as the
+    eager pipeline's worker threads, join the same flight.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Future] = {}
+
+    async def run(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `loader` for `key`, or wait for the run already in flight.
+
+        Args:
+            key: Identity of the load
+            loader: Coroutine function producing the value
+
+        Returns:
+            The loader's result
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = Future()
+                self._flights[key] = flight
+
+        if not leader:
+            return await asyncio.wrap_future(flight)
+
+        try:
+            result = await loader()
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
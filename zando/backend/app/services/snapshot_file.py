@@ -0,0 +1,357 @@
+import os
+import json
+import mmap
+import pickle
+import struct
+import logging
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from collections.abc import Mapping, Sequence
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from app.services.panel_matcher import VectorPanelMatcher
+from app.services.reference_snapshot import ReferenceSnapshot, PanelDecision, _COMPILED_ALLELES
+
+logger = logging.getLogger(__name__)
+
+# On-disk layout of a shared reference snapshot:
+#
+#   header   fixed-size struct, see _HEADER
+#   toc      JSON table of contents: array dtypes/offsets and the vector
+#            matcher's non-numeric rsids
+#   arrays   raw little-endian arrays, each aligned to _ALIGNMENT bytes:
+#            rsids              sorted, fixed-width bytes
+#            snp_offsets        record boundaries in snp_records, per rsid
+#            snp_records        pickled SNP details
+#            snp_ids            sorted snp_ids with characteristics or ingredients
+#            link_flags         bit 0: has characteristics, bit 1: has ingredients
+#            link_offsets       record boundaries in link_records, per snp_id
+#            link_records       pickled (characteristics, ingredients)
+#            panel_codes, panel_positions, panel_risk
+#                               VectorPanelMatcher arrays, positions in rsid order
+#
+# Every worker process maps the same file, so the reference data is held
+# once in the page cache; records are only unpickled when looked up.
+SNAPSHOT_FILE_MAGIC = b'ZREFSNP\x00'
+SNAPSHOT_FILE_VERSION = 1
+
+# magic, format version, reserved, SNP count, unix timestamp, toc offset, toc length, reference version
+_HEADER = struct.Struct('<8sHHQdQQ64s')
+_ALIGNMENT = 64
+_ARRAYS = ('rsids', 'snp_offsets', 'snp_records', 'snp_ids', 'link_flags', 'link_offsets', 'link_records',
+           'panel_codes', 'panel_positions', 'panel_risk')
+
+_HAS_CHARACTERISTICS = 1
+_HAS_INGREDIENTS = 2
+
+
+class SnapshotFileError(ValueError):
+    """Raised when a snapshot file is truncated, corrupt or of an unknown version."""
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _pack_records(values: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    blobs = [pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL) for value in values]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.uint64)
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(blobs), dtype=np.uint8)
+
+
+def write_snapshot_file(path: Path, snps: Dict[str, Dict[str, Any]],
+                        characteristics: Dict[int, List[Dict[str, Any]]],
+                        ingredients: Dict[int, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]],
+                        version: str) -> None:
+    """
+    Write reference tables to `path` in the shared snapshot format.
+
+    The file is written next to its destination and renamed into place, so
+    processes that already mapped the previous file are unaffected.
+
+    Args:
+        path: Destination file
+        snps: rsid -> SNP details, as from AnalysisService.get_all_snps_cached
+        characteristics: snp_id -> characteristics
+        ingredients: snp_id -> (beneficial, caution)
+        version: Reference data version recorded in the header
+    """
+    key = version.encode('ascii')
+    if len(key) > 64:
+        raise ValueError(f"Reference version too long for snapshot header: {version}")
+
+    rsids = sorted(snps)
+    encoded = [rsid.encode('utf-8') for rsid in rsids]
+    width = max((len(rsid) for rsid in encoded), default=1)
+    snp_offsets, snp_records = _pack_records([snps[rsid] for rsid in rsids])
+
+    snp_ids = sorted(set(characteristics) | set(ingredients))
+    link_flags = np.array(
+        [(_HAS_CHARACTERISTICS if snp_id in characteristics else 0) | (_HAS_INGREDIENTS if snp_id in ingredients else 0)
+         for snp_id in snp_ids], dtype=np.uint8,
+    )
+    link_offsets, link_records = _pack_records(
+        [(characteristics.get(snp_id), ingredients.get(snp_id)) for snp_id in snp_ids]
+    )
+
+    # Encoded in rsid order, so panel positions index the rsids array
+    panel = VectorPanelMatcher({rsid: snps[rsid] for rsid in rsids}).to_arrays()
+
+    arrays = []
+    for name, array in (
+        ('rsids', np.array(encoded, dtype=f'S{width}')),
+        ('snp_offsets', snp_offsets),
+        ('snp_records', snp_records),
+        ('snp_ids', np.array(snp_ids, dtype=np.int64)),
+        ('link_flags', link_flags),
+        ('link_offsets', link_offsets),
+        ('link_records', link_records),
+        ('panel_codes', panel['codes'].astype(np.int64)),
+        ('panel_positions', panel['positions'].astype(np.int64)),
+        ('panel_risk', panel['risk']),
+    ):
+        array = np.ascontiguousarray(array)
+        arrays.append((name, array.astype(array.dtype.newbyteorder('<'), copy=False)))
+
+    entries = []
+    toc = {'arrays': entries, 'other': panel['other']}
+
+    # The TOC size depends on the offsets it records, so settle it first
+    toc_bytes = b''
+    for _ in range(3):
+        data_offset = _align(_HEADER.size + len(toc_bytes))
+        entries.clear()
+        for name, array in arrays:
+            entries.append({'name': name, 'dtype': array.dtype.str, 'offset': data_offset, 'length': array.nbytes})
+            data_offset = _align(data_offset + array.nbytes)
+        settled = len(toc_bytes)
+        toc_bytes = json.dumps(toc, separators=(',', ':')).encode('utf-8')
+        if _align(_HEADER.size + len(toc_bytes)) == _align(_HEADER.size + settled):
+            break
+    else:
+        raise ValueError("Snapshot file table of contents did not settle")
+
+    header = _HEADER.pack(
+        SNAPSHOT_FILE_MAGIC, SNAPSHOT_FILE_VERSION, 0, len(rsids),
+        datetime.now().timestamp(), _HEADER.size, len(toc_bytes), key,
+    )
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(toc_bytes)
+            for entry, (_, array) in zip(entries, arrays):
+                f.seek(entry['offset'])
+                f.write(array.tobytes())
+            # Empty trailing arrays still need their offsets inside the file
+            f.truncate(entries[-1]['offset'] + entries[-1]['length'])
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+class _Records:
+    """Pickled records in a mapped file, unpickled one at a time."""
+
+    __slots__ = ('_mapped', '_base', '_offsets')
+
+    def __init__(self, mapped: mmap.mmap, base: int, offsets: np.ndarray):
+        self._mapped = mapped
+        self._base = base
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def load(self, index: int) -> Any:
+        start = self._base + int(self._offsets[index])
+        end = self._base + int(self._offsets[index + 1])
+        return pickle.loads(self._mapped[start:end])
+
+
+class MappedRsids(Sequence):
+    """Sorted panel rsids in a mapped file, decoded on access."""
+
+    __slots__ = ('_rsids',)
+
+    def __init__(self, rsids: np.ndarray):
+        self._rsids = rsids
+
+    def __len__(self) -> int:
+        return len(self._rsids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [rsid.decode('utf-8') for rsid in self._rsids[index]]
+        return self._rsids[index].decode('utf-8')
+
+    def find(self, rsid: str) -> int:
+        """Position of `rsid`, or -1 if it is not in the panel."""
+        key = rsid.encode('utf-8')
+        position = int(np.searchsorted(self._rsids, key))
+        if position < len(self._rsids) and self._rsids[position] == key:
+            return position
+        return -1
+
+
+class MappedSNPs(Mapping):
+    """rsid -> SNP details, read from a mapped snapshot file."""
+
+    __slots__ = ('_rsids', '_records')
+
+    def __init__(self, rsids: MappedRsids, records: _Records):
+        self._rsids = rsids
+        self._records = records
+
+    def __getitem__(self, rsid: str) -> Dict[str, Any]:
+        position = self._rsids.find(rsid) if isinstance(rsid, str) else -1
+        if position < 0:
+            raise KeyError(rsid)
+        return self._records.load(position)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rsids)
+
+    def __len__(self) -> int:
+        return len(self._rsids)
+
+
+class MappedLinks(Mapping):
+    """snp_id -> characteristics or ingredients, read from a mapped snapshot file."""
+
+    __slots__ = ('_snp_ids', '_present', '_records', '_part')
+
+    def __init__(self, snp_ids: np.ndarray, flags: np.ndarray, records: _Records, flag: int):
+        self._snp_ids = snp_ids
+        self._present = (flags & flag) != 0
+        self._records = records
+        self._part = 0 if flag == _HAS_CHARACTERISTICS else 1
+
+    def __getitem__(self, snp_id: int) -> Any:
+        position = int(np.searchsorted(self._snp_ids, snp_id)) if isinstance(snp_id, (int, np.integer)) else -1
+        if position < 0 or position >= len(self._snp_ids) or self._snp_ids[position] != snp_id \
+                or not self._present[position]:
+            raise KeyError(snp_id)
+        return self._records.load(position)[self._part]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._snp_ids[self._present].tolist())
+
+    def __len__(self) -> int:
+        return int(self._present.sum())
+
+
+class MappedReferenceSnapshot(ReferenceSnapshot):
+    """
+    ReferenceSnapshot backed by a shared snapshot file.
+
+    Nothing is compiled up front: the vector matcher runs directly on the
+    mapped arrays and a panel SNP's mutation template is unpickled and
+    compiled when a genome first carries its risk allele, keeping the most
+    recent _MEMO_MAX. Results are identical to a ReferenceSnapshot built
+    from the same tables. Pickling sends only the path, so batch workers
+    map the same file.
+    """
+
+    __slots__ = ('path', '_rsids', '_rsid_set')
+
+    _MEMO_MAX = 8192
+
+    def __init__(self, path: Path, mapped: mmap.mmap, arrays: Dict[str, np.ndarray], toc: Dict[str, Any],
+                 header: Dict[str, Any]):
+        self.path = path
+        self._rsids = MappedRsids(arrays['rsids'])
+        self.snps = MappedSNPs(self._rsids, _Records(mapped, toc['offsets']['snp_records'], arrays['snp_offsets']))
+        links = _Records(mapped, toc['offsets']['link_records'], arrays['link_offsets'])
+        self.characteristics = MappedLinks(arrays['snp_ids'], arrays['link_flags'], links, _HAS_CHARACTERISTICS)
+        self.ingredients = MappedLinks(arrays['snp_ids'], arrays['link_flags'], links, _HAS_INGREDIENTS)
+        self.vector_matcher = VectorPanelMatcher.from_arrays(
+            self._rsids, arrays['panel_codes'], arrays['panel_positions'], arrays['panel_risk'], toc['other'],
+        )
+        self._matcher = None
+        self._rsid_set = None
+        self.built_at = header['timestamp']
+        self._version = header['version']
+        # rsid -> (upper-cased risk allele, template PanelDecision), most recent _MEMO_MAX
+        self._decisions = {}
+
+    def __len__(self) -> int:
+        return len(self._rsids)
+
+    def __reduce__(self):
+        return (read_snapshot_file, (self.path,))
+
+    @property
+    def rsids(self) -> frozenset:
+        if self._rsid_set is None:
+            self._rsid_set = frozenset(self._rsids)
+        return self._rsid_set
+
+    def decide(self, rsid: str, allele1: str, allele2: str) -> Optional[PanelDecision]:
+        entry = self._decisions.get(rsid)
+        if entry is None:
+            detail = self.snps.get(rsid)
+            if detail is None:
+                return None
+            entry = ((detail.get('risk_allele') or '').upper(), self._compile(rsid, detail, '', ''))
+            self._decisions[rsid] = entry
+            while len(self._decisions) > MappedReferenceSnapshot._MEMO_MAX:
+                self._decisions.pop(next(iter(self._decisions)))
+
+        # Same rule as the compiled tables of ReferenceSnapshot.decide
+        risk_allele, template = entry
+        if risk_allele not in _COMPILED_ALLELES and allele1 in _COMPILED_ALLELES and allele2 in _COMPILED_ALLELES:
+            return None
+        if risk_allele != allele1.upper() and risk_allele != allele2.upper():
+            return None
+        return PanelDecision(dict(template.mutation, allele1=allele1, allele2=allele2),
+                             template.beneficials, template.cautions)
+
+
+def read_snapshot_file(path: Path) -> MappedReferenceSnapshot:
+    """
+    Memory-map a shared snapshot file.
+
+    Args:
+        path: Snapshot file
+
+    Returns:
+        MappedReferenceSnapshot over the file
+    """
+    path = Path(path)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _HEADER.size:
+            raise SnapshotFileError("Snapshot file is truncated")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, file_version, _, snp_count, timestamp, toc_offset, toc_length, key = _HEADER.unpack_from(mapped)
+    if magic != SNAPSHOT_FILE_MAGIC:
+        raise SnapshotFileError("Not a snapshot file")
+    if file_version != SNAPSHOT_FILE_VERSION:
+        raise SnapshotFileError(f"Unsupported snapshot file version {file_version}")
+    if toc_offset + toc_length > size:
+        raise SnapshotFileError("Snapshot file table of contents is truncated")
+    toc = json.loads(mapped[toc_offset:toc_offset + toc_length])
+
+    arrays = {}
+    toc['offsets'] = {}
+    for entry in toc['arrays']:
+        dtype = np.dtype(entry['dtype'])
+        if entry['offset'] + entry['length'] > size:
+            raise SnapshotFileError(f"Snapshot file array {entry['name']} is truncated")
+        arrays[entry['name']] = np.frombuffer(
+            mapped, dtype=dtype, count=entry['length'] // dtype.itemsize, offset=entry['offset'],
+        )
+        toc['offsets'][entry['name']] = entry['offset']
+
+    missing = [name for name in _ARRAYS if name not in arrays]
+    if missing or len(arrays['rsids']) != snp_count or len(arrays['snp_offsets']) != snp_count + 1:
+        raise SnapshotFileError("Snapshot file arrays do not match the header")
+
+    header = {'timestamp': timestamp, 'version': key.rstrip(b'\x00').decode('ascii')}
+    return MappedReferenceSnapshot(path, mapped, arrays, toc, header)
@@ -0,0 +1,181 @@
+import logging
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+from app.services.reference_snapshot import ReferenceSnapshot
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TEMPLATE = (
+    "\nGENETIC PROFILE SUMMARY\n"
+    "\n"
+    "Your DNA analysis revealed {variant_count} significant genetic variants that influence your skin health:\n"
+    "\n"
+    "• {high} high-priority variants requiring specific attention\n"
+    "• {moderate} moderate-impact variants to consider\n"
+    "• {weak} lower-impact variants identified\n"
+    "\n"
+    "Key Areas Affected:\n"
+    "{categories}\n"
+    "\n"
+    "What This Means For You:\n"
+    "Based on your genetic profile, your skin care routine should focus on:\n"
+    "\n"
+    "{focus_areas}\n"
+)
+
+NO_FOCUS_AREAS = "No specific focus areas identified."
+
+
+def _priority(evidence_strength: Optional[str]) -> int:
+    if evidence_strength == 'Strong':
+        return 1
+    if evidence_strength == 'Moderate':
+        return 2
+    return 3
+
+
+class SummaryEngine:
+    """
+    In-process port of the generate_genetic_analysis_section and
+    generate_summary_section SQL functions.
+
+    It works from a ReferenceSnapshot instead of the snp and link tables,
+    and reproduces the SQL text exactly:
+
+    - one finding per (gene, category), taken from its strongest-evidence
+      SNP (format_genetic_analysis's DISTINCT ON); ties go to the lowest
+      snp_id, where PostgreSQL's choice is unspecified
+    - a finding without characteristics carries a single NULL trait, as
+      array_agg over the LEFT JOIN does
+    - strings sort in the database's collation: the engine is given the
+      category and characteristic names in the order PostgreSQL sorts them
+      (see AnalysisService.get_summary_engine); without it, code point
+      order is used, which matches the "C" collation
+    - NULLs sort last and are dropped by array_to_string/string_agg, and a
+      NULL format() argument renders as an empty string
+
+    Summaries are memoized by the sorted variant set, so genomes with the
+    same risk variants share the work.
+    """
+
+    __slots__ = ('snapshot', '_ranks', '_memo')
+
+    _MEMO_MAX = 4096
+
+    def __init__(self, snapshot: ReferenceSnapshot, collation_order: Optional[Sequence[str]] = None):
+        """
+        Args:
+            snapshot: Reference snapshot to summarize against
+            collation_order: Every term from collation_terms(), sorted by the database
+        """
+        self.snapshot = snapshot
+        self._ranks = {term: rank for rank, term in enumerate(collation_order)} if collation_order else None
+        self._memo: Dict[Tuple[int, Tuple[str, ...]], str] = {}
+
+    @staticmethod
+    def collation_terms(snapshot: ReferenceSnapshot) -> List[str]:
+        """
+        Get every string the summary sorts: SNP categories and characteristic names.
+
+        Args:
+            snapshot: Reference snapshot
+
+        Returns:
+            Sorted list of distinct terms
+        """
+        terms = {detail['category'] for detail in snapshot.snps.values() if detail.get('category') is not None}
+        for characteristics in snapshot.characteristics.values():
+            terms.update(c['name'] for c in characteristics if c.get('name') is not None)
+        return sorted(terms)
+
+    def _sort_key(self, value: Optional[str]) -> tuple:
+        if value is None:
+            return (1,)
+        if self._ranks is None:
+            return (0, value)
+        return (0, self._ranks.get(value, len(self._ranks)), value)
+
+    def summarize(self, variants: Sequence[str]) -> str:
+        """
+        Generate the summary section for a list of risk variants.
+
+        Args:
+            variants: rsids of the report's mutations
+
+        Returns:
+            Summary text, identical to generate_summary_section's
+        """
+        key = (len(variants), tuple(sorted(set(variants))))
+        summary = self._memo.get(key)
+        if summary is None:
+            summary = self._generate(key[0], key[1])
+            self._memo[key] = summary
+            while len(self._memo) > SummaryEngine._MEMO_MAX:
+                self._memo.pop(next(iter(self._memo)))
+        return summary
+
+    def findings(self, variants: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        Get the findings generate_genetic_analysis_section would return.
+
+        Args:
+            variants: rsids of the report's mutations
+
+        Returns:
+            One finding per (gene, category) with 'category', 'evidence_strength' and 'characteristics'
+        """
+        # DISTINCT ON (gene, category) ... ORDER BY gene, category, priority
+        chosen: Dict[Tuple[Optional[str], Optional[str]], Dict[str, Any]] = {}
+        for rsid in set(variants):
+            detail = self.snapshot.snps.get(rsid)
+            if detail is None:
+                continue
+            group = (detail['gene'], detail['category'])
+            current = chosen.get(group)
+            rank = (_priority(detail['evidence_strength']), detail['snp_id'])
+            if current is None or rank < (_priority(current['evidence_strength']), current['snp_id']):
+                chosen[group] = detail
+
+        findings = []
+        for detail in chosen.values():
+            names = {c['name'] for c in self.snapshot.characteristics.get(detail['snp_id'], [])}
+            findings.append({
+                'category': detail['category'],
+                'evidence_strength': detail['evidence_strength'],
+                # array_agg(DISTINCT ...) over a LEFT JOIN: {NULL} when there are none
+                'characteristics': sorted(names, key=self._sort_key) if names else [None],
+            })
+        return findings
+
+    def _generate(self, variant_count: int, variants: Tuple[str, ...]) -> str:
+        findings = self.findings(variants)
+
+        strengths = [f['evidence_strength'] for f in findings]
+        categories = sorted({f['category'] for f in findings}, key=self._sort_key)
+
+        # SELECT DISTINCT category, trait, evidence_strength, priority
+        traits = {
+            (f['category'], trait, f['evidence_strength'], _priority(f['evidence_strength']))
+            for f in findings
+            for trait in f['characteristics']
+        }
+        groups: Dict[Optional[str], Tuple[int, List[str]]] = {}
+        for category, trait, _, priority in traits:
+            category_priority, names = groups.get(category, (priority, []))
+            if trait is not None:
+                names.append(trait)
+            groups[category] = (min(category_priority, priority), names)
+
+        focus_lines = []
+        for category in sorted(groups, key=lambda c: (groups[c][0], self._sort_key(c))):
+            names = sorted(groups[category][1], key=self._sort_key)
+            focus_lines.append(f"• {category or ''}: {', '.join(names)}")
+
+        return SUMMARY_TEMPLATE.format(
+            variant_count=variant_count or '',
+            high=strengths.count('Strong'),
+            moderate=strengths.count('Moderate'),
+            weak=strengths.count('Weak'),
+            categories=', '.join(c for c in categories if c is not None) if findings else '',
+            focus_areas='\n'.join(focus_lines) if focus_lines else NO_FOCUS_AREAS,
+        )
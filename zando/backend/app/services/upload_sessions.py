@@ -0,0 +1,435 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import contextlib
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.dna_service import HashMismatchError
+from app.services.genome_parser import GenomeIngestor, GenomeIngestResult
+from app.services.upload_store import UploadStore
+
+logger = logging.getLogger(__name__)
+
+# Smallest chunk size a client may ask for; only the last chunk may be shorter
+MIN_CHUNK_SIZE = 256 * 1024
+
+
+class ChunkConflictError(ValueError):
+    """A chunk was re-sent with content different from what was already received."""
+
+
+class UploadSession:
+    """
+    A resumable, chunked upload of one file.
+
+    Session state lives under UPLOADS_DIR/.sessions/<upload_id>/:
+
+        data.part      preallocated file; each chunk is written at its offset
+        session.json   size, chunk size and the sha256 of every received chunk
+        .lock          serializes chunk writes across worker processes
+
+    Chunks can arrive in any order and in parallel, at any worker process.
+    A chunk is written once, after it is verified, and never overwritten, so
+    data.part always matches the digests in session.json. Verified chunks
+    are fed to a GenomeIngestor in file order as soon as the contiguous
+    prefix grows (the "frontier"), so hashing and parsing run alongside the
+    transfer. The received chunks are re-read from session.json under the
+    lock, so every process sees chunks stored by the others; only the ingest
+    state is per process, and is caught up from data.part when needed.
+    """
+
+    def __init__(self, upload_id: str, filename: str, size: int, chunk_size: int,
+                 declared_hash: Optional[str] = None, chunks: Optional[Dict[int, str]] = None,
+                 created_at: Optional[float] = None):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+        self.chunk_size = chunk_size
+        self.declared_hash = declared_hash
+        self.chunks = dict(chunks or {})
+        self.created_at = created_at or time.time()
+        self._lock = threading.Lock()
+        self._ingestor = GenomeIngestor(settings.DNA_PARSER_BLOCK_SIZE)
+        self._frontier = 0
+
+    @property
+    def directory(self) -> Path:
+        return UploadSessions.sessions_dir() / self.upload_id
+
+    @property
+    def data_path(self) -> Path:
+        return self.directory / "data.part"
+
+    @property
+    def state_path(self) -> Path:
+        return self.directory / "session.json"
+
+    @property
+    def total_chunks(self) -> int:
+        return max(1, -(-self.size // self.chunk_size))
+
+    @property
+    def bytes_received(self) -> int:
+        return sum(self.chunk_bounds(index)[1] for index in self.chunks)
+
+    def chunk_bounds(self, index: int) -> Tuple[int, int]:
+        """
+        Get the byte range of a chunk.
+
+        Args:
+            index: Zero-based chunk number
+
+        Returns:
+            Tuple of (offset, length)
+        """
+        if index < 0 or index >= self.total_chunks:
+            raise ValueError(f"Chunk index {index} out of range (0-{self.total_chunks - 1})")
+        offset = index * self.chunk_size
+        return offset, min(self.chunk_size, self.size - offset)
+
+    def missing_chunks(self) -> List[int]:
+        """Chunk indexes that still have to be uploaded."""
+        return [index for index in range(self.total_chunks) if index not in self.chunks]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Client-facing session status."""
+        missing = self.missing_chunks()
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "total_chunks": self.total_chunks,
+            "received_chunks": sorted(self.chunks),
+            "missing_chunks": missing,
+            "bytes_received": self.bytes_received,
+            # Everything before this offset is received; resume from here
+            "resume_offset": missing[0] * self.chunk_size if missing else self.size,
+            "complete": not missing,
+            "created_at": self.created_at,
+        }
+
+    def save(self) -> None:
+        """Persist the session state atomically."""
+        state = {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "declared_hash": self.declared_hash,
+            "chunks": {str(index): digest for index, digest in self.chunks.items()},
+            "created_at": self.created_at,
+        }
+        temp_path = self.state_path.with_name(f".session.json.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    @classmethod
+    def load(cls, directory: Path) -> "UploadSession":
+        """Restore a session from its state file; the ingest state restarts at chunk 0."""
+        with open(directory / "session.json", 'r') as f:
+            state = json.load(f)
+        chunks = {int(index): digest for index, digest in state["chunks"].items()}
+        return cls(state["upload_id"], state["filename"], state["size"], state["chunk_size"],
+                   state.get("declared_hash"), chunks, state.get("created_at"))
+
+    def refresh(self) -> None:
+        """Re-read the received chunks, which other worker processes may have added."""
+        with open(self.state_path, 'r') as f:
+            state = json.load(f)
+        # Replaced, not updated, so readers never see the dict change size
+        self.chunks = {int(index): digest for index, digest in state["chunks"].items()}
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the session lock, within this process and across worker processes."""
+        with self._lock:
+            try:
+                f = open(self.directory / ".lock", 'a')
+            except FileNotFoundError:
+                raise ValueError(f"Upload session {self.upload_id} was completed or discarded")
+            with f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def store_chunk(self, index: int, digest: str, data: bytes) -> bool:
+        """
+        Write a verified chunk at its offset, record it and advance the ingest frontier.
+
+        Args:
+            index: Chunk number
+            digest: sha256 of `data`, already checked against the client's
+            data: The chunk bytes
+
+        Returns:
+            False if the chunk had already been received with the same content
+
+        Raises:
+            ChunkConflictError: If the chunk was already received with different content
+        """
+        offset, _ = self.chunk_bounds(index)
+        with self._locked():
+            self.refresh()
+            received = self.chunks.get(index)
+            if received is not None:
+                if received != digest:
+                    raise ChunkConflictError(f"Chunk {index} was already received with different content")
+                return False
+
+            fd = os.open(self.data_path, os.O_WRONLY)
+            try:
+                view = memoryview(data)
+                while view:
+                    written = os.pwrite(fd, view, offset)
+                    view = view[written:]
+                    offset += written
+            finally:
+                os.close(fd)
+
+            self.chunks = {**self.chunks, index: digest}
+            self.save()
+            self._advance(index, data)
+            return True
+
+    def finish(self) -> GenomeIngestResult:
+        """
+        Complete the ingest once every chunk has been received.
+
+        Returns:
+            GenomeIngestResult for the assembled file
+        """
+        with self._locked():
+            self.refresh()
+            missing = self.missing_chunks()
+            if missing:
+                raise ValueError(f"Upload is missing {len(missing)} chunk(s), first is {missing[0]}")
+            self._advance(None, None)
+            return self._ingestor.finish()
+
+    def _advance(self, index: Optional[int], data: Optional[bytes]) -> None:
+        with open(self.data_path, 'rb') as f:
+            while self._frontier in self.chunks:
+                if self._frontier == index and data is not None:
+                    chunk = data
+                else:
+                    # Arrived out of order; read it back before assembly completes
+                    offset, length = self.chunk_bounds(self._frontier)
+                    chunk = os.pread(f.fileno(), length, offset)
+                self._ingestor.feed(chunk)
+                self._frontier += 1
+
+
+class UploadSessions:
+    """
+    Registry of in-progress chunked uploads.
+
+    Sessions are persisted to disk, so a client can resume after a dropped
+    connection or a server restart by asking which chunks are still missing.
+    Each process caches its sessions for the ingest state, but re-reads the
+    received chunks on every lookup, so any worker can serve any request.
+    """
+    _sessions: Dict[str, UploadSession] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def sessions_dir() -> Path:
+        return Path(settings.UPLOADS_DIR) / ".sessions"
+
+    @staticmethod
+    def create(filename: str, size: int, chunk_size: Optional[int] = None,
+               declared_hash: Optional[str] = None) -> UploadSession:
+        """
+        Start a new chunked upload.
+
+        Args:
+            filename: Original filename
+            size: Total file size in bytes
+            chunk_size: Requested chunk size; defaults to UPLOAD_SESSION_CHUNK_SIZE
+            declared_hash: Optional sha256 the client expects the file to have
+
+        Returns:
+            The new UploadSession
+        """
+        chunk_size = chunk_size or settings.UPLOAD_SESSION_CHUNK_SIZE
+        if size <= 0:
+            raise ValueError("size must be positive")
+        if size > settings.UPLOAD_MAX_SIZE:
+            raise ValueError(f"File too large; maximum is {settings.UPLOAD_MAX_SIZE} bytes")
+        if not MIN_CHUNK_SIZE <= chunk_size <= settings.UPLOAD_SESSION_MAX_CHUNK_SIZE:
+            raise ValueError(
+                f"chunk_size must be between {MIN_CHUNK_SIZE} and {settings.UPLOAD_SESSION_MAX_CHUNK_SIZE}"
+            )
+
+        UploadSessions.expire()
+
+        session = UploadSession(uuid.uuid4().hex, filename, size, chunk_size,
+                                declared_hash.lower() if declared_hash else None)
+        session.directory.mkdir(parents=True)
+        with open(session.data_path, 'wb') as f:
+            # Sparse preallocation so chunks can be written at any offset
+            f.truncate(size)
+        session.save()
+
+        with UploadSessions._lock:
+            UploadSessions._sessions[session.upload_id] = session
+        logger.info(f"Created upload session {session.upload_id} for {filename} "
+                    f"({size} bytes, {session.total_chunks} chunks)")
+        return session
+
+    @staticmethod
+    def get(upload_id: str) -> Optional[UploadSession]:
+        """
+        Look up a session, restoring it from disk if this process hasn't seen it.
+
+        Args:
+            upload_id: Session identifier
+
+        Returns:
+            UploadSession, or None if unknown or expired
+        """
+        try:
+            uuid.UUID(hex=upload_id)
+        except ValueError:
+            return None
+
+        with UploadSessions._lock:
+            session = UploadSessions._sessions.get(upload_id)
+            try:
+                if session is None:
+                    session = UploadSession.load(UploadSessions.sessions_dir() / upload_id)
+                    UploadSessions._sessions[upload_id] = session
+                else:
+                    # Other worker processes may have received chunks or completed it
+                    session.refresh()
+            except FileNotFoundError:
+                UploadSessions._sessions.pop(upload_id, None)
+                return None
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Unreadable upload session {upload_id}: {e}")
+                return None
+        return session
+
+    @staticmethod
+    async def write_chunk(session: UploadSession, index: int, body: AsyncIterator[bytes],
+                          expected_sha256: str) -> None:
+        """
+        Verify one chunk and write it at its offset.
+
+        The chunk is buffered and checked before anything is written, so a
+        chunk that fails verification leaves data.part untouched and stays
+        missing (or received, if it was a re-send). Re-sending a received
+        chunk with the same content is a no-op; with different content it is
+        rejected.
+
+        Args:
+            session: Target session
+            index: Chunk number
+            body: The request body stream
+            expected_sha256: sha256 of the chunk as computed by the client
+
+        Raises:
+            ValueError: If the chunk is the wrong size or fails verification
+            ChunkConflictError: If the chunk was already received with different content
+        """
+        _, length = session.chunk_bounds(index)
+        hasher = hashlib.sha256()
+        pieces = []
+        received = 0
+
+        async for piece in body:
+            if not piece:
+                continue
+            if received + len(piece) > length:
+                raise ValueError(f"Chunk {index} is larger than {length} bytes")
+            hasher.update(piece)
+            pieces.append(piece)
+            received += len(piece)
+
+        if received != length:
+            raise ValueError(f"Chunk {index} has {received} bytes, expected {length}")
+        digest = hasher.hexdigest()
+        if digest != expected_sha256.lower():
+            raise ValueError(f"Checksum mismatch for chunk {index}")
+
+        await run_in_threadpool(session.store_chunk, index, digest, b''.join(pieces))
+
+    @staticmethod
+    async def complete(session: UploadSession) -> Tuple[GenomeIngestResult, Path, bool]:
+        """
+        Assemble a fully received upload into the upload store.
+
+        Args:
+            session: Session with every chunk received
+
+        Returns:
+            Tuple of (GenomeIngestResult, stored path, True if the content was already stored)
+        """
+        result = await run_in_threadpool(session.finish)
+        if session.declared_hash and session.declared_hash != result.file_hash:
+            UploadSessions.discard(session.upload_id)
+            raise HashMismatchError(f"File hash {result.file_hash} does not match declared hash {session.declared_hash}")
+
+        # data.part is already the assembled file; moving it is a rename
+        stored_path, deduplicated = UploadStore.add(str(session.data_path), result.file_hash,
+                                                    session.filename, result.size)
+        UploadSessions.discard(session.upload_id)
+        logger.info(f"Completed upload session {session.upload_id} as {result.file_hash}")
+        return result, stored_path, deduplicated
+
+    @staticmethod
+    def discard(upload_id: str) -> bool:
+        """
+        Remove a session and its partial data.
+
+        Args:
+            upload_id: Session identifier
+
+        Returns:
+            True if a session was removed
+        """
+        with UploadSessions._lock:
+            UploadSessions._sessions.pop(upload_id, None)
+        directory = UploadSessions.sessions_dir() / upload_id
+        if not directory.exists():
+            return False
+        shutil.rmtree(directory, ignore_errors=True)
+        return True
+
+    @staticmethod
+    def expire() -> int:
+        """
+        Remove sessions older than UPLOAD_SESSION_TTL_HOURS.
+
+        Returns:
+            Number of sessions removed
+        """
+        cutoff = time.time() - settings.UPLOAD_SESSION_TTL_HOURS * 3600
+        removed = 0
+        sessions_dir = UploadSessions.sessions_dir()
+        if not sessions_dir.exists():
+            return 0
+        for directory in sessions_dir.iterdir():
+            try:
+                expired = (directory / "session.json").stat().st_mtime < cutoff
+            except FileNotFoundError:
+                # Possibly still being created; fall back to the directory age
+                expired = directory.stat().st_mtime < cutoff
+            if expired and UploadSessions.discard(directory.name):
+                removed += 1
+        if removed:
+            logger.info(f"Expired {removed} upload session(s)")
+        return removed
@@ -0,0 +1,207 @@
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Serializes read-modify-write of metadata sidecars within this process
+_metadata_lock = threading.Lock()
+
+class UploadStore:
+    """
+    Content-addressed storage for uploaded DNA files.
+
+    Each distinct file is stored once under its full sha256:
+
+        UPLOADS_DIR/ab/ab12...ef.txt     file content
+        UPLOADS_DIR/ab/ab12...ef.json    metadata (size, filenames, upload times)
+        UPLOADS_DIR/ab/ab12...ef.genotypes  panel genotypes (see PanelGenotypes)
+
+    Filenames are metadata only, so the same genome uploaded under different
+    names is one file on disk. UPLOADS_CACHE_DIR holds a hard link (or a
+    symlink where hard links aren't possible) rather than a second copy.
+    """
+
+    @staticmethod
+    def blob_path(file_hash: str) -> Path:
+        """
+        Get the storage path for a file hash.
+
+        Args:
+            file_hash: Full sha256 hex digest
+
+        Returns:
+            Path: Where the content is (or would be) stored
+        """
+        return Path(settings.UPLOADS_DIR) / file_hash[:2] / f"{file_hash}.txt"
+
+    @staticmethod
+    def metadata_path(file_hash: str) -> Path:
+        """Get the path of the metadata sidecar for a file hash."""
+        return UploadStore.blob_path(file_hash).with_suffix('.json')
+
+    @staticmethod
+    def genotypes_path(file_hash: str) -> Path:
+        """Get the path of the stored panel genotypes for a file hash."""
+        return UploadStore.blob_path(file_hash).with_suffix('.genotypes')
+
+    @staticmethod
+    def cache_link_path(file_hash: str) -> Path:
+        """Get the path of the quick-access link in UPLOADS_CACHE_DIR."""
+        return Path(settings.UPLOADS_CACHE_DIR) / f"{file_hash}.txt"
+
+    @staticmethod
+    def find(file_hash: str) -> Optional[Path]:
+        """
+        Look up stored content by hash.
+
+        Args:
+            file_hash: Full sha256 hex digest
+
+        Returns:
+            Path to the stored file if present, None otherwise
+        """
+        if len(file_hash) != 64:
+            return None
+        path = UploadStore.blob_path(file_hash)
+        return path if path.is_file() else None
+
+    @staticmethod
+    def get_metadata(file_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Read the metadata sidecar for a stored file.
+
+        Args:
+            file_hash: Full sha256 hex digest
+
+        Returns:
+            Metadata dictionary, or None if the file isn't stored
+        """
+        try:
+            with open(UploadStore.metadata_path(file_hash), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Error reading upload metadata for {file_hash}: {e}")
+            return None
+
+    @staticmethod
+    def add(temp_path: str, file_hash: str, filename: str, size: int) -> Tuple[Path, bool]:
+        """
+        Move a fully written upload into the store.
+
+        If the content is already stored, the temp file is discarded and only
+        the filename is recorded, so known content is never rewritten.
+
+        Args:
+            temp_path: Temp file holding the upload, on the same filesystem as UPLOADS_DIR
+            file_hash: sha256 of the temp file content
+            filename: Original filename
+            size: Size in bytes
+
+        Returns:
+            Tuple of (stored path, True if the content was already stored)
+        """
+        path = UploadStore.blob_path(file_hash)
+        deduplicated = path.is_file()
+
+        if deduplicated:
+            os.unlink(temp_path)
+            logger.info(f"Upload {file_hash} already stored; recorded filename {filename}")
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, path)
+            logger.info(f"Stored upload {file_hash} at {path}")
+
+        UploadStore.record_filename(file_hash, filename, size)
+        UploadStore.link_into_cache(file_hash)
+        return path, deduplicated
+
+    @staticmethod
+    def record_filename(file_hash: str, filename: str, size: int) -> Dict[str, Any]:
+        """
+        Add a filename to a stored file's metadata.
+
+        Args:
+            file_hash: Full sha256 hex digest
+            filename: Original filename of this upload
+            size: Size in bytes
+
+        Returns:
+            The updated metadata
+        """
+        now = datetime.now().isoformat()
+        metadata_path = UploadStore.metadata_path(file_hash)
+
+        with _metadata_lock:
+            metadata = UploadStore.get_metadata(file_hash) or {
+                'file_hash': file_hash,
+                'size': size,
+                'filenames': [],
+                'first_uploaded_at': now,
+            }
+            if filename not in metadata['filenames']:
+                metadata['filenames'].append(filename)
+            metadata['last_uploaded_at'] = now
+
+            temp_path = metadata_path.with_name(f".{metadata_path.name}.{os.getpid()}.tmp")
+            with open(temp_path, 'w') as f:
+                json.dump(metadata, f)
+            os.replace(temp_path, metadata_path)
+
+        return metadata
+
+    @staticmethod
+    def link_into_cache(file_hash: str) -> Optional[Path]:
+        """
+        Make the stored file reachable from UPLOADS_CACHE_DIR without copying it.
+
+        Args:
+            file_hash: Full sha256 hex digest
+
+        Returns:
+            Path of the link, or None if no link could be created
+        """
+        link_path = UploadStore.cache_link_path(file_hash)
+        if link_path.exists():
+            return link_path
+
+        target = UploadStore.blob_path(file_hash)
+        link_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(target, link_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            # Different filesystem or no hard link support
+            try:
+                os.symlink(target.resolve(), link_path)
+            except FileExistsError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not link {target} into the uploads cache: {e}")
+                return None
+        return link_path
+
+    @staticmethod
+    def iter_uploads() -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the metadata of every stored upload.
+
+        Yields:
+            Metadata dictionaries, each with the stored 'path' added
+        """
+        for metadata_path in Path(settings.UPLOADS_DIR).glob("??/*.json"):
+            file_hash = metadata_path.stem
+            metadata = UploadStore.get_metadata(file_hash)
+            if metadata is None:
+                continue
+            metadata['path'] = str(UploadStore.blob_path(file_hash))
+            yield metadata
@@ -11,6 +11,9 @@ from typing import AsyncGenerator
 from app.api.v1.api import api_router
 from app.core.config import settings
 from app.db.session import init_db
+from app.services.batch_analysis_service import BatchAnalysisService
+from app.services.invalidation_bus import InvalidationBus
+from app.services.reference_refresher import ReferenceRefresher
 
 # Configure logging with file name, line number, and function name
 logging.basicConfig(
@@ -42,11 +45,24 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     os.makedirs(settings.REPORTS_DIR, exist_ok=True)
     os.makedirs(settings.UPLOADS_DIR, exist_ok=True)
     
+    # Keep the reference snapshot fresh off the request path
+    if settings.REFERENCE_BACKGROUND_REFRESH:
+        ReferenceRefresher.start()
+    
+    # Hear about reference data changes made through other instances
+    invalidation_bus = InvalidationBus.get()
+    if invalidation_bus is not None:
+        invalidation_bus.start(ReferenceRefresher.notify)
+    
     # Yield control back to FastAPI
     yield
     
     # Shutdown logic (if any)
     logger.info("Shutting down Zando Genomic Analysis API")
+    if invalidation_bus is not None:
+        await invalidation_bus.stop()
+    await ReferenceRefresher.stop()
+    BatchAnalysisService.shutdown()
 
 # Create FastAPI app with lifespan
 app = FastAPI(
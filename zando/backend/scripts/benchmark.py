@@ -0,0 +1,703 @@
+"""
+Microbenchmarks for the genome processing hot paths.
+
+Run from the backend directory, e.g.:
+
+    python -m scripts.benchmark panel-match --rows 700000 --panel 50
+    python -m scripts.benchmark genome-memory --rows 700000
+    python -m scripts.benchmark parse --rows 700000
+    python -m scripts.benchmark panel-parse --rows 700000 --panel 200
+    python -m scripts.benchmark cache --rows 700000
+    python -m scripts.benchmark snapshot --rows 700000 --panel 500
+    python -m scripts.benchmark vector-match --rows 1000000 --panels 20 2000 200000
+    python -m scripts.benchmark batch --genomes 32 --rows 200000 --workers 1 2 4
+    python -m scripts.benchmark panel-genotypes --rows 600000 --panel 500
+    python -m scripts.benchmark stampede --requests 200 --threads 4
+    python -m scripts.benchmark shared-snapshot --panel 20000
+    python -m scripts.benchmark reference-load --panel 20000 --latency 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Callable
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.analysis_service import AnalysisService
+from app.services.batch_analysis_service import BatchAnalysisService, run_job
+from app.services.upload_store import UploadStore
+from app.services.dna_service import DNAService
+from app.services.genotype_data import GenotypeData
+from app.services.panel_genotypes import PanelGenotypes
+from app.services.panel_matcher import PanelMatcher, VectorPanelMatcher
+from app.services.reference_snapshot import ReferenceSnapshot
+from app.services.snapshot_file import read_snapshot_file, write_snapshot_file
+
+ALLELES = "ACGT"
+CHROMOSOMES = [str(i) for i in range(1, 23)] + ["X", "Y", "MT"]
+
+
+def synthetic_genome(rows: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Build a list-of-dicts genome shaped like DNAService.read_dna_file output."""
+    rng = random.Random(seed)
+    return [
+        {
+            'rsid': f"rs{i + 1000}",
+            'chromosome': rng.choice(CHROMOSOMES),
+            'position': str(rng.randint(1, 250_000_000)),
+            'allele1': rng.choice(ALLELES),
+            'allele2': rng.choice(ALLELES),
+        }
+        for i in range(rows)
+    ]
+
+
+def synthetic_panel(size: int, rows: int, seed: int = 1) -> Dict[str, Dict[str, Any]]:
+    """Build a reference panel shaped like AnalysisService.get_all_snps_cached output."""
+    rng = random.Random(seed)
+    return {
+        f"rs{i + 1000}": {
+            'snp_id': n,
+            'gene': f"GENE{n}",
+            'risk_allele': rng.choice(ALLELES),
+            'effect': 'synthetic',
+            'evidence_strength': 'Moderate',
+            'category': 'Synthetic',
+        }
+        for n, i in enumerate(rng.sample(range(rows), size))
+    }
+
+
+def synthetic_reference(panel: Dict[str, Dict[str, Any]], seed: int = 2) -> tuple:
+    """Build characteristics and ingredients shaped like the AnalysisService caches."""
+    rng = random.Random(seed)
+    characteristics = {}
+    ingredients = {}
+    for details in panel.values():
+        snp_id = details['snp_id']
+        characteristics[snp_id] = [
+            {'name': f"Trait{snp_id}_{k}", 'description': 'synthetic', 'effect_direction': 'Increases',
+             'evidence_strength': 'Moderate'}
+            for k in range(rng.randint(0, 3))
+        ]
+        ingredients[snp_id] = (
+            [{'ingredient_name': f"Benefit{snp_id}_{k}", 'ingredient_mechanism': 'synthetic',
+              'benefit_mechanism': 'synthetic', 'recommendation_strength': 'First-line', 'evidence_level': 'Strong'}
+             for k in range(rng.randint(0, 3))],
+            [{'ingredient_name': f"Caution{snp_id}_{k}", 'risk_mechanism': 'synthetic',
+              'alternative_ingredients': 'none'}
+             for k in range(rng.randint(0, 2))],
+        )
+    return characteristics, ingredients
+
+
+def write_23andme_file(path: str, records: List[Dict[str, Any]]) -> None:
+    """Write records in the 23andMe raw data layout (commented header, genotype column)."""
+    with open(path, 'w') as f:
+        f.write("# This data file generated by 23andMe\n")
+        f.write("# rsid\tchromosome\tposition\tgenotype\n")
+        for snp in records:
+            f.write(f"{snp['rsid']}\t{snp['chromosome']}\t{snp['position']}\t{snp['allele1']}{snp['allele2']}\n")
+
+
+def child_peak_rss(code: str) -> float:
+    """Run `code` in a fresh interpreter and return its peak RSS in MB."""
+    # VmHWM belongs to the new address space, so it isn't inflated by this
+    # process the way ru_maxrss is across fork/exec
+    script = (
+        f"{code}\n"
+        "print([line.split()[1] for line in open('/proc/self/status') if line.startswith('VmHWM')][0])\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+    return int(output.strip().splitlines()[-1]) / 1024
+
+
+def timed(label: str, func: Callable[[], Any], repeat: int = 3) -> Any:
+    """Run `func` `repeat` times and print the best wall-clock time."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<40} {best * 1000:10.2f} ms")
+    return result
+
+
+def bench_panel_match(args: argparse.Namespace) -> None:
+    genome = synthetic_genome(args.rows)
+    panel = synthetic_panel(args.panel, args.rows)
+    print(f"panel-match: {args.rows} genome rows, {args.panel} panel SNPs")
+
+    def legacy():
+        # Previous get_batch_snp_details + process_snp_data loop
+        rsids = [snp['rsid'] for snp in genome]
+        details = {rsid: d for rsid, d in panel.items() if rsid in rsids}
+        matches = []
+        for snp in genome:
+            if snp['rsid'] not in details:
+                continue
+            detail = details[snp['rsid']]
+            if detail['risk_allele'].upper() in [snp['allele1'].upper(), snp['allele2'].upper()]:
+                matches.append((snp, detail))
+        return matches
+
+    matcher = PanelMatcher(panel)
+    expected = timed("legacy list filter", legacy, repeat=1)
+    actual = timed("PanelMatcher.match", lambda: matcher.match(genome))
+    assert expected == actual, "PanelMatcher results differ from the legacy path"
+    print(f"  {len(actual)} matching SNPs (identical results)")
+
+
+def bench_genome_memory(args: argparse.Namespace) -> None:
+    records = synthetic_genome(args.rows)
+    print(f"genome-memory: {args.rows} genome rows")
+
+    genome = timed("GenotypeData.from_records", lambda: GenotypeData.from_records(records), repeat=1)
+    legacy_blob = timed("pickle list-of-dicts", lambda: pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL), repeat=1)
+    columnar_blob = timed("pickle GenotypeData", lambda: pickle.dumps(genome, protocol=pickle.HIGHEST_PROTOCOL))
+    timed("unpickle list-of-dicts", lambda: pickle.loads(legacy_blob), repeat=1)
+    timed("unpickle GenotypeData", lambda: pickle.loads(columnar_blob))
+
+    print(f"  GenotypeData arrays: {genome.nbytes / (1024 * 1024):.1f} MB")
+    print(f"  cache entry size: {len(legacy_blob) / (1024 * 1024):.1f} MB -> {len(columnar_blob) / (1024 * 1024):.1f} MB")
+    assert genome.to_records() == records, "GenotypeData does not round-trip the parsed records"
+
+
+def bench_parse(args: argparse.Namespace) -> None:
+    records = synthetic_genome(args.rows)
+    print(f"parse: {args.rows} genome rows, {args.block_size} byte blocks")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "genome.txt")
+        write_23andme_file(path, records)
+        settings.DNA_PARSER_BLOCK_SIZE = args.block_size
+
+        results = {}
+        for parser in ("pandas", "streaming"):
+            results[parser] = timed(
+                f"read_dna_file(parser={parser!r})",
+                lambda: DNAService.read_dna_file(path, use_cache=False, parser=parser),
+                repeat=1,
+            )
+            peak = child_peak_rss(
+                "from app.core.config import settings\n"
+                "from app.services.dna_service import DNAService\n"
+                f"settings.DNA_PARSER_BLOCK_SIZE = {args.block_size}\n"
+                f"DNAService.read_dna_file({path!r}, use_cache=False, parser={parser!r})"
+            )
+            print(f"  {'':<40} peak RSS {peak:7.1f} MB")
+
+    assert results["streaming"].to_records() == records, "Streaming parser results differ from the input"
+    assert results["pandas"].to_records() == records, "Pandas parser results differ from the input"
+    print(f"  {len(results['streaming'])} SNP records (identical results)")
+
+
+def bench_panel_parse(args: argparse.Namespace) -> None:
+    records = synthetic_genome(args.rows)
+    panel = frozenset(synthetic_panel(args.panel, args.rows))
+    print(f"panel-parse: {args.rows} genome rows, {args.panel} panel SNPs")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "genome.txt")
+        write_23andme_file(path, records)
+
+        full = timed("full genome parse", lambda: DNAService.read_dna_file(path, use_cache=False, parser="streaming"))
+        filtered = timed(
+            "panel-filtered parse",
+            lambda: DNAService.read_dna_file(path, use_cache=False, parser="streaming", panel_rsids=panel),
+        )
+
+    full_size = len(pickle.dumps(full, protocol=pickle.HIGHEST_PROTOCOL))
+    filtered_size = len(pickle.dumps(filtered, protocol=pickle.HIGHEST_PROTOCOL))
+    print(f"  cache entry size: {full_size / 1024:.1f} KB -> {filtered_size / 1024:.1f} KB")
+    assert filtered.to_records() == full.select(panel).to_records(), "Panel-filtered parse differs from the full parse"
+    print(f"  {len(filtered)} panel SNPs (identical results)")
+
+
+def bench_cache(args: argparse.Namespace) -> None:
+    records = synthetic_genome(args.rows)
+    panel = synthetic_panel(args.panel, args.rows)
+    print(f"cache: {args.rows} genome rows, {args.panel} panel SNPs")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.CACHE_DIR = tmp
+        DNAService.save_to_cache(records, "legacy")
+        DNAService.save_to_cache(GenotypeData.from_records(records), "binary", format_type="genome")
+
+        legacy = timed("pickle hit (list-of-dicts)", lambda: DNAService.load_from_cache("legacy"), repeat=1)
+        binary = timed("genome hit (mmap)", lambda: DNAService.load_from_cache("binary", format_type="genome"))
+
+        matcher = PanelMatcher(panel)
+        assert matcher.match(legacy) == matcher.match(binary), "Genome cache results differ from the pickle cache"
+
+        for label, key, format_type in (("pickle", "legacy", "json"), ("genome", "binary", "genome")):
+            peak = child_peak_rss(
+                "from app.core.config import settings\n"
+                "from app.services.dna_service import DNAService\n"
+                "from app.services.panel_matcher import PanelMatcher\n"
+                f"settings.CACHE_DIR = {tmp!r}\n"
+                f"PanelMatcher({panel!r}).match(DNAService.load_from_cache({key!r}, format_type={format_type!r}))"
+            )
+            size = os.path.getsize(DNAService.get_cache_path(key, format_type)) / (1024 * 1024)
+            print(f"  {label:<8} file {size:7.1f} MB   hit + match peak RSS {peak:7.1f} MB")
+
+        timed("legacy migration (one-off)", lambda: DNAService.load_genome_from_cache("legacy"), repeat=1)
+        assert DNAService.load_genome_from_cache("legacy").to_records() == records
+        print(f"  {len(binary)} SNP records (identical results)")
+
+
+def bench_snapshot(args: argparse.Namespace) -> None:
+    genome = GenotypeData.from_records(synthetic_genome(args.rows))
+    panel = synthetic_panel(args.panel, args.rows)
+    characteristics, ingredients = synthetic_reference(panel)
+    print(f"snapshot: {args.rows} genome rows, {args.panel} panel SNPs")
+
+    matcher = PanelMatcher(panel)
+
+    def legacy():
+        # Previous process_snp_data: match, then join characteristics and
+        # ingredients and build each mutation entry per request
+        matches = matcher.match(genome)
+        snp_ids = [detail['snp_id'] for _, detail in matches]
+        chars = {snp_id: characteristics[snp_id] for snp_id in set(snp_ids) if snp_id in characteristics}
+        ingrs = {snp_id: ingredients[snp_id] for snp_id in set(snp_ids) if snp_id in ingredients}
+        report = {'mutations': [], 'ingredient_recommendations': {'prioritize': [], 'caution': []}}
+        for snp, detail in matches:
+            snp_id = detail['snp_id']
+            report['mutations'].append({
+                'gene': detail['gene'], 'rsid': snp['rsid'], 'allele1': snp['allele1'], 'allele2': snp['allele2'],
+                'risk_allele': detail['risk_allele'], 'effect': detail['effect'],
+                'evidence_strength': detail['evidence_strength'], 'category': detail['category'],
+                'characteristics': chars.get(snp_id, []),
+            })
+            if snp_id in ingrs:
+                beneficials, cautions = ingrs[snp_id]
+                report['ingredient_recommendations']['prioritize'].extend(beneficials)
+                report['ingredient_recommendations']['caution'].extend(cautions)
+        return report
+
+    snapshot = timed("compile ReferenceSnapshot (once)", lambda: ReferenceSnapshot(panel, characteristics, ingredients), repeat=1)
+    expected = timed("legacy per-request join", legacy)
+    actual = timed("ReferenceSnapshot.analyze", lambda: snapshot.analyze(genome))
+    assert expected == actual, "ReferenceSnapshot results differ from the legacy join"
+    print(f"  {len(actual['mutations'])} mutations (identical results)")
+
+
+def bench_vector_match(args: argparse.Namespace) -> None:
+    genome = GenotypeData.from_records(synthetic_genome(args.rows))
+    print(f"vector-match: {args.rows} genome rows, panels of {', '.join(map(str, args.panels))} SNPs")
+
+    # Mix in lower-case calls and no-calls so the edge cases are compared too
+    rng = np.random.default_rng(0)
+    alleles1, alleles2 = genome.alleles1.copy(), genome.alleles2.copy()
+    lower = rng.random(len(genome)) < 0.01
+    alleles1[lower] += ord('a') - ord('A')
+    alleles2[rng.random(len(genome)) < 0.01] = 0
+    genome = GenotypeData(genome.rsid_codes, genome.chromosomes, genome.positions, alleles1, alleles2,
+                          other_ids=genome.other_ids)
+    timed("genome rsid index (once per genome)", lambda: genome.find_codes(np.empty(0, dtype=np.int64)), repeat=1)
+
+    for size in args.panels:
+        panel = synthetic_panel(size, args.rows)
+        for n, details in enumerate(panel.values()):
+            if n % 10 == 0:
+                details['risk_allele'] = details['risk_allele'].lower()
+        print(f"  panel of {size} SNPs")
+
+        legacy_matcher = timed("  build PanelMatcher", lambda: PanelMatcher(panel), repeat=1)
+        vector_matcher = timed("  build VectorPanelMatcher", lambda: VectorPanelMatcher(panel), repeat=1)
+        expected = timed("  PanelMatcher.match", lambda: legacy_matcher.match(genome))
+        actual = timed("  VectorPanelMatcher.match", lambda: vector_matcher.match(genome))
+
+        actual_pairs = [
+            (genome[row], panel[vector_matcher.rsids[position]])
+            for row, position in zip(actual.rows.tolist(), actual.panel_index.tolist())
+        ]
+        assert expected == actual_pairs, "VectorPanelMatcher results differ from PanelMatcher"
+        print(f"  {'':<40} {len(actual)} carriers, {int(actual.homozygous.sum())} homozygous (identical results)")
+
+
+def bench_batch(args: argparse.Namespace) -> None:
+    panel = synthetic_panel(args.panel, args.rows)
+    snapshot = ReferenceSnapshot(panel, *synthetic_reference(panel))
+    print(f"batch: {args.genomes} genomes of {args.rows} rows, {args.panel} panel SNPs, {os.cpu_count()} CPUs")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = []
+        for n in range(args.genomes):
+            path = os.path.join(tmp, f"genome{n}.txt")
+            write_23andme_file(path, synthetic_genome(args.rows, seed=n))
+            jobs.append((DNAService.compute_file_hash_from_path(path), path, None))
+        expected = [snapshot.analyze(DNAService.read_dna_file(path, use_cache=False, panel_rsids=snapshot.rsids))
+                    for _, path, _ in jobs]
+
+        for workers in args.workers:
+            # Fresh cache per run; pool workers are spawned and read it from the environment
+            cache_dir = os.path.join(tmp, f"cache{workers}")
+            os.makedirs(cache_dir)
+            os.environ["CACHE_DIR"] = settings.CACHE_DIR = cache_dir
+            settings.ANALYSIS_BATCH_WORKERS = workers
+            BatchAnalysisService.shutdown()
+            # Start the pool outside the timings
+            asyncio.run(BatchAnalysisService.run_jobs(snapshot, [(None, None, [])] * 2))
+
+            for label in ("parse + match (cold)", "cache hit + match (warm)"):
+                start = time.perf_counter()
+                outcomes = asyncio.run(BatchAnalysisService.run_jobs(snapshot, jobs))
+                elapsed = time.perf_counter() - start
+                assert outcomes == expected, "Batch results differ from sequential analysis"
+                print(f"  {workers:>2} workers {label:<28} {elapsed * 1000:10.2f} ms  "
+                      f"{len(jobs) / elapsed:8.1f} genomes/s")
+        BatchAnalysisService.shutdown()
+    assert run_job(snapshot, (None, None, [])) == snapshot.analyze([])
+    print(f"  {sum(len(r['mutations']) for r in expected)} mutations over all genomes (identical results)")
+
+
+def bench_panel_genotypes(args: argparse.Namespace) -> None:
+    records = synthetic_genome(args.rows)
+    panel = frozenset(synthetic_panel(args.panel, args.rows))
+    grown = panel | frozenset(synthetic_panel(args.panel, args.rows, seed=3))
+    print(f"panel-genotypes: {args.rows} genome rows, {args.panel} panel SNPs")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.CACHE_DIR = os.path.join(tmp, "cache")
+        settings.UPLOADS_DIR = os.path.join(tmp, "uploads")
+        settings.UPLOADS_CACHE_DIR = os.path.join(settings.CACHE_DIR, "uploads")
+        os.makedirs(settings.UPLOADS_CACHE_DIR)
+        os.makedirs(settings.UPLOADS_DIR)
+        source = os.path.join(tmp, "genome.txt")
+        write_23andme_file(source, records)
+        file_hash = DNAService.compute_file_hash_from_path(source)
+        path = str(UploadStore.add(source, file_hash, "genome.txt", os.path.getsize(source))[0])
+
+        expected = timed("panel-filtered parse (cache miss)",
+                         lambda: DNAService.read_dna_file(path, use_cache=False, panel_rsids=panel))
+        DNAService.read_dna_file(path, use_cache=True, panel_rsids=panel, file_hash=file_hash)
+        size = UploadStore.genotypes_path(file_hash).stat().st_size
+        print(f"  stored panel genotypes: {size / 1024:.1f} KB")
+
+        for entry in os.scandir(settings.CACHE_DIR):
+            # Expired cache: only the stored record is left
+            if entry.is_file():
+                os.unlink(entry.path)
+        actual = timed("stored panel genotypes (cache miss)", lambda: PanelGenotypes.load(file_hash, panel))
+        assert actual.to_records() == expected.to_records(), "Stored panel genotypes differ from a parse"
+        assert DNAService.load_cached_snp_data(file_hash, grown) is None, "Grown panel should not be covered"
+        print(f"  {len(actual)} panel SNPs (identical results); a grown panel falls back to the file")
+
+
+class SyntheticReferenceDB:
+    """
+    Stands in for a database session holding a synthetic reference panel.
+
+    Answers the reference queries AnalysisService issues, after `latency`
+    seconds of non-blocking delay, and counts them by table.
+    """
+
+    def __init__(self, panel: Dict[str, Dict[str, Any]], characteristics: Dict[int, List[Dict[str, Any]]],
+                 ingredients: Dict[int, tuple], latency: float):
+        self.latency = latency
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._rows = {
+            'snp': [(d['snp_id'], rsid, d['gene'], d['risk_allele'], d['effect'], d['evidence_strength'],
+                     d['category']) for rsid, d in panel.items()],
+            'snp_id': [(d['snp_id'],) for d in panel.values()],
+            'characteristics': [(snp_id, c['name'], c['description'], c['effect_direction'], c['evidence_strength'])
+                                for snp_id, entries in characteristics.items() for c in entries],
+            'beneficial': [(snp_id, b['ingredient_name'], b['ingredient_mechanism'], b['benefit_mechanism'],
+                            b['recommendation_strength'], b['evidence_level'])
+                           for snp_id, (beneficial, _) in ingredients.items() for b in beneficial],
+            'caution': [(snp_id, c['ingredient_name'], c['risk_mechanism'], c['alternative_ingredients'])
+                        for snp_id, (_, cautions) in ingredients.items() for c in cautions],
+            'version': [(1,)],
+        }
+        # The bundle query's rows, with its JSON columns as text
+        snp_ids = {d['snp_id']: rsid for rsid, d in panel.items()}
+        self._rows['bundle'] = [
+            (snp_id, rsid, *(panel[rsid][k] for k in ('gene', 'risk_allele', 'effect', 'evidence_strength', 'category')),
+             json.dumps([[c['name'], c['description'], c['effect_direction'], c['evidence_strength']]
+                         for c in characteristics[snp_id]]) if characteristics.get(snp_id) else None,
+             json.dumps([[b['ingredient_name'], b['ingredient_mechanism'], b['benefit_mechanism'],
+                          b['recommendation_strength'], b['evidence_level']]
+                         for b in ingredients[snp_id][0]]) if ingredients.get(snp_id, ((), ()))[0] else None,
+             json.dumps([[c['ingredient_name'], c['risk_mechanism'], c['alternative_ingredients']]
+                         for c in ingredients[snp_id][1]]) if ingredients.get(snp_id, ((), ()))[1] else None)
+            for snp_id, rsid in snp_ids.items()
+        ]
+
+    class Result:
+        def __init__(self, rows: List[tuple]):
+            self.rows = rows
+
+        def fetchall(self) -> List[tuple]:
+            return self.rows
+
+        def fetchone(self):
+            return self.rows[0] if self.rows else None
+
+    async def execute(self, statement, params=None):
+        query = str(statement)
+        if 'jsonb_array_elements_text' in query:
+            return self.Result([(term,) for term in sorted(json.loads(params['terms']))])
+        if 'json_agg' in query:
+            table = 'bundle'
+        elif 'reference_data_version' in query:
+            table = 'version'
+        elif 'SNP_Characteristic_Link' in query:
+            table = 'characteristics'
+        elif 'snp_beneficial_ingredients' in query:
+            table = 'beneficial'
+        elif 'SNP_IngredientCaution_Link' in query:
+            table = 'caution'
+        elif 'SELECT snp_id FROM snp' in query:
+            table = 'snp_id'
+        elif 'rsid, gene' in query:
+            table = 'snp'
+        else:
+            raise ValueError(f"Unexpected query: {query}")
+        with self._lock:
+            self.counts[table] = self.counts.get(table, 0) + 1
+        await asyncio.sleep(self.latency)
+        return self.Result(self._rows[table])
+
+    async def connection(self):
+        return self
+
+    async def commit(self) -> None:
+        pass
+
+    async def rollback(self) -> None:
+        pass
+
+
+def bench_stampede(args: argparse.Namespace) -> None:
+    panel = synthetic_panel(args.panel, args.rows)
+    db = SyntheticReferenceDB(panel, *synthetic_reference(panel), latency=args.latency)
+    genome = synthetic_genome(args.rows)
+    print(f"stampede: {args.requests} concurrent analyses over {args.threads} threads, "
+          f"{args.latency * 1000:.0f} ms per query, {args.panel} panel SNPs")
+
+    def run_share(count: int) -> None:
+        async def analyses():
+            await asyncio.gather(*(AnalysisService.process_snp_data(genome, db) for _ in range(count)))
+        asyncio.run(analyses())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.CACHE_DIR = tmp
+        # Measures the per-worker caches; workers sharing a snapshot file
+        # load under the directory lock instead
+        settings.SHARED_REFERENCE_SNAPSHOT = False
+        run_share(1)
+
+        # Expire every reference cache, then hit them all at once
+        expired = time.time() - AnalysisService.cache_duration() - 1
+        AnalysisService._snp_cache_timestamp = expired
+        AnalysisService._characteristics_cache_timestamp = expired
+        AnalysisService._ingredients_cache_timestamp = expired
+        db.counts.clear()
+
+        shares = [args.requests // args.threads + (n < args.requests % args.threads) for n in range(args.threads)]
+        threads = [threading.Thread(target=run_share, args=(share,)) for share in shares]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    for table in ('bundle', 'snp', 'characteristics', 'snp_id', 'beneficial', 'caution'):
+        print(f"  {table + ' queries':<40} {db.counts.get(table, 0):10d}")
+    print(f"  {'all analyses':<40} {elapsed * 1000:10.2f} ms")
+    if settings.REFERENCE_LOADER == "bundle":
+        tables = ('bundle',)
+    else:
+        tables = ('snp', 'characteristics', 'beneficial', 'caution')
+    reloads = {table: db.counts.get(table, 0) for table in tables}
+    assert all(count == 1 for count in reloads.values()), f"Expected exactly one reload per cache, got {reloads}"
+    print("  exactly one reload per cache")
+
+
+def bench_shared_snapshot(args: argparse.Namespace) -> None:
+    panel = synthetic_panel(args.panel, args.rows)
+    characteristics, ingredients = synthetic_reference(panel)
+    genome = GenotypeData.from_records(synthetic_genome(args.rows))
+    print(f"shared-snapshot: {args.panel} reference SNPs, {args.rows} genome rows")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources_path = os.path.join(tmp, "sources.pkl")
+        genome_path = os.path.join(tmp, "genome.pkl")
+        snapshot_path = os.path.join(tmp, "v1.snapshot")
+        with open(sources_path, 'wb') as f:
+            pickle.dump((panel, characteristics, ingredients), f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(genome_path, 'wb') as f:
+            pickle.dump(genome, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        timed("write snapshot file (once per host)",
+              lambda: write_snapshot_file(Path(snapshot_path), panel, characteristics, ingredients, "v1"), repeat=1)
+        built = timed("build ReferenceSnapshot (per worker)",
+                      lambda: ReferenceSnapshot(panel, characteristics, ingredients, version="v1"), repeat=1)
+        mapped = timed("attach snapshot file (per worker)", lambda: read_snapshot_file(snapshot_path))
+        expected = timed("ReferenceSnapshot.analyze", lambda: built.analyze(genome))
+        actual = timed("MappedReferenceSnapshot.analyze", lambda: mapped.analyze(genome))
+        assert expected == actual, "Mapped snapshot results differ from the built snapshot"
+        print(f"  {len(actual['mutations'])} mutations (identical results)")
+
+        # Each worker process: the caches it loaded plus the snapshot built
+        # from them, vs a mapping of the shared file. Resident pages of the
+        # file are counted here but shared between workers.
+        setup = (
+            "import pickle\n"
+            "from app.services.reference_snapshot import ReferenceSnapshot\n"
+            "from app.services.snapshot_file import read_snapshot_file\n"
+            f"genome = pickle.load(open({genome_path!r}, 'rb'))\n"
+        )
+        baseline = child_peak_rss(setup)
+        per_worker = child_peak_rss(
+            setup
+            + f"sources = pickle.load(open({sources_path!r}, 'rb'))\n"
+            + "snapshot = ReferenceSnapshot(*sources, version='v1')\n"
+            + "snapshot.analyze(genome)\n"
+        )
+        shared = child_peak_rss(
+            setup
+            + f"snapshot = read_snapshot_file({snapshot_path!r})\n"
+            + "snapshot.analyze(genome)\n"
+        )
+        file_size = os.path.getsize(snapshot_path)
+
+    print(f"  snapshot file: {file_size / (1024 * 1024):.1f} MB")
+    print(f"  worker reference memory: {per_worker - baseline:.1f} MB -> {shared - baseline:.1f} MB")
+
+
+def bench_reference_load(args: argparse.Namespace) -> None:
+    panel = synthetic_panel(args.panel, args.panel * 2)
+    db = SyntheticReferenceDB(panel, *synthetic_reference(panel), latency=args.latency)
+    print(f"reference-load: {args.panel} reference SNPs, {args.latency * 1000:.0f} ms per query")
+    settings.SHARED_REFERENCE_SNAPSHOT = False
+
+    def expire() -> None:
+        AnalysisService._snp_cache = {}
+        AnalysisService._characteristics_cache = {}
+        AnalysisService._ingredients_cache = {}
+        AnalysisService.expire_reference_caches()
+
+    async def load_caches():
+        return (await AnalysisService.get_all_snps_cached(db),
+                await AnalysisService.get_all_characteristics_cached(db),
+                await AnalysisService.get_all_ingredients_cached(db))
+
+    def load():
+        expire()
+        return asyncio.run(load_caches())
+
+    def cold_start():
+        # A new worker: version check, caches and snapshot
+        expire()
+        AnalysisService._reference_snapshot = None
+        AnalysisService._reference_version = None
+        AnalysisService._reference_version_checked = 0.0
+        return asyncio.run(AnalysisService.refresh_reference_snapshot(db))
+
+    loaded = {}
+    for loader in ("tables", "bundle"):
+        settings.REFERENCE_LOADER = loader
+        db.counts.clear()
+        loaded[loader] = timed(f"load caches ({loader})", load)
+        queries = sum(count for table, count in db.counts.items() if table != 'version') // 3
+        timed(f"cold start with snapshot ({loader})", cold_start)
+        print(f"  {'queries per load':<40} {queries:10d}")
+
+    assert loaded["bundle"] == loaded["tables"], "Bundle loader caches differ from the per-table loaders"
+    print("  identical caches")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    panel_match = subparsers.add_parser("panel-match", help="Panel matching against a synthetic genome")
+    panel_match.add_argument("--rows", type=int, default=700_000)
+    panel_match.add_argument("--panel", type=int, default=50)
+    panel_match.set_defaults(func=bench_panel_match)
+
+    genome_memory = subparsers.add_parser("genome-memory", help="Footprint of the parsed genome and its cache entry")
+    genome_memory.add_argument("--rows", type=int, default=700_000)
+    genome_memory.set_defaults(func=bench_genome_memory)
+
+    parse = subparsers.add_parser("parse", help="Pandas vs streaming DNA file parser")
+    parse.add_argument("--rows", type=int, default=700_000)
+    parse.add_argument("--block-size", type=int, default=settings.DNA_PARSER_BLOCK_SIZE)
+    parse.set_defaults(func=bench_parse)
+
+    panel_parse = subparsers.add_parser("panel-parse", help="Full vs panel-filtered DNA file parse")
+    panel_parse.add_argument("--rows", type=int, default=700_000)
+    panel_parse.add_argument("--panel", type=int, default=200)
+    panel_parse.set_defaults(func=bench_panel_parse)
+
+    cache = subparsers.add_parser("cache", help="Pickle vs memory-mapped genome cache hits")
+    cache.add_argument("--rows", type=int, default=700_000)
+    cache.add_argument("--panel", type=int, default=200)
+    cache.set_defaults(func=bench_cache)
+
+    snapshot = subparsers.add_parser("snapshot", help="Per-request join vs compiled reference snapshot")
+    snapshot.add_argument("--rows", type=int, default=700_000)
+    snapshot.add_argument("--panel", type=int, default=500)
+    snapshot.set_defaults(func=bench_snapshot)
+
+    vector_match = subparsers.add_parser("vector-match", help="Per-SNP vs vectorized risk-allele matching")
+    vector_match.add_argument("--rows", type=int, default=1_000_000)
+    vector_match.add_argument("--panels", type=int, nargs="+", default=[20, 2_000, 200_000])
+    vector_match.set_defaults(func=bench_vector_match)
+
+    batch = subparsers.add_parser("batch", help="Batch analysis throughput by worker count")
+    batch.add_argument("--genomes", type=int, default=32)
+    batch.add_argument("--rows", type=int, default=200_000)
+    batch.add_argument("--panel", type=int, default=500)
+    batch.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    batch.set_defaults(func=bench_batch)
+
+    panel_genotypes = subparsers.add_parser("panel-genotypes", help="Re-parse vs stored panel genotypes on a cache miss")
+    panel_genotypes.add_argument("--rows", type=int, default=600_000)
+    panel_genotypes.add_argument("--panel", type=int, default=500)
+    panel_genotypes.set_defaults(func=bench_panel_genotypes)
+
+    stampede = subparsers.add_parser("stampede", help="Concurrent analyses against expired reference caches")
+    stampede.add_argument("--requests", type=int, default=200)
+    stampede.add_argument("--threads", type=int, default=4)
+    stampede.add_argument("--latency", type=float, default=0.05)
+    stampede.add_argument("--rows", type=int, default=20_000)
+    stampede.add_argument("--panel", type=int, default=500)
+    stampede.set_defaults(func=bench_stampede)
+
+    shared_snapshot = subparsers.add_parser("shared-snapshot", help="Per-worker vs shared reference snapshot memory")
+    shared_snapshot.add_argument("--panel", type=int, default=20_000)
+    shared_snapshot.add_argument("--rows", type=int, default=600_000)
+    shared_snapshot.set_defaults(func=bench_shared_snapshot)
+
+    reference_load = subparsers.add_parser("reference-load", help="Per-table vs bundled reference data loading")
+    reference_load.add_argument("--panel", type=int, default=20_000)
+    reference_load.add_argument("--latency", type=float, default=0.02)
+    reference_load.set_defaults(func=bench_reference_load)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
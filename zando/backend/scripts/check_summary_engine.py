@@ -0,0 +1,91 @@
+"""
+Check that the in-process summary engine matches the SQL summary functions.
+
+Generates summaries for many variant sets both ways and compares them byte
+for byte: the empty set, every panel SNP alone, pairs of panel SNPs, the
+whole panel, sets with duplicates and unknown rsids, and random subsets.
+Exits non-zero on the first mismatches, printing a diff.
+
+Run from the backend directory against a database with the reference data
+and functions migrated:
+
+    python -m scripts.check_summary_engine --random 500
+"""
+import argparse
+import asyncio
+import difflib
+import itertools
+import random
+import sys
+import time
+from typing import List
+
+from app.db.session import SessionLocal
+from app.services.analysis_service import AnalysisService
+
+
+def variant_sets(panel: List[str], random_sets: int, max_pairs: int, seed: int) -> List[List[str]]:
+    rng = random.Random(seed)
+    sets = [[], list(panel), list(reversed(panel)), panel + ["rs0"], ["rs0"]]
+    sets.extend([rsid] for rsid in panel)
+    pairs = list(itertools.combinations(panel, 2))
+    if len(pairs) > max_pairs:
+        pairs = rng.sample(pairs, max_pairs)
+    sets.extend(list(pair) for pair in pairs)
+    for _ in range(random_sets):
+        subset = rng.sample(panel, rng.randint(1, len(panel)))
+        if rng.random() < 0.2:
+            # Repeated rsids still count towards the variant total
+            subset += rng.sample(subset, rng.randint(1, len(subset)))
+        sets.append(subset)
+    return sets
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--random", type=int, default=200, help="Random subsets of the panel to check")
+    parser.add_argument("--max-pairs", type=int, default=2000)
+    parser.add_argument("--show", type=int, default=3, help="Mismatches to print")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        conn = await db.connection()
+        engine = await AnalysisService.get_summary_engine(conn)
+        panel = sorted(engine.snapshot.snps)
+        sets = variant_sets(panel, args.random, args.max_pairs, args.seed)
+        print(f"Comparing {len(sets)} variant sets over a panel of {len(panel)} SNPs")
+
+        sql_time = python_time = 0.0
+        mismatches = []
+        for variants in sets:
+            start = time.perf_counter()
+            expected = await AnalysisService.get_sql_summary(conn, variants)
+            sql_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = engine.summarize(variants)
+            python_time += time.perf_counter() - start
+
+            if actual != expected:
+                mismatches.append((variants, expected, actual))
+    finally:
+        await db.close()
+
+    print(f"SQL functions:  {sql_time * 1000:10.2f} ms total")
+    print(f"Python engine:  {python_time * 1000:10.2f} ms total (memoized repeats included)")
+
+    for variants, expected, actual in mismatches[:args.show]:
+        print(f"\nMismatch for {variants}:")
+        sys.stdout.writelines(difflib.unified_diff(
+            expected.splitlines(True), actual.splitlines(True), "sql", "python"
+        ))
+    if mismatches:
+        print(f"\n{len(mismatches)} of {len(sets)} summaries differ")
+        sys.exit(1)
+    print(f"All {len(sets)} summaries identical")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
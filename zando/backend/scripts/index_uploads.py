@@ -0,0 +1,31 @@
+"""
+Backfill the dna_files index from the content-addressed upload store and
+legacy {hash[:8]}_{filename} uploads.
+
+/dna/uploads lists files from dna_files. Uploads are indexed as they
+arrive; run this once after upgrading, so legacy uploads (which are hashed
+here) stay listed, or after uploads were stored while the database was
+unreachable. Existing rows are left untouched.
+
+Run from the backend directory:
+
+    python -m scripts.index_uploads
+"""
+import asyncio
+
+from app.db.session import SessionLocal, init_db
+from app.services.dna_service import DNAService
+
+
+async def main() -> None:
+    await init_db()
+    db = SessionLocal()
+    try:
+        added = await DNAService.index_stored_uploads(db)
+        print(f"Indexed {added} stored upload(s)")
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
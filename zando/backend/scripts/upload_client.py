@@ -0,0 +1,245 @@
+"""
+Test client for the chunked, resumable upload API.
+
+Uploads a DNA file through /dna/upload-sessions with parallel chunk PUTs,
+deliberately breaking some of them (connections dropped mid-chunk and
+corrupted chunks) and abandoning the first client halfway, then resumes
+from the server's view of the session and checks the final hash.
+
+Chunks the server already accepted are also re-sent, corrupted and with
+different content, which must be rejected without touching the stored
+bytes; the stored file is hashed at the end to prove it. Pass
+--uploads-dir if the server's UPLOADS_DIR is not reachable at the path
+it reports.
+
+Run from the backend directory against a running server, e.g.:
+
+    python -m scripts.upload_client --generate-mb 200 --fail-rate 0.2
+    python -m scripts.upload_client --file ~/genome.txt --workers 8
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+import httpx
+
+ALLELES = "ACGT"
+CHROMOSOMES = [str(i) for i in range(1, 23)] + ["X", "Y", "MT"]
+
+
+class InducedFailure(Exception):
+    """Raised inside a request body to simulate a dropped connection."""
+
+
+def generate_file(path: str, size_mb: int, seed: int = 0) -> None:
+    """Write a synthetic 23andMe file of roughly `size_mb` megabytes."""
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    rsid = 1000
+    with open(path, 'w') as f:
+        header = "# This data file generated by 23andMe\n# rsid\tchromosome\tposition\tgenotype\n"
+        f.write(header)
+        written += len(header)
+        while written < target:
+            lines = []
+            for _ in range(10000):
+                lines.append(f"rs{rsid}\t{rng.choice(CHROMOSOMES)}\t{rng.randint(1, 250_000_000)}\t"
+                             f"{rng.choice(ALLELES)}{rng.choice(ALLELES)}\n")
+                rsid += 1
+            block = ''.join(lines)
+            f.write(block)
+            written += len(block)
+
+
+def file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class ChunkUploader:
+    """Uploads the chunks of one session, optionally sabotaging some of them."""
+
+    def __init__(self, client: httpx.Client, path: str, session: Dict[str, Any],
+                 fail_rate: float, rng: random.Random):
+        self.client = client
+        self.path = path
+        self.session = session
+        self.fail_rate = fail_rate
+        self.rng = rng
+        self.failures = {'interrupted': 0, 'corrupted': 0, 'other': 0}
+
+    def read_chunk(self, index: int) -> bytes:
+        chunk_size = self.session['chunk_size']
+        with open(self.path, 'rb') as f:
+            return os.pread(f.fileno(), chunk_size, index * chunk_size)
+
+    def put_chunk(self, index: int) -> bool:
+        data = self.read_chunk(index)
+        digest = hashlib.sha256(data).hexdigest()
+        url = f"/dna/upload-sessions/{self.session['upload_id']}/chunks/{index}"
+        failure = self.rng.choice(['interrupted', 'corrupted']) if self.rng.random() < self.fail_rate else None
+
+        if failure == 'interrupted':
+            def body():
+                yield data[:len(data) // 2]
+                raise InducedFailure()
+            content = body()
+        elif failure == 'corrupted':
+            content = bytes([data[0] ^ 0xFF]) + data[1:]
+        else:
+            content = data
+
+        try:
+            response = self.client.put(url, content=content, headers={'X-Chunk-SHA256': digest})
+        except (InducedFailure, httpx.HTTPError):
+            self.failures[failure or 'other'] += 1
+            return False
+        if response.status_code != 200:
+            self.failures[failure or 'other'] += 1
+            return False
+        return True
+
+    def resend_received(self, index: int) -> Dict[str, int]:
+        """
+        Re-send an accepted chunk three ways and return the status codes:
+        corrupted under its real digest (must be 400), different content
+        under its own digest (must be 409) and unchanged (must be 200).
+        """
+        data = self.read_chunk(index)
+        digest = hashlib.sha256(data).hexdigest()
+        other = bytes([data[0] ^ 0xFF]) + data[1:]
+        url = f"/dna/upload-sessions/{self.session['upload_id']}/chunks/{index}"
+        attempts = {
+            'corrupted': (other, digest),
+            'different': (other, hashlib.sha256(other).hexdigest()),
+            'identical': (data, digest),
+        }
+        return {
+            name: self.client.put(url, content=content, headers={'X-Chunk-SHA256': sent_digest}).status_code
+            for name, (content, sent_digest) in attempts.items()
+        }
+
+    def upload(self, indexes: List[int], workers: int) -> int:
+        """PUT `indexes` in parallel and return how many succeeded."""
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return sum(pool.map(self.put_chunk, indexes))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api/v1", help="API base URL")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="DNA file to upload")
+    source.add_argument("--generate-mb", type=int, help="Generate and upload a synthetic file of this size")
+    parser.add_argument("--chunk-size", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--workers", type=int, default=4, help="Parallel chunk uploads")
+    parser.add_argument("--fail-rate", type=float, default=0.2, help="Fraction of chunk PUTs to sabotage")
+    parser.add_argument("--max-rounds", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--uploads-dir", help="Server UPLOADS_DIR as seen from here, to hash the stored file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    temp_dir = None
+    path = args.file
+    if args.generate_mb:
+        temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(temp_dir.name, "synthetic_genome.txt")
+        start = time.perf_counter()
+        generate_file(path, args.generate_mb, args.seed)
+        print(f"Generated {os.path.getsize(path) / 1024 / 1024:.1f} MB in {time.perf_counter() - start:.1f}s")
+
+    try:
+        size = os.path.getsize(path)
+        expected_hash = file_sha256(path)
+
+        with httpx.Client(base_url=args.url, timeout=120) as client:
+            response = client.post("/dna/upload-sessions", json={
+                "filename": os.path.basename(path),
+                "size": size,
+                "chunk_size": args.chunk_size,
+                "sha256": expected_hash,
+            })
+            response.raise_for_status()
+            session = response.json()
+            if session['complete'] and session['upload_id'] is None:
+                print(f"Server already has {expected_hash}; nothing to upload")
+                return
+            upload_id = session['upload_id']
+            print(f"Session {upload_id}: {session['total_chunks']} chunks of {session['chunk_size']} bytes")
+
+            start = time.perf_counter()
+
+            # First client gives up after half of the chunks, as if it crashed
+            first = ChunkUploader(client, path, session, args.fail_rate, rng)
+            half = list(range(session['total_chunks'] // 2))
+            ok = first.upload(half, args.workers)
+            print(f"First client: {ok}/{len(half)} chunks accepted, failures {first.failures}; abandoning")
+
+            # Re-sent chunks that were already accepted must not change them
+            status = client.get(f"/dna/upload-sessions/{upload_id}").json()
+            expected_codes = {'corrupted': 400, 'different': 409, 'identical': 200}
+            for index in status['received_chunks'][:3]:
+                codes = first.resend_received(index)
+                if codes != expected_codes:
+                    print(f"Re-sending chunk {index} returned {codes}, expected {expected_codes}")
+                    sys.exit(1)
+            print(f"Re-sent {min(3, len(status['received_chunks']))} accepted chunk(s): "
+                  f"corrupted and different content rejected")
+
+            # A new client resumes from what the server says is missing
+            rounds = 0
+            while True:
+                status = client.get(f"/dna/upload-sessions/{upload_id}").json()
+                missing = status['missing_chunks']
+                if not missing:
+                    break
+                rounds += 1
+                if rounds > args.max_rounds:
+                    print(f"Gave up with {len(missing)} chunks missing")
+                    sys.exit(1)
+                resumed = ChunkUploader(client, path, status, args.fail_rate, rng)
+                ok = resumed.upload(missing, args.workers)
+                print(f"Resume round {rounds}: from offset {status['resume_offset']}, "
+                      f"{ok}/{len(missing)} chunks accepted, failures {resumed.failures}")
+
+            response = client.post(f"/dna/upload-sessions/{upload_id}/complete")
+            response.raise_for_status()
+            result = response.json()
+            elapsed = time.perf_counter() - start
+
+        print(f"Completed in {elapsed:.1f}s ({size / 1024 / 1024 / elapsed:.1f} MB/s): "
+              f"{result['snp_count']} SNPs, format {result['format']}")
+        if result['file_hash'] != expected_hash:
+            print(f"Hash mismatch: server {result['file_hash']}, local {expected_hash}")
+            sys.exit(1)
+        print(f"Hash verified: {expected_hash}")
+
+        stored_path = result['uploads_path']
+        if args.uploads_dir:
+            stored_path = os.path.join(args.uploads_dir, expected_hash[:2], f"{expected_hash}.txt")
+        if not os.path.exists(stored_path):
+            print(f"Stored file {stored_path} not reachable; pass --uploads-dir to check it")
+            sys.exit(1)
+        stored_hash = file_sha256(stored_path)
+        if stored_hash != expected_hash:
+            print(f"Stored file is corrupt: {stored_path} hashes to {stored_hash}")
+            sys.exit(1)
+        print(f"Stored file verified: {stored_path}")
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
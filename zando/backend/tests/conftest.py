@@ -0,0 +1,25 @@
+"""Fixtures shared by the backend tests."""
+import pytest
+
+from app.core.config import settings
+from app.services.analysis_service import AnalysisService
+from app.services.single_flight import SingleFlight
+
+
+@pytest.fixture(params=["bundle", "tables"])
+def analysis_service(request, monkeypatch, tmp_path):
+    """AnalysisService with its reference state isolated to the test, for each REFERENCE_LOADER."""
+    monkeypatch.setattr(settings, "REFERENCE_LOADER", request.param)
+    monkeypatch.setattr(settings, "CACHE_DIR", tmp_path)
+    # Per-worker caches; a shared snapshot file would load under its directory lock instead
+    monkeypatch.setattr(settings, "SHARED_REFERENCE_SNAPSHOT", False)
+    for name in ('_snp_cache', '_characteristics_cache', '_ingredients_cache'):
+        monkeypatch.setattr(AnalysisService, name, {})
+    for name in ('_snp_cache_timestamp', '_characteristics_cache_timestamp', '_ingredients_cache_timestamp',
+                 '_reference_snapshot', '_summary_engine', '_reference_version'):
+        monkeypatch.setattr(AnalysisService, name, None)
+    monkeypatch.setattr(AnalysisService, '_reference_snapshot_sources', ())
+    monkeypatch.setattr(AnalysisService, '_reference_version_checked', 0.0)
+    monkeypatch.setattr(AnalysisService, '_background_refresh', False)
+    monkeypatch.setattr(AnalysisService, '_reference_loads', SingleFlight())
+    return AnalysisService
@@ -0,0 +1,57 @@
+"""
+The report cache shared by genomes with the same genotype profile: reports
+with a fallback summary stay out of it, and force_refresh replaces entries.
+"""
+import pytest
+
+from app.core.config import settings
+from app.services.analysis_service import AnalysisService, DEFAULT_SUMMARY
+from app.services.dna_service import DNAService
+from scripts.benchmark import SyntheticReferenceDB, synthetic_genome, synthetic_panel, synthetic_reference
+
+GENOME_ROWS = 2000
+
+
+@pytest.fixture
+def reference_db(analysis_service, monkeypatch):
+    """A fake database; it has no summary SQL functions, so only the python engine succeeds."""
+    monkeypatch.setattr(settings, "SUMMARY_ENGINE", "python")
+    panel = synthetic_panel(50, GENOME_ROWS)
+    return SyntheticReferenceDB(panel, *synthetic_reference(panel), latency=0)
+
+
+def cached_profile_path(report):
+    return DNAService.get_cache_path(f"profile_{report['fingerprint']}")
+
+
+@pytest.mark.asyncio
+async def test_report_with_fallback_summary_is_not_shared(reference_db, monkeypatch):
+    genome = synthetic_genome(GENOME_ROWS)
+    monkeypatch.setattr(settings, "SUMMARY_ENGINE", "sql")
+    report = await AnalysisService.process_snp_data(genome, reference_db)
+    assert report['mutations']
+    assert report['summary'] == DEFAULT_SUMMARY
+
+    AnalysisService.cache_analysis_results("a" * 64, report)
+    assert not cached_profile_path(report).exists()
+    assert AnalysisService.get_cached_analysis("a" * 64) is None
+
+    # The next analysis of the profile gets a real summary, and shares it
+    monkeypatch.setattr(settings, "SUMMARY_ENGINE", "python")
+    report = await AnalysisService.process_snp_data(genome, reference_db)
+    assert report['summary'] != DEFAULT_SUMMARY
+    assert AnalysisService.get_cached_profile(report['fingerprint'])['summary'] == report['summary']
+
+
+@pytest.mark.asyncio
+async def test_force_refresh_replaces_the_shared_report(reference_db):
+    genome = synthetic_genome(GENOME_ROWS)
+    report = await AnalysisService.process_snp_data(genome, reference_db)
+    DNAService.save_to_cache({**report, 'summary': "stale"}, f"profile_{report['fingerprint']}")
+
+    reused = await AnalysisService.process_snp_data(genome, reference_db)
+    assert reused['summary'] == "stale"
+
+    refreshed = await AnalysisService.process_snp_data(genome, reference_db, force_refresh=True)
+    assert refreshed['summary'] == report['summary']
+    assert AnalysisService.get_cached_profile(report['fingerprint'])['summary'] == report['summary']
@@ -0,0 +1,149 @@
+"""
+Reference cache loads under concurrency: SingleFlight itself, and
+AnalysisService reloading expired caches for a burst of analyses.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.analysis_service import AnalysisService
+from app.services.single_flight import SingleFlight
+from scripts.benchmark import SyntheticReferenceDB, synthetic_genome, synthetic_panel, synthetic_reference
+
+CONCURRENT_ANALYSES = 200
+GENOME_ROWS = 2000
+
+
+@pytest.fixture
+def reference_db(analysis_service):
+    """A counting fake database."""
+    panel = synthetic_panel(50, GENOME_ROWS)
+    # Slow enough that every analysis arrives while the reload is in flight
+    return SyntheticReferenceDB(panel, *synthetic_reference(panel), latency=0.2)
+
+
+def expire_reference_caches() -> None:
+    expired = time.time() - AnalysisService.cache_duration() - 1
+    AnalysisService._snp_cache_timestamp = expired
+    AnalysisService._characteristics_cache_timestamp = expired
+    AnalysisService._ingredients_cache_timestamp = expired
+
+
+def assert_reloaded_once(db: SyntheticReferenceDB) -> None:
+    if settings.REFERENCE_LOADER == "bundle":
+        tables = ('bundle',)
+    else:
+        tables = ('snp', 'characteristics', 'beneficial', 'caution')
+    queries = {table: db.counts.get(table, 0) for table in tables}
+    assert queries == dict.fromkeys(tables, 1), f"Expected exactly one reload per cache, got {queries}"
+
+
+@pytest.mark.asyncio
+async def test_single_flight_runs_one_loader_for_concurrent_callers():
+    flight = SingleFlight()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return object()
+
+    results = await asyncio.gather(*(flight.run("snp", loader) for _ in range(CONCURRENT_ANALYSES)))
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_single_flight_is_shared_across_event_loops():
+    flight = SingleFlight()
+    calls = 0
+    started = threading.Event()
+    results = []
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await asyncio.sleep(0.2)
+        return "loaded"
+
+    def caller():
+        results.append(asyncio.run(flight.run("snp", loader)))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=caller) for _ in range(8)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert calls == 1
+    assert results == ["loaded"] * 9
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_failures_and_retries_afterwards():
+    flight = SingleFlight()
+    calls = 0
+
+    async def failing_loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise RuntimeError("database unavailable")
+
+    results = await asyncio.gather(*(flight.run("snp", failing_loader) for _ in range(10)),
+                                   return_exceptions=True)
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    # The failed flight is gone; the next caller loads again
+    with pytest.raises(RuntimeError):
+        await flight.run("snp", failing_loader)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_caches_reload_once_for_concurrent_analyses(reference_db):
+    genome = synthetic_genome(GENOME_ROWS)
+    await AnalysisService.process_snp_data(genome, reference_db)
+    expected = await AnalysisService.process_snp_data(genome, reference_db)
+
+    expire_reference_caches()
+    reference_db.counts.clear()
+    results = await asyncio.gather(*(AnalysisService.process_snp_data(genome, reference_db)
+                                     for _ in range(CONCURRENT_ANALYSES)))
+
+    assert_reloaded_once(reference_db)
+    assert all(result == expected for result in results)
+
+
+@pytest.mark.asyncio
+async def test_expired_caches_reload_once_across_the_sync_endpoint_threadpool(reference_db):
+    # Sync endpoints such as /analysis/list-sync run in Starlette's threadpool;
+    # analyses started there run on their own event loops and must join the
+    # reload already in flight on the main loop, and vice versa
+    genome = synthetic_genome(GENOME_ROWS)
+    await AnalysisService.process_snp_data(genome, reference_db)
+
+    def analyze_in_threadpool():
+        return asyncio.run(AnalysisService.process_snp_data(genome, reference_db))
+
+    expire_reference_caches()
+    reference_db.counts.clear()
+    half = CONCURRENT_ANALYSES // 2
+    results = await asyncio.gather(
+        *(AnalysisService.process_snp_data(genome, reference_db) for _ in range(half)),
+        *(run_in_threadpool(analyze_in_threadpool) for _ in range(CONCURRENT_ANALYSES - half)),
+    )
+
+    assert_reloaded_once(reference_db)
+    assert len(results) == CONCURRENT_ANALYSES
+    assert all(result == results[0] for result in results)
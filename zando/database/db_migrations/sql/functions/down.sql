@@ -11,6 +11,7 @@ DROP FUNCTION IF EXISTS public.get_genetic_findings(text);
 DROP FUNCTION IF EXISTS public.generate_summary_section(text[], public.genetic_finding[]);
 DROP FUNCTION IF EXISTS public.generate_ingredient_recommendations(text[]);
 DROP FUNCTION IF EXISTS public.generate_summary_section(text[]);
+DROP FUNCTION IF EXISTS public.bump_reference_data_version() CASCADE;
 
 -- Drop additional functions that may exist from previous migrations
 DROP FUNCTION IF EXISTS public.apply_report_formatting(text, text, jsonb);
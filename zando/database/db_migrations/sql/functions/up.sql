@@ -690,3 +690,50 @@ $$;
 --     RETURN result_text;
 -- END;
 -- $$;
+
+
+--
+-- Name: bump_reference_data_version(); Type: FUNCTION; Schema: public; Owner: cam
+--
+-- Statement-level trigger function: every write to the reference tables
+-- (including the data loader's TRUNCATE and COPY) bumps the single-row
+-- counter in reference_data_version, once per statement, and announces the
+-- new version on the reference_data_version channel. Listening app
+-- instances receive it when the transaction commits.
+--
+
+CREATE OR REPLACE FUNCTION public.bump_reference_data_version() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    current_version bigint;
+BEGIN
+    INSERT INTO public.reference_data_version (id, version, updated_at)
+    VALUES (true, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (id) DO UPDATE
+        SET version = public.reference_data_version.version + 1,
+            updated_at = CURRENT_TIMESTAMP
+    RETURNING version INTO current_version;
+    PERFORM pg_notify('reference_data_version', json_build_object('version', current_version)::text);
+    RETURN NULL;
+END;
+$$;
+
+
+DO $$
+DECLARE
+    reference_table text;
+BEGIN
+    FOREACH reference_table IN ARRAY ARRAY[
+        'snp', 'skincharacteristic', 'snp_characteristic_link',
+        'ingredient', 'snp_ingredient_link',
+        'ingredientcaution', 'snp_ingredientcaution_link'
+    ] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS bump_reference_data_version ON public.%I', reference_table);
+        EXECUTE format('CREATE TRIGGER bump_reference_data_version '
+                       'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.%I '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION public.bump_reference_data_version()',
+                       reference_table);
+    END LOOP;
+END;
+$$;
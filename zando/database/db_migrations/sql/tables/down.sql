@@ -13,6 +13,9 @@ DROP TABLE IF EXISTS public.product_aspect CASCADE;
 DROP TABLE IF EXISTS public.product_benefit CASCADE;
 DROP TABLE IF EXISTS public.product CASCADE;
 
+-- Reference data version counter
+DROP TABLE IF EXISTS public.reference_data_version CASCADE;
+
 -- Report-related tables
 DROP TABLE IF EXISTS public.report_log CASCADE;
 DROP TABLE IF EXISTS public.report_sections CASCADE;
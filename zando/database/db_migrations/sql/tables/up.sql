@@ -296,3 +296,15 @@ CREATE TABLE IF NOT EXISTS public.report_sections (
 );
 
 
+--
+-- Name: reference_data_version; Type: TABLE; Schema: public; Owner: cam
+--
+-- Single-row change counter over the reference tables, bumped by
+-- bump_reference_data_version(); caches of reference data are keyed by it.
+--
+
+CREATE TABLE IF NOT EXISTS public.reference_data_version (
+    id boolean DEFAULT true NOT NULL PRIMARY KEY CHECK (id),
+    version bigint DEFAULT 1 NOT NULL,
+    updated_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP
+);